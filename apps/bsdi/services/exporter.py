@@ -7,7 +7,7 @@ from django.core.files.base import ContentFile
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.utils import get_column_letter
-from apps.cecad.models import ImportBatch
+from apps.cecad.services.lote_atual import lote_atual
 from apps.core.models import Validacao
 
 
@@ -35,10 +35,8 @@ class BSDIExporter:
             raise ValueError("Nenhum lote de importação encontrado para exportação")
     
     def _get_ultimo_batch(self):
-        """Retorna o último batch de importação concluído."""
-        return ImportBatch.objects.filter(
-            status='completed'
-        ).order_by('-imported_at').first()
+        """Retorna o lote atual (última importação completa)."""
+        return lote_atual()
     
     def _get_familias_aprovadas(self):
         """
@@ -0,0 +1,24 @@
+"""Tarefas da fila em segundo plano do app BSDI."""
+from apps.bsdi.models import BSDIExportacao
+from apps.bsdi.services import BSDIExporter
+from apps.core.services.jobs import task
+
+
+def _marcar_exportacao_com_erro(job):
+    """Evita que uma exportação fique em 'processando' quando a tarefa falha definitivamente."""
+    BSDIExportacao.objects.filter(pk=job.payload.get('exportacao_id'), status='processando').update(
+        status='erro', mensagem_erro=job.error_message
+    )
+
+
+@task('bsdi.exportar', on_failure=_marcar_exportacao_com_erro)
+def exportar_bsdi(ctx, exportacao_id):
+    """Gera o arquivo XLSX de uma exportação BSDI criada pelo view."""
+    exportacao = BSDIExportacao.objects.select_related('import_batch').get(pk=exportacao_id)
+    content_file, nome_arquivo, total = BSDIExporter(import_batch=exportacao.import_batch).gerar_arquivo()
+
+    exportacao.arquivo.save(nome_arquivo, content_file, save=False)
+    exportacao.total_beneficiarios = total
+    exportacao.status = 'concluido'
+    exportacao.descricao = f'Lista gerada do lote #{exportacao.import_batch.pk}'
+    exportacao.save()
@@ -5,6 +5,7 @@ Este script demonstra como usar o exportador BSDI.
 """
 import os
 import django
+import pytest
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'comidanamesa.settings')
 django.setup()
@@ -13,6 +14,7 @@ from apps.bsdi.services import BSDIExporter
 from apps.cecad.models import ImportBatch
 from apps.core.models import Validacao
 
+@pytest.mark.django_db
 def test_bsdi_exporter():
     """Testa a geração de arquivo BSDI."""
     
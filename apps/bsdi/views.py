@@ -4,7 +4,8 @@ from django.contrib import messages
 from django.http import FileResponse, Http404
 from django.views.generic import ListView
 from django.utils.decorators import method_decorator
-from django.db import transaction
+
+from apps.core.services.jobs import enqueue
 
 from .models import BSDIExportacao
 from .services import BSDIExporter
@@ -28,10 +29,8 @@ class ExportacaoListView(ListView):
         context = super().get_context_data(**kwargs)
         
         # Verificar se existe batch para exportar
-        from apps.cecad.models import ImportBatch
-        ultimo_batch = ImportBatch.objects.filter(
-            status='completed'
-        ).order_by('-imported_at').first()
+        from apps.cecad.services.lote_atual import lote_atual
+        ultimo_batch = lote_atual()
         
         context['ultimo_batch'] = ultimo_batch
         context['pode_exportar'] = bool(ultimo_batch)
@@ -41,57 +40,32 @@ class ExportacaoListView(ListView):
 
 @login_required
 def gerar_exportacao(request):
-    """Gera uma nova exportação BSDI."""
+    """Cria uma exportação BSDI e enfileira a geração do arquivo."""
     
     if request.method != 'POST':
         messages.error(request, 'Método não permitido.')
         return redirect('bsdi:exportacao_list')
     
-    exportacao = None
-    
     try:
         # Inicializar exportador primeiro para validar batch
         exporter = BSDIExporter()
-        
-        with transaction.atomic():
-            # Criar registro de exportação com batch já definido
-            exportacao = BSDIExportacao.objects.create(
-                import_batch=exporter.import_batch,
-                gerado_por=request.user,
-                status='processando'
-            )
-            
-            # Gerar arquivo
-            content_file, nome_arquivo, total = exporter.gerar_arquivo()
-            
-            # Salvar arquivo
-            exportacao.arquivo.save(nome_arquivo, content_file, save=False)
-            exportacao.total_beneficiarios = total
-            exportacao.status = 'concluido'
-            exportacao.descricao = f'Lista gerada do lote #{exportacao.import_batch.pk}'
-            exportacao.save()
-            
-            messages.success(
-                request,
-                f'Lista BSDI gerada com sucesso! {total} beneficiários exportados.'
-            )
-            
-            # Redirecionar para download
-            return redirect('bsdi:exportacao_download', pk=exportacao.pk)
-            
     except ValueError as e:
         messages.error(request, f'Erro ao gerar exportação: {str(e)}')
-        if exportacao:
-            exportacao.status = 'erro'
-            exportacao.mensagem_erro = str(e)
-            exportacao.save()
-    except Exception as e:
-        messages.error(request, f'Erro inesperado ao gerar exportação: {str(e)}')
-        if exportacao:
-            exportacao.status = 'erro'
-            exportacao.mensagem_erro = str(e)
-            exportacao.save()
+        return redirect('bsdi:exportacao_list')
     
+    exportacao = BSDIExportacao.objects.create(
+        import_batch=exporter.import_batch,
+        gerado_por=request.user,
+        status='processando'
+    )
+    
+    # O arquivo é gerado no worker (manage.py run_workers), fora do processo web
+    enqueue('bsdi.exportar', {'exportacao_id': exportacao.pk}, user=request.user)
+    
+    messages.success(
+        request,
+        'Exportação BSDI enfileirada. O download fica disponível na lista quando o arquivo estiver pronto.'
+    )
     return redirect('bsdi:exportacao_list')
 
 
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CecadConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.cecad'
+
+    def ready(self):
+        """Importa signals quando a aplicação é carregada."""
+        import apps.cecad.signals  # noqa
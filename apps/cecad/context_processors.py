@@ -0,0 +1,8 @@
+from django.utils.functional import SimpleLazyObject
+
+from apps.cecad.services import lote_atual as resolver
+
+
+def lote_atual(request):
+    """Disponibiliza `lote_atual` nos templates; só consulta se o template usar."""
+    return {'lote_atual': SimpleLazyObject(resolver.lote_atual)}
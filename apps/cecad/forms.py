@@ -84,8 +84,9 @@ class FamiliaForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         from apps.cecad.models import ImportBatch
+        from apps.cecad.services.lote_atual import lote_atual
         # Seleciona apenas lotes concluídos e do tipo full
-        latest_batch = ImportBatch.objects.filter(status='completed', batch_type='full').order_by('-imported_at').first()
+        latest_batch = lote_atual()
         if latest_batch:
             self.fields['import_batch'].initial = latest_batch.pk
         self.fields['import_batch'].queryset = ImportBatch.objects.filter(status='completed', batch_type='full').order_by('-imported_at')
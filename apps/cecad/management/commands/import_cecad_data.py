@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
-from apps.cecad.services.importer import CecadImporter
+from apps.cecad.models import ImportBatch
+from apps.cecad.services.importer import build_importer
 import os
 
 class Command(BaseCommand):
@@ -7,6 +8,35 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Caminho para o arquivo CSV')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Número de processos da importação (padrão: settings.CECAD_IMPORT_WORKERS)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Quantidade de linhas gravadas por chunk',
+        )
+        parser.add_argument(
+            '--differential',
+            action='store_true',
+            help='Classifica as famílias em relação ao último lote completo (novas, alteradas, inalteradas, removidas)',
+        )
+        parser.add_argument(
+            '--manter-validacoes',
+            action='store_true',
+            help='Com --differential, copia as validações das famílias inalteradas em vez de voltar a pendente',
+        )
+        parser.add_argument(
+            '--resume',
+            type=int,
+            default=None,
+            metavar='BATCH_ID',
+            help='Retoma um lote interrompido a partir do último checkpoint',
+        )
 
     def handle(self, *args, **options):
         csv_file = options['csv_file']
@@ -17,8 +47,21 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.SUCCESS(f'Iniciando importação do arquivo: {csv_file}'))
         
-        importer = CecadImporter(csv_file)
-        success, message = importer.run()
+        if options['resume']:
+            batch = ImportBatch.objects.get(pk=options['resume'])
+        else:
+            batch = ImportBatch.objects.create(description=f"Importação de {os.path.basename(csv_file)}")
+        importer = build_importer(
+            csv_file,
+            batch,
+            bulk=True,
+            single_pass=True,
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            differential=options['differential'],
+            manter_validacoes=options['manter_validacoes'],
+        )
+        success, message = importer.run(resume=bool(options['resume']))
 
         if success:
             self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cecad", "0009_pessoatransferhistory"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importbatch",
+            name="file_size",
+            field=models.BigIntegerField(
+                default=0, verbose_name="Tamanho do Arquivo (bytes)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="importbatch",
+            name="processed_bytes",
+            field=models.BigIntegerField(default=0, verbose_name="Bytes Processados"),
+        ),
+        migrations.AlterField(
+            model_name="familia",
+            name="nom_localidade_fam",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                max_length=100,
+                verbose_name="Bairro/Localidade",
+            ),
+        ),
+    ]
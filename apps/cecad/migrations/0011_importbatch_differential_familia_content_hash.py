@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cecad", "0010_importbatch_file_size_processed_bytes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="familia",
+            name="content_hash",
+            field=models.CharField(
+                blank=True, max_length=64, verbose_name="Impressão Digital do Conteúdo"
+            ),
+        ),
+        migrations.AddField(
+            model_name="importbatch",
+            name="base_batch",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="lotes_diferenciais",
+                to="cecad.importbatch",
+                verbose_name="Lote de Referência",
+            ),
+        ),
+        migrations.AddField(
+            model_name="importbatch",
+            name="familias_alteradas",
+            field=models.IntegerField(default=0, verbose_name="Famílias Alteradas"),
+        ),
+        migrations.AddField(
+            model_name="importbatch",
+            name="familias_inalteradas",
+            field=models.IntegerField(default=0, verbose_name="Famílias Inalteradas"),
+        ),
+        migrations.AddField(
+            model_name="importbatch",
+            name="familias_novas",
+            field=models.IntegerField(default=0, verbose_name="Famílias Novas"),
+        ),
+        migrations.AddField(
+            model_name="importbatch",
+            name="familias_removidas",
+            field=models.IntegerField(default=0, verbose_name="Famílias Removidas"),
+        ),
+    ]
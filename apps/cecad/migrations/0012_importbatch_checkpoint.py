@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cecad", "0011_importbatch_differential_familia_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importbatch",
+            name="checkpoint_chunk",
+            field=models.IntegerField(
+                default=0, verbose_name="Último Chunk Confirmado"
+            ),
+        ),
+        migrations.AddField(
+            model_name="importbatch",
+            name="checkpoint_offset",
+            field=models.BigIntegerField(default=0, verbose_name="Checkpoint (byte)"),
+        ),
+    ]
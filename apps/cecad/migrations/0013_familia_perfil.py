@@ -0,0 +1,97 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def preencher_perfil(apps, schema_editor):
+    """Calcula o perfil das famílias já importadas (mesma lógica de services/familia_profile.py)."""
+    Familia = apps.get_model("cecad", "Familia")
+    Pessoa = apps.get_model("cecad", "Pessoa")
+
+    def contar(qs):
+        return Coalesce(
+            Subquery(
+                qs.order_by()
+                .values("familia_id")
+                .annotate(total=Count("id"))
+                .values("total")
+            ),
+            0,
+        )
+
+    membros = Pessoa.objects.filter(familia_id=OuterRef("pk"))
+    rf = membros.filter(cod_parentesco_rf_pessoa=1).order_by("id")
+    com_nascimento = membros.filter(dat_nasc_pessoa__isnull=False)
+    Familia.objects.update(
+        num_membros=contar(membros),
+        num_filhos=contar(membros.filter(cod_parentesco_rf_pessoa=3)),
+        rf_pessoa_id=Subquery(rf.values("id")[:1]),
+        rf_sexo=Coalesce(Subquery(rf.values("cod_sexo_pessoa")[:1]), Value("")),
+        tem_conjuge=Exists(membros.filter(cod_parentesco_rf_pessoa=2)),
+        dat_nasc_mais_novo=Subquery(
+            com_nascimento.order_by("-dat_nasc_pessoa").values("dat_nasc_pessoa")[:1]
+        ),
+        dat_nasc_mais_velho=Subquery(
+            com_nascimento.order_by("dat_nasc_pessoa").values("dat_nasc_pessoa")[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cecad", "0012_importbatch_checkpoint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="familia",
+            name="dat_nasc_mais_novo",
+            field=models.DateField(
+                blank=True, null=True, verbose_name="Nascimento do Membro Mais Novo"
+            ),
+        ),
+        migrations.AddField(
+            model_name="familia",
+            name="dat_nasc_mais_velho",
+            field=models.DateField(
+                blank=True, null=True, verbose_name="Nascimento do Membro Mais Velho"
+            ),
+        ),
+        migrations.AddField(
+            model_name="familia",
+            name="num_filhos",
+            field=models.IntegerField(default=0, verbose_name="Número de Filhos"),
+        ),
+        migrations.AddField(
+            model_name="familia",
+            name="num_membros",
+            field=models.IntegerField(default=0, verbose_name="Número de Membros"),
+        ),
+        migrations.AddField(
+            model_name="familia",
+            name="rf_pessoa",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="cecad.pessoa",
+                verbose_name="Responsável Familiar",
+            ),
+        ),
+        migrations.AddField(
+            model_name="familia",
+            name="rf_sexo",
+            field=models.CharField(blank=True, max_length=1, verbose_name="Sexo do RF"),
+        ),
+        migrations.AddField(
+            model_name="familia",
+            name="tem_conjuge",
+            field=models.BooleanField(default=False, verbose_name="Possui Cônjuge"),
+        ),
+        migrations.RunPython(preencher_perfil, migrations.RunPython.noop),
+    ]
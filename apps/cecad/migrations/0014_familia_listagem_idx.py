@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cecad", "0013_familia_perfil"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="familia",
+            index=models.Index(
+                fields=["-dat_atual_fam", "-id"], name="familia_listagem_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:31
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalizar_nome(texto):
+    """Mesma regra de apps.cecad.models.normalizar_nome."""
+    decomposto = unicodedata.normalize("NFKD", texto or "")
+    sem_acento = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", sem_acento).strip().upper()
+
+
+def preencher_nome_busca(apps, schema_editor):
+    Pessoa = apps.get_model("cecad", "Pessoa")
+    lote = []
+    for pessoa in Pessoa.objects.only("id", "nom_pessoa").iterator(chunk_size=5000):
+        pessoa.nom_pessoa_busca = normalizar_nome(pessoa.nom_pessoa)
+        lote.append(pessoa)
+        if len(lote) >= 5000:
+            Pessoa.objects.bulk_update(lote, ["nom_pessoa_busca"])
+            lote = []
+    if lote:
+        Pessoa.objects.bulk_update(lote, ["nom_pessoa_busca"])
+
+
+def criar_indice(apps, schema_editor):
+    """Trigram (busca por trecho) no PostgreSQL; índice de prefixo nos demais bancos."""
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS pessoa_nome_busca_trgm "
+            "ON cecad_pessoa USING gin (nom_pessoa_busca gin_trgm_ops)"
+        )
+    else:
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS pessoa_nome_busca_idx "
+            "ON cecad_pessoa (nom_pessoa_busca)"
+        )
+
+
+def remover_indice(apps, schema_editor):
+    schema_editor.execute("DROP INDEX IF EXISTS pessoa_nome_busca_trgm")
+    schema_editor.execute("DROP INDEX IF EXISTS pessoa_nome_busca_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cecad", "0014_familia_listagem_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pessoa",
+            name="nom_pessoa_busca",
+            field=models.CharField(
+                blank=True,
+                default="",
+                editable=False,
+                max_length=255,
+                verbose_name="Nome (busca)",
+            ),
+        ),
+        migrations.RunPython(preencher_nome_busca, migrations.RunPython.noop),
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Substr
+
+
+def preencher_domicilios(apps, schema_editor):
+    """Mesma lógica de services/domicilios.py: código e contagens por lote."""
+    Familia = apps.get_model("cecad", "Familia")
+    DomicilioContagem = apps.get_model("cecad", "DomicilioContagem")
+    Familia.objects.update(cod_domicilio=Substr("cod_familiar_fam", 1, 8))
+    contagens = (
+        Familia.objects.order_by()
+        .values_list("import_batch_id", "cod_domicilio")
+        .annotate(total=Count("id"))
+    )
+    DomicilioContagem.objects.bulk_create(
+        [
+            DomicilioContagem(
+                import_batch_id=import_batch_id,
+                cod_domicilio=cod_domicilio,
+                total=total,
+            )
+            for import_batch_id, cod_domicilio, total in contagens.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cecad", "0015_pessoa_nome_busca"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DomicilioContagem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "cod_domicilio",
+                    models.CharField(max_length=8, verbose_name="Código do Domicílio"),
+                ),
+                ("total", models.IntegerField(default=0, verbose_name="Famílias")),
+            ],
+            options={
+                "verbose_name": "Contagem por Domicílio",
+                "verbose_name_plural": "Contagens por Domicílio",
+            },
+        ),
+        migrations.AddField(
+            model_name="familia",
+            name="cod_domicilio",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=8,
+                verbose_name="Código do Domicílio",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="familia",
+            index=models.Index(
+                fields=["cod_domicilio", "import_batch"], name="familia_domicilio_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="domiciliocontagem",
+            name="import_batch",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="domicilios",
+                to="cecad.importbatch",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="domiciliocontagem",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("import_batch__isnull", False)),
+                fields=("cod_domicilio", "import_batch"),
+                name="unique_domicilio_per_batch",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="domiciliocontagem",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("import_batch__isnull", True)),
+                fields=("cod_domicilio",),
+                name="unique_domicilio_manual",
+            ),
+        ),
+        migrations.RunPython(preencher_domicilios, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,17 @@
+import re
+import unicodedata
+
 from django.db import models
 from django.conf import settings
 
+
+def normalizar_nome(texto):
+    """Forma de busca de um nome: sem acentos, maiúsculo e com espaços simples."""
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    sem_acento = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', sem_acento).strip().upper()
+
+
 class ImportBatch(models.Model):
     STATUS_CHOICES = [
         ('processing', 'Processando'),
@@ -15,8 +26,21 @@ class ImportBatch(models.Model):
     batch_type = models.CharField("Tipo de Lote", max_length=20, choices=[('full', 'Importação Completa'), ('correction', 'Correção')], default='full')
     total_rows = models.IntegerField("Total de Linhas", default=0)
     processed_rows = models.IntegerField("Linhas Processadas", default=0)
+    file_size = models.BigIntegerField("Tamanho do Arquivo (bytes)", default=0)
+    processed_bytes = models.BigIntegerField("Bytes Processados", default=0)
     error_message = models.TextField("Mensagem de Erro", blank=True)
 
+    # Checkpoint da importação: offset do fim do último chunk confirmado no banco
+    checkpoint_offset = models.BigIntegerField("Checkpoint (byte)", default=0)
+    checkpoint_chunk = models.IntegerField("Último Chunk Confirmado", default=0)
+
+    # Importação diferencial: lote usado como referência e classificação das famílias
+    base_batch = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='lotes_diferenciais', verbose_name="Lote de Referência")
+    familias_novas = models.IntegerField("Famílias Novas", default=0)
+    familias_alteradas = models.IntegerField("Famílias Alteradas", default=0)
+    familias_inalteradas = models.IntegerField("Famílias Inalteradas", default=0)
+    familias_removidas = models.IntegerField("Famílias Removidas", default=0)
+
     class Meta:
         verbose_name = "Lote de Importação"
         verbose_name_plural = "Lotes de Importação"
@@ -25,10 +49,26 @@ class ImportBatch(models.Model):
     def __str__(self):
         return f"Importação {self.pk} - {self.imported_at.strftime('%d/%m/%Y %H:%M')}"
 
+    @property
+    def can_resume(self):
+        """Lote interrompido que pode ser retomado a partir do arquivo original."""
+        return self.status == 'error' and bool(self.original_file)
+
+    @property
+    def progress_percent(self):
+        """Percentual de progresso por linhas ou, na leitura em passada única, por bytes."""
+        if self.total_rows > 0:
+            return int((self.processed_rows / self.total_rows) * 100)
+        if self.file_size > 0:
+            return int((self.processed_bytes / self.file_size) * 100)
+        return 0
+
 
 class Familia(models.Model):
     import_batch = models.ForeignKey(ImportBatch, on_delete=models.CASCADE, related_name="familias", verbose_name="Lote de Importação", null=True, blank=True)
     cod_familiar_fam = models.CharField("Código Familiar", max_length=11)
+    # Domicílio: 8 primeiros dígitos do código familiar (ver services/domicilios.py)
+    cod_domicilio = models.CharField("Código do Domicílio", max_length=8, blank=True, editable=False)
     dat_atual_fam = models.DateField("Data de Atualização")
     vlr_renda_media_fam = models.DecimalField("Renda Média Familiar", max_digits=10, decimal_places=2, null=True, blank=True)
     vlr_renda_total_fam = models.DecimalField("Renda Total Familiar", max_digits=10, decimal_places=2, null=True, blank=True)
@@ -43,6 +83,18 @@ class Familia(models.Model):
     nom_localidade_fam = models.CharField("Bairro/Localidade", max_length=100, blank=True, db_index=True)
     num_cep_logradouro_fam = models.CharField("CEP", max_length=8, blank=True)
 
+    # Hash do conteúdo normalizado da família e membros (importação diferencial)
+    content_hash = models.CharField("Impressão Digital do Conteúdo", max_length=64, blank=True)
+
+    # Perfil denormalizado a partir dos membros (ver services/familia_profile.py)
+    num_membros = models.IntegerField("Número de Membros", default=0)
+    num_filhos = models.IntegerField("Número de Filhos", default=0)
+    rf_pessoa = models.ForeignKey('Pessoa', on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Responsável Familiar")
+    rf_sexo = models.CharField("Sexo do RF", max_length=1, blank=True)
+    tem_conjuge = models.BooleanField("Possui Cônjuge", default=False)
+    dat_nasc_mais_novo = models.DateField("Nascimento do Membro Mais Novo", null=True, blank=True)
+    dat_nasc_mais_velho = models.DateField("Nascimento do Membro Mais Velho", null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -50,6 +102,11 @@ class Familia(models.Model):
         verbose_name = "Família"
         verbose_name_plural = "Famílias"
         ordering = ["-dat_atual_fam"]
+        indexes = [
+            # Paginação por cursor da listagem (dat_atual_fam, id)
+            models.Index(fields=['-dat_atual_fam', '-id'], name='familia_listagem_idx'),
+            models.Index(fields=['cod_domicilio', 'import_batch'], name='familia_domicilio_idx'),
+        ]
         # Permitir múltiplas famílias com mesmo código se forem de batches diferentes ou sem batch
         constraints = [
             models.UniqueConstraint(
@@ -67,35 +124,45 @@ class Familia(models.Model):
     def __str__(self):
         return f"{self.cod_familiar_fam} - Renda: {self.vlr_renda_media_fam}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Domicílio de origem, para atualizar a contagem quando código ou lote mudam
+        instance._domicilio_original = (instance.__dict__.get('import_batch_id'), instance.__dict__.get('cod_domicilio'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.cod_domicilio = (self.cod_familiar_fam or '')[:8]
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'cod_familiar_fam' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'cod_domicilio'}
+        super().save(*args, **kwargs)
+
     def tem_criancas(self):
         """Verifica se a família possui crianças/adolescentes (menores de 18 anos)."""
         from datetime import date
         today = date.today()
         
-        # Buscar membros com data de nascimento
-        for membro in self.membros.all():
-            if membro.dat_nasc_pessoa:
-                age = today.year - membro.dat_nasc_pessoa.year - (
-                    (today.month, today.day) < (membro.dat_nasc_pessoa.month, membro.dat_nasc_pessoa.day)
-                )
-                if age < 18:
-                    return True
+        # O membro mais novo decide: basta ele ser menor de idade
+        nascimento = self.dat_nasc_mais_novo
+        if nascimento:
+            age = today.year - nascimento.year - (
+                (today.month, today.day) < (nascimento.month, nascimento.day)
+            )
+            return age < 18
         return False
 
     def is_rf_homem(self):
         """Verifica se o Responsável Familiar é do sexo masculino."""
-        rf = self.membros.filter(cod_parentesco_rf_pessoa=1).first()
-        if rf and rf.cod_sexo_pessoa == '1':
-            return True
-        return False
+        return self.rf_sexo == '1'
 
     def is_unipessoal(self):
         """Verifica se é uma família unipessoal."""
-        return self.qtde_pessoas == 1 or self.membros.count() == 1
+        return self.qtde_pessoas == 1 or self.num_membros == 1
 
     def get_responsavel_familiar(self):
         """Retorna o Responsável Familiar (cod_parentesco_rf_pessoa=1) ou None."""
-        return self.membros.filter(cod_parentesco_rf_pessoa=1).first()
+        return self.rf_pessoa
     
     @property
     def responsavel_familiar(self):
@@ -107,6 +174,8 @@ class Pessoa(models.Model):
     familia = models.ForeignKey(Familia, on_delete=models.CASCADE, related_name="membros")
     num_nis_pessoa_atual = models.CharField("NIS", max_length=11)
     nom_pessoa = models.CharField("Nome", max_length=255)
+    # normalizar_nome(nom_pessoa), preenchido no save() e na importação
+    nom_pessoa_busca = models.CharField("Nome (busca)", max_length=255, blank=True, default='', editable=False)
     num_cpf_pessoa = models.CharField("CPF", max_length=11, null=True, blank=True)
     dat_nasc_pessoa = models.DateField("Data de Nascimento", null=True, blank=True)
     cod_parentesco_rf_pessoa = models.IntegerField("Código Parentesco", choices=[
@@ -136,9 +205,25 @@ class Pessoa(models.Model):
         verbose_name = "Pessoa"
         verbose_name_plural = "Pessoas"
         unique_together = ['num_nis_pessoa_atual', 'familia']
+        # O índice trigram (PostgreSQL) ou de prefixo (demais bancos) sobre
+        # nom_pessoa_busca é criado na migração 0015, conforme o banco.
 
     def __str__(self):
         return f"{self.nom_pessoa} ({self.num_nis_pessoa_atual})"
+
+    def save(self, *args, **kwargs):
+        self.nom_pessoa_busca = normalizar_nome(self.nom_pessoa)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'nom_pessoa' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'nom_pessoa_busca'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Família de origem, usada para atualizar o perfil em transferências
+        instance._familia_id_original = instance.__dict__.get('familia_id')
+        return instance
     
     @property
     def import_batch(self):
@@ -146,6 +231,35 @@ class Pessoa(models.Model):
         return self.familia.import_batch if self.familia else None
 
 
+class DomicilioContagem(models.Model):
+    """
+    Quantidade de famílias por domicílio em cada lote, mantida pela importação
+    e pelos signals de Familia. Lote nulo = famílias cadastradas manualmente.
+    """
+    import_batch = models.ForeignKey(ImportBatch, on_delete=models.CASCADE, related_name="domicilios", null=True, blank=True)
+    cod_domicilio = models.CharField("Código do Domicílio", max_length=8)
+    total = models.IntegerField("Famílias", default=0)
+
+    class Meta:
+        verbose_name = "Contagem por Domicílio"
+        verbose_name_plural = "Contagens por Domicílio"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cod_domicilio', 'import_batch'],
+                name='unique_domicilio_per_batch',
+                condition=models.Q(import_batch__isnull=False)
+            ),
+            models.UniqueConstraint(
+                fields=['cod_domicilio'],
+                name='unique_domicilio_manual',
+                condition=models.Q(import_batch__isnull=True)
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.cod_domicilio}: {self.total}"
+
+
 class Beneficio(models.Model):
     familia = models.ForeignKey(Familia, on_delete=models.CASCADE, related_name="beneficios")
     tipo_beneficio = models.CharField("Tipo de Benefício", max_length=100)
@@ -0,0 +1,52 @@
+"""
+Busca de famílias e pessoas por nome.
+
+A comparação é feita sobre `Pessoa.nom_pessoa_busca` (ver `normalizar_nome`):
+"jose", "JOSÉ" e "José " encontram o mesmo registro. A busca é por trecho do
+nome em qualquer banco (um sobrenome encontra a pessoa); no PostgreSQL ela é
+atendida pelo índice trigram (pg_trgm), nos demais é uma varredura.
+
+As buscas de família usam EXISTS sobre os membros em vez de JOIN + DISTINCT,
+então não duplicam linhas nem atrapalham a ordenação e a paginação:
+
+    Validacao.objects.filter(familia_com_membro_nome(q, 'familia_id'))
+"""
+from django.db.models import Exists, OuterRef, Q
+
+from apps.cecad.models import Pessoa, normalizar_nome
+
+
+def filtro_nome(texto, campo='nom_pessoa_busca'):
+    """Q sobre o nome normalizado de Pessoa; um termo vazio não encontra nada."""
+    termo = normalizar_nome(texto)
+    if not termo:
+        return Q(pk__in=[])
+    return Q(**{f'{campo}__contains': termo})
+
+
+def buscar_pessoas(texto):
+    return Pessoa.objects.filter(filtro_nome(texto))
+
+
+def familia_com_membro_nome(texto, familia_ref='pk'):
+    """EXISTS: a família referenciada por OuterRef(familia_ref) tem membro com o nome."""
+    return Exists(Pessoa.objects.filter(filtro_nome(texto), familia_id=OuterRef(familia_ref)))
+
+
+def familia_com_membro_nis(nis, familia_ref='pk'):
+    """EXISTS: a família tem membro cujo NIS contém `nis`."""
+    return Exists(Pessoa.objects.filter(num_nis_pessoa_atual__contains=nis, familia_id=OuterRef(familia_ref)))
+
+
+def filtro_busca_familia(texto, familia_ref='pk', codigo_campo='cod_familiar_fam'):
+    """
+    Busca livre de família: código familiar, nome ou NIS de algum membro.
+    `familia_ref` e `codigo_campo` permitem usar a partir de Validacao
+    ('familia_id', 'familia__cod_familiar_fam').
+    """
+    texto = texto.strip()
+    return (
+        Q(**{f'{codigo_campo}__icontains': texto})
+        | familia_com_membro_nome(texto, familia_ref)
+        | familia_com_membro_nis(texto, familia_ref)
+    )
@@ -0,0 +1,213 @@
+"""
+Importação CECAD via PostgreSQL COPY.
+
+As linhas do CSV são normalizadas com os mesmos parsers do CecadImporter e
+enviadas por COPY FROM STDIN para uma tabela de staging UNLOGGED. Em seguida
+Familia, Pessoa e Validacao são gravadas com instruções INSERT ... SELECT
+set-based, em uma única transação.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.cecad.models import Familia, Pessoa
+from apps.cecad.services.importer import CecadImporter, FAMILIA_BULK_FIELDS, PESSOA_BULK_FIELDS, colunas_padrao
+from apps.core.models import Validacao
+
+# Colunas copiadas para a staging (sem os campos de auditoria)
+FAMILIA_STAGING_FIELDS = [f for f in FAMILIA_BULK_FIELDS if f != 'updated_at']
+PESSOA_STAGING_FIELDS = [f for f in PESSOA_BULK_FIELDS if f != 'updated_at']
+
+
+class PostgresCopyImporter(CecadImporter):
+    """Backend de importação completa para PostgreSQL (COPY + staging)."""
+
+    # O merge é uma única transação: uma nova execução recomeça do início
+    supports_resume = False
+
+    def __init__(self, file_path, import_batch, **kwargs):
+        kwargs.pop('bulk', None)
+        super().__init__(file_path, import_batch, **kwargs)
+
+    @property
+    def staging_table(self):
+        return f'cecad_import_staging_{self.import_batch.pk}'
+
+    def _process_reader(self, reader, total_rows):
+        self._create_staging()
+        try:
+            self._copy_to_staging(reader)
+            with transaction.atomic():
+                self._merge_staging()
+        finally:
+            self._drop_staging()
+
+    # ------------------------------------------------------------------
+    # Staging
+    # ------------------------------------------------------------------
+
+    def _staging_columns(self):
+        """Retorna pares (coluna, tipo) da staging, com tipos vindos dos models."""
+        columns = [
+            ('linha', 'integer'),
+            ('cod_familiar_fam', Familia._meta.get_field('cod_familiar_fam').db_type(connection)),
+        ]
+        columns += [
+            (name, Familia._meta.get_field(name).db_type(connection))
+            for name in FAMILIA_STAGING_FIELDS
+        ]
+        columns.append(
+            ('num_nis_pessoa_atual', Pessoa._meta.get_field('num_nis_pessoa_atual').db_type(connection))
+        )
+        columns += [
+            (name, Pessoa._meta.get_field(name).db_type(connection))
+            for name in PESSOA_STAGING_FIELDS
+        ]
+        return columns
+
+    def _create_staging(self):
+        qn = connection.ops.quote_name
+        definition = ', '.join(f'{qn(name)} {db_type}' for name, db_type in self._staging_columns())
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {qn(self.staging_table)}')
+            cursor.execute(f'CREATE UNLOGGED TABLE {qn(self.staging_table)} ({definition})')
+
+    def _drop_staging(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {connection.ops.quote_name(self.staging_table)}')
+
+    def _copy_to_staging(self, reader):
+        """
+        Envia as linhas normalizadas para a staging com COPY FROM STDIN.
+
+        Cada chunk é um COPY separado para que o progresso possa ser
+        gravado entre eles (a conexão fica ocupada durante o COPY).
+        """
+        chunk = []
+        for linha, row in enumerate(reader, 1):
+            chunk.append((linha, row))
+            if len(chunk) >= self.chunk_size:
+                self._copy_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._copy_chunk(chunk)
+
+    def _copy_chunk(self, chunk):
+        qn = connection.ops.quote_name
+        columns = ', '.join(qn(name) for name, _ in self._staging_columns())
+        sql = f'COPY {qn(self.staging_table)} ({columns}) FROM STDIN'
+
+        with connection.cursor() as cursor:
+            with cursor.copy(sql) as copy:
+                for linha, row in chunk:
+                    cod_familiar = row.get('d.cod_familiar_fam')
+                    if not cod_familiar:
+                        continue
+                    familia = self._parse_familia(row)
+                    values = [linha, cod_familiar]
+                    values += [familia[name] for name in FAMILIA_STAGING_FIELDS]
+
+                    nis = row.get('p.num_nis_pessoa_atual') or None
+                    values.append(nis)
+                    if nis:
+                        pessoa = self._parse_pessoa(row)
+                        values += [pessoa[name] for name in PESSOA_STAGING_FIELDS]
+                    else:
+                        values += [None] * len(PESSOA_STAGING_FIELDS)
+                    copy.write_row(values)
+
+        self.import_batch.processed_rows += len(chunk)
+        self._save_progress()
+
+    def _save_progress(self):
+        """Persiste linhas e bytes lidos após cada COPY (sem checkpoint: não há retomada)."""
+        if self._lines is not None:
+            self.import_batch.processed_bytes = self._lines.offset
+        self.import_batch.save(update_fields=['processed_rows', 'processed_bytes'])
+        self._notify_progress()
+
+    # ------------------------------------------------------------------
+    # Merge
+    # ------------------------------------------------------------------
+
+    def _merge_staging(self):
+        """Grava Familia, Pessoa e Validacao a partir da staging (last row wins)."""
+        qn = connection.ops.quote_name
+        staging = qn(self.staging_table)
+        familia_table = qn(Familia._meta.db_table)
+        pessoa_table = qn(Pessoa._meta.db_table)
+        validacao_table = qn(Validacao._meta.db_table)
+        now = timezone.now()
+        batch_id = self.import_batch.pk
+
+        fam_cols = [qn(name) for name in FAMILIA_STAGING_FIELDS]
+        pes_cols = [qn(name) for name in PESSOA_STAGING_FIELDS]
+        fam_padrao = colunas_padrao(
+            Familia, {'import_batch_id', 'cod_familiar_fam', *FAMILIA_STAGING_FIELDS, 'created_at', 'updated_at'}
+        )
+        pes_padrao = colunas_padrao(
+            Pessoa, {'familia_id', 'num_nis_pessoa_atual', *PESSOA_STAGING_FIELDS, 'created_at', 'updated_at'}
+        )
+        val_padrao = colunas_padrao(
+            Validacao, {'familia_id', 'status', 'created_at', 'updated_at'}
+        )
+
+        def colunas_extras(padrao):
+            return ''.join(f', {qn(coluna)}' for coluna, _ in padrao)
+
+        def valores_extras(padrao):
+            return ', %s' * len(padrao)
+
+        def parametros(padrao):
+            return [valor for _, valor in padrao]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {familia_table}
+                    (import_batch_id, cod_familiar_fam, {', '.join(fam_cols)}, created_at, updated_at
+                     {colunas_extras(fam_padrao)})
+                SELECT DISTINCT ON (s.cod_familiar_fam)
+                    %s, s.cod_familiar_fam, {', '.join('s.' + c for c in fam_cols)}, %s, %s
+                    {valores_extras(fam_padrao)}
+                FROM {staging} s
+                ORDER BY s.cod_familiar_fam, s.linha DESC
+                ON CONFLICT (cod_familiar_fam, import_batch_id) WHERE import_batch_id IS NOT NULL
+                DO UPDATE SET {', '.join(f'{c} = EXCLUDED.{c}' for c in fam_cols)},
+                    updated_at = EXCLUDED.updated_at
+                """,
+                [batch_id, now, now, *parametros(fam_padrao)],
+            )
+
+            cursor.execute(
+                f"""
+                INSERT INTO {pessoa_table}
+                    (familia_id, num_nis_pessoa_atual, {', '.join(pes_cols)}, created_at, updated_at
+                     {colunas_extras(pes_padrao)})
+                SELECT DISTINCT ON (s.cod_familiar_fam, s.num_nis_pessoa_atual)
+                    f.id, s.num_nis_pessoa_atual, {', '.join('s.' + c for c in pes_cols)}, %s, %s
+                    {valores_extras(pes_padrao)}
+                FROM {staging} s
+                JOIN {familia_table} f
+                    ON f.cod_familiar_fam = s.cod_familiar_fam AND f.import_batch_id = %s
+                WHERE s.num_nis_pessoa_atual IS NOT NULL
+                ORDER BY s.cod_familiar_fam, s.num_nis_pessoa_atual, s.linha DESC
+                ON CONFLICT (num_nis_pessoa_atual, familia_id)
+                DO UPDATE SET {', '.join(f'{c} = EXCLUDED.{c}' for c in pes_cols)},
+                    updated_at = EXCLUDED.updated_at
+                """,
+                [now, now, *parametros(pes_padrao), batch_id],
+            )
+
+            # Validacao não tem restrição única por família, então o
+            # anti-join substitui o ON CONFLICT para criar só as que faltam.
+            cursor.execute(
+                f"""
+                INSERT INTO {validacao_table}
+                    (familia_id, status, created_at, updated_at {colunas_extras(val_padrao)})
+                SELECT f.id, %s, %s, %s {valores_extras(val_padrao)}
+                FROM {familia_table} f
+                WHERE f.import_batch_id = %s
+                  AND NOT EXISTS (SELECT 1 FROM {validacao_table} v WHERE v.familia_id = f.id)
+                """,
+                [Validacao._meta.get_field('status').default, now, now, *parametros(val_padrao), batch_id],
+            )
@@ -0,0 +1,342 @@
+"""
+Importação CECAD diferencial.
+
+Cada família recebe um hash (content_hash) calculado sobre os campos
+normalizados da família e dos membros. O arquivo novo é comparado com o
+último lote completo concluído e as famílias são classificadas em novas,
+alteradas, inalteradas e removidas (contagens gravadas no ImportBatch).
+
+O lote novo tem todas as famílias do arquivo, como na importação completa, e
+o lote de referência não é alterado (histórico, comparação entre lotes e
+estatísticas por lote continuam valendo). Só as famílias novas e alteradas
+são montadas no Python; as inalteradas são copiadas do lote de referência
+com INSERT ... SELECT (família, membros e validação), então o trabalho no
+Python cresce com as mudanças e não com o tamanho do arquivo.
+
+As famílias copiadas recebem Validacao pendente, como na importação
+completa. Com `manter_validacoes=True` recebem uma cópia da validação do
+lote de referência (status, pontuação, observações e critérios avaliados).
+"""
+import hashlib
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.cecad.models import Familia, ImportBatch, Pessoa
+from apps.cecad.services.familia_profile import atualizar_perfil_familias, perfil_expressions
+from apps.cecad.services.importer import CecadImporter, FAMILIA_BULK_FIELDS, PESSOA_BULK_FIELDS, colunas_padrao
+from apps.core.models import Validacao, ValidacaoCriterio
+
+# Campos que compõem o hash (sem os campos de auditoria)
+FAMILIA_HASH_FIELDS = [f for f in FAMILIA_BULK_FIELDS if f != 'updated_at']
+# nom_pessoa_busca deriva de nom_pessoa e fica fora do hash
+PESSOA_HASH_FIELDS = [f for f in PESSOA_BULK_FIELDS if f not in ('updated_at', 'nom_pessoa_busca')]
+
+# Campos da validação anterior mantidos com `manter_validacoes` (sem a reserva)
+VALIDACAO_COPIA_FIELDS = ['operador_id', 'status', 'observacoes', 'pontuacao_total', 'data_validacao']
+
+
+def _colunas_copiadas(model, excluir):
+    """Colunas do model copiadas como estão de uma linha para outra."""
+    return [
+        field.column for field in model._meta.concrete_fields
+        if not field.primary_key and field.column not in excluir
+    ]
+
+
+def _normalize(value):
+    if isinstance(value, Decimal):
+        return f'{value:.2f}'
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def familia_fingerprint(familia, pessoas):
+    """
+    Calcula o hash de conteúdo de uma família.
+
+    Args:
+        familia: dict com FAMILIA_HASH_FIELDS
+        pessoas: dict NIS -> dict com PESSOA_HASH_FIELDS
+
+    A ordem dos membros no arquivo não altera o resultado.
+    """
+    payload = [
+        [_normalize(familia[name]) for name in FAMILIA_HASH_FIELDS],
+        [
+            [nis] + [_normalize(dados[name]) for name in PESSOA_HASH_FIELDS]
+            for nis, dados in sorted(pessoas.items())
+        ],
+    ]
+    return hashlib.sha256(json.dumps(payload, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+class DifferentialImporter(CecadImporter):
+    """
+    Importação completa que classifica as famílias em relação ao lote de
+    referência e, com `manter_validacoes=True`, preserva as validações das
+    famílias inalteradas.
+    """
+
+    # A comparação precisa do arquivo inteiro; uma nova execução pula as
+    # famílias que já foram gravadas no lote antes da falha.
+    supports_resume = False
+
+    def __init__(self, file_path, import_batch, base_batch=None, manter_validacoes=False, **kwargs):
+        kwargs.pop('bulk', None)
+        super().__init__(file_path, import_batch, bulk=True, **kwargs)
+        self.base_batch = base_batch
+        self.manter_validacoes = manter_validacoes
+
+    def _process_reader(self, reader, total_rows):
+        familias, pessoas, linhas, total = self._read_families(reader)
+        self.import_batch.total_rows = total
+
+        ja_no_lote = set(
+            Familia.objects.filter(import_batch=self.import_batch).values_list('cod_familiar_fam', flat=True)
+        )
+        base_batch = self.base_batch or self.import_batch.base_batch or ImportBatch.objects.filter(
+            status='completed', batch_type='full'
+        ).exclude(pk=self.import_batch.pk).first()
+        self.import_batch.base_batch = base_batch
+
+        fingerprints = {cod: familia_fingerprint(familias[cod], pessoas[cod]) for cod in familias}
+        base = self._load_base_fingerprints(base_batch) if base_batch else {}
+
+        gravar, copiar = [], []
+        novas = alteradas = inalteradas = 0
+        for cod, fingerprint in fingerprints.items():
+            anterior = base.get(cod)
+            inalterada = anterior is not None and anterior[1] == fingerprint
+            if anterior is None:
+                novas += 1
+            elif inalterada:
+                inalteradas += 1
+            else:
+                alteradas += 1
+            if cod in ja_no_lote:
+                continue
+            if inalterada:
+                # Família inalterada -> id da versão no lote de referência
+                copiar.append((cod, anterior[0]))
+            else:
+                gravar.append(cod)
+
+        # O lote de referência não muda, então a classificação é a mesma numa reexecução
+        self.import_batch.familias_novas = novas
+        self.import_batch.familias_alteradas = alteradas
+        self.import_batch.familias_inalteradas = inalteradas
+        self.import_batch.familias_removidas = len(base.keys() - fingerprints.keys())
+        self.import_batch.save()
+
+        for start in range(0, len(gravar), self.chunk_size):
+            cods = gravar[start:start + self.chunk_size]
+            with transaction.atomic():
+                self._create_familias(cods, familias, pessoas, fingerprints)
+            self.import_batch.processed_rows += sum(linhas[cod] for cod in cods)
+            self._publish_progress()
+
+        for start in range(0, len(copiar), self.chunk_size):
+            bloco = copiar[start:start + self.chunk_size]
+            with transaction.atomic():
+                self._copiar_inalteradas([cod for cod, _ in bloco], [pk for _, pk in bloco])
+            self.import_batch.processed_rows += sum(linhas[cod] for cod, _ in bloco)
+            self._publish_progress()
+
+        # Linhas sem código familiar são ignoradas, mas contam como processadas
+        if self.import_batch.processed_rows != total:
+            self.import_batch.processed_rows = total
+            self._publish_progress()
+
+    def _publish_progress(self):
+        # O arquivo já foi lido por inteiro: só as linhas gravadas avançam
+        self.import_batch.save(update_fields=['processed_rows'])
+        self._notify_progress()
+
+    def _atualizar_perfis(self):
+        # O perfil das famílias é atualizado a cada chunk gravado
+        pass
+
+    def _read_families(self, reader):
+        """
+        Agrupa o arquivo por família (a última linha de cada família/pessoa
+        prevalece). Retorna (familias, pessoas, linhas por família, total de linhas).
+        """
+        familias, pessoas, linhas = {}, {}, {}
+        total = 0
+        for row in reader:
+            total += 1
+            cod_familiar = row.get('d.cod_familiar_fam')
+            if not cod_familiar:
+                continue
+            familias[cod_familiar] = self._parse_familia(row)
+            membros = pessoas.setdefault(cod_familiar, {})
+            linhas[cod_familiar] = linhas.get(cod_familiar, 0) + 1
+            nis = row.get('p.num_nis_pessoa_atual')
+            if nis:
+                membros[nis] = self._parse_pessoa(row)
+        return familias, pessoas, linhas, total
+
+    def _load_base_fingerprints(self, base_batch):
+        """
+        Retorna {cod_familiar_fam: (id, content_hash)} do lote de referência.
+
+        Famílias importadas antes da existência do hash têm o valor calculado
+        a partir do banco e gravado, para que a próxima comparação seja direta.
+        """
+        base = {
+            cod: (pk, content_hash)
+            for pk, cod, content_hash in Familia.objects.filter(import_batch=base_batch)
+            .values_list('id', 'cod_familiar_fam', 'content_hash')
+        }
+
+        sem_hash = [pk for pk, content_hash in base.values() if not content_hash]
+        for start in range(0, len(sem_hash), self.chunk_size):
+            ids = sem_hash[start:start + self.chunk_size]
+            membros = {}
+            for dados in Pessoa.objects.filter(familia_id__in=ids).values(
+                'familia_id', 'num_nis_pessoa_atual', *PESSOA_HASH_FIELDS
+            ):
+                familia_id = dados.pop('familia_id')
+                membros.setdefault(familia_id, {})[dados.pop('num_nis_pessoa_atual')] = dados
+
+            atualizadas = []
+            for dados in Familia.objects.filter(pk__in=ids).values('id', 'cod_familiar_fam', *FAMILIA_HASH_FIELDS):
+                familia = Familia(
+                    id=dados['id'],
+                    content_hash=familia_fingerprint(dados, membros.get(dados['id'], {})),
+                )
+                base[dados['cod_familiar_fam']] = (familia.pk, familia.content_hash)
+                atualizadas.append(familia)
+            Familia.objects.bulk_update(atualizadas, ['content_hash'], batch_size=self.chunk_size)
+
+        return base
+
+    def _create_familias(self, cods, familias, pessoas, fingerprints):
+        """Cria no lote novo as famílias novas e alteradas de `cods`, com membros e Validacao pendente."""
+        novas = [
+            Familia(
+                import_batch=self.import_batch,
+                cod_familiar_fam=cod,
+                content_hash=fingerprints[cod],
+                **familias[cod]
+            )
+            for cod in cods
+        ]
+        Familia.objects.bulk_create(novas, batch_size=self.chunk_size)
+        self._map_new_familias(novas)
+        Validacao.objects.bulk_create(
+            [Validacao(familia_id=self._familia_ids[cod]) for cod in cods], batch_size=self.chunk_size
+        )
+        Pessoa.objects.bulk_create(
+            [
+                Pessoa(familia_id=self._familia_ids[cod], num_nis_pessoa_atual=nis, **dados)
+                for cod in cods
+                for nis, dados in pessoas[cod].items()
+            ],
+            batch_size=self.chunk_size,
+        )
+        atualizar_perfil_familias([f.pk for f in novas])
+
+    def _copiar_inalteradas(self, cods, base_ids):
+        """
+        Copia do lote de referência as famílias inalteradas (`base_ids`), com
+        membros e validação, em instruções INSERT ... SELECT: o número de
+        queries não depende da quantidade de famílias do bloco.
+        """
+        qn = connection.ops.quote_name
+        familia_table = qn(Familia._meta.db_table)
+        pessoa_table = qn(Pessoa._meta.db_table)
+        validacao_table = qn(Validacao._meta.db_table)
+        criterio_table = qn(ValidacaoCriterio._meta.db_table)
+        now = timezone.now()
+        batch_id = self.import_batch.pk
+        ids = ', '.join(['%s'] * len(base_ids))
+
+        # rf_pessoa aponta para um membro do lote de referência: é refeito abaixo
+        fam_cols = _colunas_copiadas(Familia, {'import_batch_id', 'rf_pessoa_id', 'created_at', 'updated_at'})
+        pes_cols = _colunas_copiadas(Pessoa, {'familia_id', 'created_at', 'updated_at'})
+        vc_cols = _colunas_copiadas(ValidacaoCriterio, {'validacao_id'})
+        # Família do lote novo correspondente à família do lote de referência (bf)
+        nova = f"JOIN {familia_table} nf ON nf.cod_familiar_fam = bf.cod_familiar_fam AND nf.import_batch_id = %s"
+        ultima_validacao = f"v.id = (SELECT MAX(v2.id) FROM {validacao_table} v2 WHERE v2.familia_id = bf.id)"
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {familia_table}
+                    (import_batch_id, {', '.join(qn(c) for c in fam_cols)}, created_at, updated_at)
+                SELECT %s, {', '.join('bf.' + qn(c) for c in fam_cols)}, %s, %s
+                FROM {familia_table} bf
+                WHERE bf.id IN ({ids})
+                """,
+                [batch_id, now, now, *base_ids],
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {pessoa_table}
+                    (familia_id, {', '.join(qn(c) for c in pes_cols)}, created_at, updated_at)
+                SELECT nf.id, {', '.join('p.' + qn(c) for c in pes_cols)}, %s, %s
+                FROM {pessoa_table} p
+                JOIN {familia_table} bf ON bf.id = p.familia_id
+                {nova}
+                WHERE bf.id IN ({ids})
+                ORDER BY p.id
+                """,
+                [now, now, batch_id, *base_ids],
+            )
+
+            if self.manter_validacoes:
+                val_padrao = colunas_padrao(
+                    Validacao, {'familia_id', *VALIDACAO_COPIA_FIELDS, 'created_at', 'updated_at'}
+                )
+                cursor.execute(
+                    f"""
+                    INSERT INTO {validacao_table}
+                        (familia_id, {', '.join(qn(c) for c in VALIDACAO_COPIA_FIELDS)}, created_at, updated_at
+                         {''.join(f', {qn(c)}' for c, _ in val_padrao)})
+                    SELECT nf.id, {', '.join('v.' + qn(c) for c in VALIDACAO_COPIA_FIELDS)}, %s, %s
+                        {', %s' * len(val_padrao)}
+                    FROM {validacao_table} v
+                    JOIN {familia_table} bf ON bf.id = v.familia_id
+                    {nova}
+                    WHERE bf.id IN ({ids}) AND {ultima_validacao}
+                    """,
+                    [now, now, *(valor for _, valor in val_padrao), batch_id, *base_ids],
+                )
+                cursor.execute(
+                    f"""
+                    INSERT INTO {criterio_table} (validacao_id, {', '.join(qn(c) for c in vc_cols)})
+                    SELECT nv.id, {', '.join('vc.' + qn(c) for c in vc_cols)}
+                    FROM {criterio_table} vc
+                    JOIN {validacao_table} v ON v.id = vc.validacao_id
+                    JOIN {familia_table} bf ON bf.id = v.familia_id
+                    {nova}
+                    JOIN {validacao_table} nv ON nv.familia_id = nf.id
+                    WHERE bf.id IN ({ids}) AND {ultima_validacao}
+                    """,
+                    [batch_id, *base_ids],
+                )
+
+            # Validação pendente para as que não receberam cópia (ou todas, sem manter_validacoes)
+            pendente_padrao = colunas_padrao(Validacao, {'familia_id', 'created_at', 'updated_at'})
+            cursor.execute(
+                f"""
+                INSERT INTO {validacao_table}
+                    (familia_id, created_at, updated_at {''.join(f', {qn(c)}' for c, _ in pendente_padrao)})
+                SELECT nf.id, %s, %s {', %s' * len(pendente_padrao)}
+                FROM {familia_table} bf
+                {nova}
+                WHERE bf.id IN ({ids})
+                  AND NOT EXISTS (SELECT 1 FROM {validacao_table} v WHERE v.familia_id = nf.id)
+                """,
+                [now, now, *(valor for _, valor in pendente_padrao), batch_id, *base_ids],
+            )
+
+        Familia.objects.filter(import_batch=self.import_batch, cod_familiar_fam__in=cods).update(
+            rf_pessoa_id=perfil_expressions()['rf_pessoa_id']
+        )
@@ -0,0 +1,80 @@
+"""
+Famílias por domicílio.
+
+O domicílio é identificado pelos 8 primeiros dígitos do código familiar,
+gravados em `Familia.cod_domicilio`. A quantidade de famílias de cada
+domicílio por lote fica em `DomicilioContagem`: a importação concilia as
+contagens do lote ao final e os signals de Familia ajustam o domicílio de
+uma família criada, alterada ou excluída individualmente.
+"""
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Substr
+
+from apps.cecad.models import DomicilioContagem, Familia
+from apps.cecad.services.lote_atual import lote_atual
+
+TAMANHO_COD_DOMICILIO = 8
+
+
+def atualizar_domicilios(import_batch):
+    """
+    Preenche cod_domicilio das famílias do lote (None = manuais), que a
+    gravação em massa não preenche, e concilia as contagens do lote: só as
+    linhas que mudaram são gravadas.
+    """
+    familias = Familia.objects.filter(import_batch=import_batch)
+    codigo = Substr('cod_familiar_fam', 1, TAMANHO_COD_DOMICILIO)
+    familias.exclude(cod_domicilio=codigo).update(cod_domicilio=codigo)
+
+    contagens = dict(familias.order_by().values_list('cod_domicilio').annotate(total=Count('id')))
+    existentes = {
+        cod_domicilio: (pk, total)
+        for pk, cod_domicilio, total in DomicilioContagem.objects.filter(import_batch=import_batch)
+        .values_list('id', 'cod_domicilio', 'total')
+    }
+    remover = [pk for cod_domicilio, (pk, _) in existentes.items() if cod_domicilio not in contagens]
+    alterar = [
+        DomicilioContagem(id=pk, total=contagens[cod_domicilio])
+        for cod_domicilio, (pk, total) in existentes.items()
+        if cod_domicilio in contagens and contagens[cod_domicilio] != total
+    ]
+    criar = [
+        DomicilioContagem(import_batch=import_batch, cod_domicilio=cod_domicilio, total=total)
+        for cod_domicilio, total in contagens.items()
+        if cod_domicilio not in existentes
+    ]
+    with transaction.atomic():
+        if remover:
+            DomicilioContagem.objects.filter(pk__in=remover).delete()
+        DomicilioContagem.objects.bulk_update(alterar, ['total'], batch_size=1000)
+        DomicilioContagem.objects.bulk_create(criar, batch_size=1000)
+
+
+def atualizar_contagem_domicilio(import_batch_id, cod_domicilio):
+    """Recalcula a contagem de um domicílio num lote (consulta pelo índice)."""
+    total = Familia.objects.filter(import_batch_id=import_batch_id, cod_domicilio=cod_domicilio).count()
+    contagem = DomicilioContagem.objects.filter(import_batch_id=import_batch_id, cod_domicilio=cod_domicilio)
+    if not total:
+        contagem.delete()
+    elif not contagem.update(total=total):
+        DomicilioContagem.objects.create(import_batch_id=import_batch_id, cod_domicilio=cod_domicilio, total=total)
+
+
+def qtde_familias_domicilio(familia):
+    """
+    Famílias no domicílio da família: do mesmo lote mais as manuais. Para
+    uma família manual, considera o lote atual.
+    """
+    lote_id = familia.import_batch_id
+    if lote_id is None:
+        lote = lote_atual()
+        lote_id = lote.pk if lote else None
+
+    filtro = Q(import_batch__isnull=True)
+    if lote_id is not None:
+        filtro |= Q(import_batch_id=lote_id)
+    total = DomicilioContagem.objects.filter(
+        filtro, cod_domicilio=familia.cod_familiar_fam[:TAMANHO_COD_DOMICILIO]
+    ).aggregate(total=Sum('total'))['total']
+    return total or 0
@@ -0,0 +1,70 @@
+"""
+Perfil denormalizado da família (num_membros, num_filhos, RF, cônjuge,
+datas de nascimento extremas).
+
+Os campos são recalculados em lote por um único UPDATE com subqueries
+correlacionadas. A importação chama `atualizar_perfil_familias` ao final;
+alterações individuais em Pessoa chegam aqui pelos signals do app.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db.models import Count, Exists, OuterRef, QuerySet, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from apps.cecad.models import Familia, Pessoa
+
+_estado = threading.local()
+
+
+def _contar(qs):
+    return Coalesce(
+        Subquery(qs.order_by().values('familia_id').annotate(total=Count('id')).values('total')),
+        0,
+    )
+
+
+def perfil_expressions():
+    """Expressões dos campos de perfil, relativas à família (OuterRef('pk'))."""
+    membros = Pessoa.objects.filter(familia_id=OuterRef('pk'))
+    rf = membros.filter(cod_parentesco_rf_pessoa=1).order_by('id')
+    com_nascimento = membros.filter(dat_nasc_pessoa__isnull=False)
+    return {
+        'num_membros': _contar(membros),
+        'num_filhos': _contar(membros.filter(cod_parentesco_rf_pessoa=3)),
+        'rf_pessoa_id': Subquery(rf.values('id')[:1]),
+        'rf_sexo': Coalesce(Subquery(rf.values('cod_sexo_pessoa')[:1]), Value('')),
+        'tem_conjuge': Exists(membros.filter(cod_parentesco_rf_pessoa=2)),
+        'dat_nasc_mais_novo': Subquery(com_nascimento.order_by('-dat_nasc_pessoa').values('dat_nasc_pessoa')[:1]),
+        'dat_nasc_mais_velho': Subquery(com_nascimento.order_by('dat_nasc_pessoa').values('dat_nasc_pessoa')[:1]),
+    }
+
+
+def atualizar_perfil_familias(familias=None):
+    """
+    Recalcula o perfil das famílias do queryset (ou de uma lista de ids).
+    Retorna a quantidade de famílias atualizadas.
+    """
+    if familias is None:
+        familias = Familia.objects.all()
+    elif not isinstance(familias, QuerySet):
+        familias = Familia.objects.filter(pk__in=list(familias))
+    return familias.update(**perfil_expressions())
+
+
+@contextmanager
+def sincronizacao_adiada():
+    """
+    Desliga o recálculo por signal dentro do bloco (ex.: importação linha a
+    linha). Quem usa deve chamar `atualizar_perfil_familias` ao final.
+    """
+    anterior = getattr(_estado, 'adiada', False)
+    _estado.adiada = True
+    try:
+        yield
+    finally:
+        _estado.adiada = anterior
+
+
+def sincronizacao_ativa():
+    return not getattr(_estado, 'adiada', False)
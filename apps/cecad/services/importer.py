@@ -1,30 +1,139 @@
+import codecs
 import csv
 import logging
+import os
 from datetime import datetime
 from decimal import Decimal
-from django.db import transaction
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
 from django.utils.dateparse import parse_date
-from apps.cecad.models import Familia, Pessoa, ImportBatch
+from apps.cecad.models import Familia, Pessoa, normalizar_nome
+from apps.cecad.services.domicilios import atualizar_domicilios
+from apps.cecad.services.familia_profile import atualizar_perfil_familias, sincronizacao_adiada
+from apps.cecad.services.lote_atual import lote_atual
 from apps.core.models import Validacao
+from apps.core.services.estatisticas_lote import reconstruir_estatisticas
 
 logger = logging.getLogger(__name__)
 
+
+# Campos de Familia/Pessoa atualizados via bulk_update quando um registro
+# reaparece em um chunk posterior do mesmo arquivo.
+FAMILIA_BULK_FIELDS = [
+    'dat_atual_fam', 'vlr_renda_media_fam', 'vlr_renda_total_fam', 'marc_pbf',
+    'ref_cad', 'ref_pbf', 'qtde_pessoas', 'nom_logradouro_fam', 'num_logradouro_fam',
+    'nom_localidade_fam', 'num_cep_logradouro_fam', 'updated_at',
+]
+PESSOA_BULK_FIELDS = [
+    'nom_pessoa', 'nom_pessoa_busca', 'num_cpf_pessoa', 'dat_nasc_pessoa', 'cod_sexo_pessoa',
+    'cod_parentesco_rf_pessoa', 'cod_curso_frequentou_pessoa_membro',
+    'cod_ano_serie_frequentou_pessoa_membro', 'updated_at',
+]
+
+
+def colunas_padrao(model, preenchidas):
+    """
+    Retorna pares (coluna, valor) com o default do model para as colunas
+    NOT NULL que um INSERT ... SELECT não preenche.
+
+    Os defaults dos models ficam no Python (sem DEFAULT no banco), então as
+    instruções set-based precisam enviá-los explicitamente.
+    """
+    colunas = []
+    for field in model._meta.concrete_fields:
+        if field.primary_key or field.null or field.column in preenchidas:
+            continue
+        colunas.append((field.column, field.get_db_prep_save(field.get_default(), connection)))
+    return colunas
+
+
+class _OffsetLineReader:
+    """
+    Itera as linhas de um arquivo aberto em modo binário, mantendo em
+    `offset` a posição exata (em bytes) do fim da última linha lida.
+
+    O csv.reader consome as linhas sob demanda, então após cada registro
+    o offset aponta para o início do registro seguinte.
+    """
+
+    def __init__(self, f):
+        self._f = f
+        self.offset = f.tell()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self._f.readline()
+        if not line:
+            raise StopIteration
+        if self.offset == 0 and line.startswith(codecs.BOM_UTF8):
+            self.offset += len(codecs.BOM_UTF8)
+            line = line[len(codecs.BOM_UTF8):]
+        self.offset += len(line)
+        return line.decode('utf-8')
+
+
 class CecadImporter:
-    def __init__(self, file_path, import_batch, correction_mode=False):
+    DEFAULT_CHUNK_SIZE = 2000
+
+    def __init__(self, file_path, import_batch, correction_mode=False, bulk=False, chunk_size=None,
+                 single_pass=False, on_progress=None):
+        """
+        Args:
+            file_path: Caminho do CSV exportado do CECAD
+            import_batch: ImportBatch que receberá os dados
+            correction_mode: Atualiza apenas campos de correção no último lote completo
+            bulk: Grava em chunks com bulk_create/bulk_update (apenas importação completa)
+            chunk_size: Quantidade de linhas por chunk no modo bulk
+            single_pass: Lê o arquivo uma única vez; o progresso vem do offset em bytes
+                e total_rows só é preenchido ao final
+            on_progress: Callback chamado a cada gravação de progresso (ex.: verificação
+                de cancelamento da fila de tarefas); exceções interrompem a importação
+        """
         self.file_path = file_path
         self.import_batch = import_batch
         self.correction_mode = correction_mode
+        self.bulk = bulk and not correction_mode
+        self.chunk_size = chunk_size or self.DEFAULT_CHUNK_SIZE
+        self.single_pass = single_pass
+        self.on_progress = on_progress
+        self._lines = None
+        # Mapas em memória usados pelo modo bulk
+        self._familia_ids = {}
+        self._pessoa_ids = {}
+        # Lote completo alvo da correção (resolvido uma vez em run())
+        self._lote_correcao = None
+
+    # Backends que gravam checkpoints e podem retomar do meio do arquivo
+    supports_resume = True
 
-    def run(self):
-        """Executa a importação do arquivo CSV."""
+    def run(self, resume=False):
+        """
+        Executa a importação do arquivo CSV.
+
+        Com `resume=True` e um checkpoint gravado no lote, a leitura continua
+        do offset do último chunk confirmado em vez de recomeçar o arquivo.
+        """
+        batch = self.import_batch
         try:
-            self.import_batch.status = 'processing'
-            self.import_batch.processed_rows = 0
-            self.import_batch.save()
+            resume = resume and self.supports_resume and batch.checkpoint_offset > 0
+            batch.status = 'processing'
+            batch.error_message = ''
+            batch.file_size = os.path.getsize(self.file_path)
+            if not resume:
+                batch.processed_rows = 0
+                batch.processed_bytes = 0
+                batch.checkpoint_offset = 0
+                batch.checkpoint_chunk = 0
+            batch.save()
+
+            if self.correction_mode:
+                self._lote_correcao = lote_atual()
 
-            with open(self.file_path, 'r', encoding='utf-8-sig') as f:
-                # Count total rows first
-                sample = f.read(1024)
+            with open(self.file_path, 'rb') as f:
+                sample = f.read(1024).decode('utf-8-sig', errors='ignore')
                 f.seek(0)
                 sniffer = csv.Sniffer()
                 try:
@@ -32,39 +141,116 @@ class CecadImporter:
                 except csv.Error:
                     dialect = csv.excel
                     dialect.delimiter = ';'
-                
-                # Count rows
-                reader = csv.DictReader(f, dialect=dialect)
-                total_rows = sum(1 for _ in reader)
-                self.import_batch.total_rows = total_rows
-                self.import_batch.save()
-                
-                # Reset file pointer for actual processing
-                f.seek(0)
-                reader = csv.DictReader(f, dialect=dialect)
-                
-                # Process rows - each row in its own transaction for real-time progress
-                for idx, row in enumerate(reader, 1):
-                    # Each row is processed atomically (Familia + Pessoa + Validacao together)
-                    with transaction.atomic():
-                        self._process_row(row)
-                    
-                    self.import_batch.processed_rows = idx
-                    # Save progress every 10 rows to reduce DB writes
-                    # This is OUTSIDE the transaction so it's immediately visible to polling
-                    if idx % 10 == 0 or idx == total_rows:
-                        self.import_batch.save(update_fields=['processed_rows'])
-            
-            self.import_batch.status = 'completed'
-            self.import_batch.save()
+
+                if self.single_pass:
+                    # Sem passada de contagem: total_rows é preenchido ao final
+                    total_rows = None
+                elif resume and batch.total_rows:
+                    total_rows = batch.total_rows
+                else:
+                    # Count total rows first
+                    reader = csv.DictReader(_OffsetLineReader(f), dialect=dialect)
+                    total_rows = sum(1 for _ in reader)
+                    batch.total_rows = total_rows
+                    batch.save()
+
+                    # Reset file pointer for actual processing
+                    f.seek(0)
+
+                self._lines = _OffsetLineReader(f)
+                reader = csv.DictReader(self._lines, dialect=dialect)
+                if resume:
+                    # Acessar fieldnames consome o cabeçalho; precisa vir antes do seek
+                    fieldnames = reader.fieldnames
+                    # Pula direto para o fim do último chunk confirmado
+                    f.seek(batch.checkpoint_offset)
+                    self._lines.offset = batch.checkpoint_offset
+                    logger.info(
+                        f"Retomando lote {batch.pk} no byte {batch.checkpoint_offset} "
+                        f"(chunk {batch.checkpoint_chunk}, {batch.processed_rows} linhas)"
+                    )
+                # Perfis das famílias: um único recálculo em lote ao final, sem signals por linha
+                with sincronizacao_adiada():
+                    self._process_reader(reader, total_rows)
+            self._atualizar_perfis()
+            self._atualizar_domicilios()
+            self._atualizar_estatisticas()
+
+            if self.single_pass:
+                batch.total_rows = batch.processed_rows
+            batch.processed_bytes = batch.file_size
+            batch.status = 'completed'
+            batch.save()
             return True, "Importação concluída com sucesso."
         except Exception as e:
-            self.import_batch.status = 'error'
-            self.import_batch.error_message = str(e)
-            self.import_batch.save()
+            batch.status = 'error'
+            batch.error_message = str(e)
+            # Apenas status e mensagem: o checkpoint em memória pode estar à
+            # frente do que foi confirmado no banco (chunk revertido).
+            batch.save(update_fields=['status', 'error_message'])
             logger.error(f"Erro na importação: {e}")
             return False, str(e)
 
+    def _atualizar_domicilios(self):
+        """Preenche cod_domicilio e concilia as contagens por domicílio do lote."""
+        if self.correction_mode:
+            return
+        atualizar_domicilios(self.import_batch)
+
+    def _atualizar_estatisticas(self):
+        """Reconstrói as estatísticas pré-agregadas do lote."""
+        # A correção só altera campos fora da chave das estatísticas
+        if self.correction_mode:
+            return
+        reconstruir_estatisticas(self.import_batch)
+
+    def _atualizar_perfis(self):
+        """Recalcula os campos de perfil (num_membros, RF etc.) das famílias do lote."""
+        if not self.correction_mode:
+            atualizar_perfil_familias(Familia.objects.filter(import_batch=self.import_batch))
+
+    def _process_reader(self, reader, total_rows):
+        """Processa as linhas do CSV conforme o modo configurado."""
+        if self.bulk:
+            self._run_bulk(reader, total_rows)
+        else:
+            self._run_rows(reader, total_rows)
+
+    def _run_rows(self, reader, total_rows):
+        """Modo linha a linha: uma transação por linha do CSV."""
+        # Process rows - each row in its own transaction for real-time progress
+        for idx, row in enumerate(reader, self.import_batch.processed_rows + 1):
+            # Each row is processed atomically (Familia + Pessoa + Validacao together)
+            with transaction.atomic():
+                self._process_row(row)
+            
+            self.import_batch.processed_rows = idx
+            # Save progress every 10 rows to reduce DB writes
+            # This is OUTSIDE the transaction so it's immediately visible to polling
+            if idx % 10 == 0 or idx == total_rows:
+                # As linhas anteriores já foram confirmadas: o offset atual é um checkpoint válido
+                self._save_checkpoint()
+                self._notify_progress()
+
+        self._save_checkpoint()
+        self._notify_progress()
+
+    def _save_checkpoint(self):
+        """
+        Persiste progresso e checkpoint. No modo bulk é chamado dentro da
+        transação do chunk, então o checkpoint só existe se o chunk foi gravado.
+        """
+        if self._lines is not None:
+            self.import_batch.processed_bytes = self._lines.offset
+        self.import_batch.checkpoint_offset = self.import_batch.processed_bytes
+        self.import_batch.save(
+            update_fields=['processed_rows', 'processed_bytes', 'checkpoint_offset', 'checkpoint_chunk']
+        )
+
+    def _notify_progress(self):
+        if self.on_progress:
+            self.on_progress(self.import_batch)
+
     def _process_row(self, row):
         """Processa uma linha do CSV e cria/atualiza Família e Pessoa."""
         # Dados da Família (Prefix d.)
@@ -75,11 +261,9 @@ class CecadImporter:
         if self.correction_mode:
             # Correction Mode: Update only specific fields for existing families
             try:
-                # Find the latest full import batch to target
-                latest_full_batch = ImportBatch.objects.filter(status='completed', batch_type='full').first()
-                
-                if latest_full_batch:
-                    familia = Familia.objects.get(cod_familiar_fam=cod_familiar, import_batch=latest_full_batch)
+                # Target the latest full import batch (resolved once in run())
+                if self._lote_correcao:
+                    familia = Familia.objects.get(cod_familiar_fam=cod_familiar, import_batch=self._lote_correcao)
                 else:
                     # Fallback or skip if no full batch exists (shouldn't happen in normal flow)
                     return
@@ -104,26 +288,10 @@ class CecadImporter:
                 pass
             return
 
-        dat_atual = self._parse_date(row.get('d.dat_atual_fam'))
-        renda_media = self._parse_decimal(row.get('d.vlr_renda_media_fam'))
-        renda_total = self._parse_decimal(row.get('d.vlr_renda_total_fam'))
-        
         familia, created = Familia.objects.update_or_create(
             cod_familiar_fam=cod_familiar,
             import_batch=self.import_batch,
-            defaults={
-                'dat_atual_fam': dat_atual or datetime.now().date(),
-                'vlr_renda_media_fam': renda_media,
-                'vlr_renda_total_fam': renda_total,
-                'marc_pbf': self._parse_boolean(row.get('d.marc_pbf')),
-                'ref_cad': row.get('d.ref_cad'),
-                'ref_pbf': row.get('d.ref_pbf'),
-                'qtde_pessoas': self._parse_int(row.get('d.qtd_pessoas_domic_fam')) or 0,
-                'nom_logradouro_fam': row.get('d.nom_logradouro_fam', ''),
-                'num_logradouro_fam': row.get('d.num_logradouro_fam', ''),
-                'nom_localidade_fam': row.get('d.nom_localidade_fam', ''),
-                'num_cep_logradouro_fam': row.get('d.num_cep_logradouro_fam', ''),
-            }
+            defaults=self._parse_familia(row)
         )
 
         if created:
@@ -132,25 +300,168 @@ class CecadImporter:
         # Dados da Pessoa (Prefix p.)
         nis = row.get('p.num_nis_pessoa_atual')
         if nis:
-            cpf = row.get('p.num_cpf_pessoa')
-            # Ensure empty CPF is treated as None to avoid unique constraint violation
-            if not cpf or not cpf.strip():
-                cpf = None
-            
             Pessoa.objects.update_or_create(
                 num_nis_pessoa_atual=nis,
                 familia=familia,
-                defaults={
-                    'nom_pessoa': row.get('p.nom_pessoa', ''),
-                    'num_cpf_pessoa': cpf,
-                    'dat_nasc_pessoa': self._parse_date(row.get('p.dta_nasc_pessoa')),
-                    'cod_sexo_pessoa': row.get('p.cod_sexo_pessoa', '2'),
-                    'cod_parentesco_rf_pessoa': self._parse_int(row.get('p.cod_parentesco_rf_pessoa')) or 1,
-                    'cod_curso_frequentou_pessoa_membro': self._parse_int(row.get('p.cod_curso_frequentou_pessoa_memb')),
-                    'cod_ano_serie_frequentou_pessoa_membro': self._parse_int(row.get('p.cod_ano_serie_frequentou_memb')),
-                }
+                defaults=self._parse_pessoa(row)
             )
 
+    def _parse_familia(self, row):
+        """Normaliza os campos da família (prefixo d.) de uma linha do CSV."""
+        dat_atual = self._parse_date(row.get('d.dat_atual_fam'))
+        return {
+            'dat_atual_fam': dat_atual or datetime.now().date(),
+            'vlr_renda_media_fam': self._parse_decimal(row.get('d.vlr_renda_media_fam')),
+            'vlr_renda_total_fam': self._parse_decimal(row.get('d.vlr_renda_total_fam')),
+            'marc_pbf': self._parse_boolean(row.get('d.marc_pbf')),
+            'ref_cad': row.get('d.ref_cad'),
+            'ref_pbf': row.get('d.ref_pbf'),
+            'qtde_pessoas': self._parse_int(row.get('d.qtd_pessoas_domic_fam')) or 0,
+            'nom_logradouro_fam': row.get('d.nom_logradouro_fam', ''),
+            'num_logradouro_fam': row.get('d.num_logradouro_fam', ''),
+            'nom_localidade_fam': row.get('d.nom_localidade_fam', ''),
+            'num_cep_logradouro_fam': row.get('d.num_cep_logradouro_fam', ''),
+        }
+
+    def _parse_pessoa(self, row):
+        """Normaliza os campos da pessoa (prefixo p.) de uma linha do CSV."""
+        cpf = row.get('p.num_cpf_pessoa')
+        # Ensure empty CPF is treated as None to avoid unique constraint violation
+        if not cpf or not cpf.strip():
+            cpf = None
+
+        nome = row.get('p.nom_pessoa', '')
+        return {
+            'nom_pessoa': nome,
+            'nom_pessoa_busca': normalizar_nome(nome),
+            'num_cpf_pessoa': cpf,
+            'dat_nasc_pessoa': self._parse_date(row.get('p.dta_nasc_pessoa')),
+            'cod_sexo_pessoa': row.get('p.cod_sexo_pessoa', '2'),
+            'cod_parentesco_rf_pessoa': self._parse_int(row.get('p.cod_parentesco_rf_pessoa')) or 1,
+            'cod_curso_frequentou_pessoa_membro': self._parse_int(row.get('p.cod_curso_frequentou_pessoa_memb')),
+            'cod_ano_serie_frequentou_pessoa_membro': self._parse_int(row.get('p.cod_ano_serie_frequentou_memb')),
+        }
+
+    # ------------------------------------------------------------------
+    # Modo bulk
+    # ------------------------------------------------------------------
+
+    def _run_bulk(self, reader, total_rows):
+        """
+        Modo bulk: agrupa as linhas em chunks e grava cada chunk com
+        bulk_create/bulk_update em uma única transação.
+
+        Famílias são resolvidas pelo mapa em memória cod_familiar_fam -> id,
+        então cada chunk custa poucas queries independentemente do tamanho.
+        """
+        self._load_existing_ids()
+
+        chunk = []
+        for row in reader:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                self._flush_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._flush_chunk(chunk)
+
+    def _flush_chunk(self, rows):
+        """Grava um chunk junto com o checkpoint e publica o progresso."""
+        with transaction.atomic():
+            self._write_chunk(rows)
+            self.import_batch.processed_rows += len(rows)
+            self.import_batch.checkpoint_chunk += 1
+            self._save_checkpoint()
+
+        self._notify_progress()
+
+    def _load_existing_ids(self):
+        """Carrega os mapas em memória com o que já existe no lote."""
+        self._familia_ids = dict(
+            Familia.objects.filter(import_batch=self.import_batch).values_list('cod_familiar_fam', 'id')
+        )
+        self._pessoa_ids = {
+            (familia_id, nis): pk
+            for pk, familia_id, nis in Pessoa.objects.filter(
+                familia__import_batch=self.import_batch
+            ).values_list('id', 'familia_id', 'num_nis_pessoa_atual')
+        }
+
+    def _write_chunk(self, rows):
+        """
+        Grava Familia, Validacao e Pessoa de um chunk de linhas.
+
+        Mantém a semântica do modo linha a linha: a última linha de cada
+        família/pessoa prevalece e a Validacao só é criada para famílias novas.
+        """
+        familias = {}
+        pessoas = {}
+        for row in rows:
+            cod_familiar = row.get('d.cod_familiar_fam')
+            if not cod_familiar:
+                continue
+            familias[cod_familiar] = self._parse_familia(row)
+            nis = row.get('p.num_nis_pessoa_atual')
+            if nis:
+                pessoas[(cod_familiar, nis)] = self._parse_pessoa(row)
+
+        now = timezone.now()
+
+        # Famílias: cria as novas e atualiza as já vistas em chunks anteriores
+        novas, existentes = [], []
+        for cod_familiar, dados in familias.items():
+            familia_id = self._familia_ids.get(cod_familiar)
+            if familia_id is None:
+                novas.append(Familia(import_batch=self.import_batch, cod_familiar_fam=cod_familiar, **dados))
+            else:
+                existentes.append(Familia(id=familia_id, updated_at=now, **dados))
+
+        if novas:
+            Familia.objects.bulk_create(novas, batch_size=self.chunk_size)
+            self._map_new_familias(novas)
+            Validacao.objects.bulk_create(
+                [Validacao(familia_id=f.pk) for f in novas], batch_size=self.chunk_size
+            )
+        if existentes:
+            Familia.objects.bulk_update(existentes, FAMILIA_BULK_FIELDS, batch_size=self.chunk_size)
+
+        # Pessoas
+        novas_pessoas, pessoas_existentes = [], []
+        for (cod_familiar, nis), dados in pessoas.items():
+            familia_id = self._familia_ids[cod_familiar]
+            pessoa_id = self._pessoa_ids.get((familia_id, nis))
+            if pessoa_id is None:
+                novas_pessoas.append(Pessoa(familia_id=familia_id, num_nis_pessoa_atual=nis, **dados))
+            else:
+                pessoas_existentes.append(Pessoa(id=pessoa_id, updated_at=now, **dados))
+
+        if novas_pessoas:
+            Pessoa.objects.bulk_create(novas_pessoas, batch_size=self.chunk_size)
+            if all(p.pk is not None for p in novas_pessoas):
+                for pessoa in novas_pessoas:
+                    self._pessoa_ids[(pessoa.familia_id, pessoa.num_nis_pessoa_atual)] = pessoa.pk
+            else:
+                self._load_existing_ids()
+        if pessoas_existentes:
+            Pessoa.objects.bulk_update(pessoas_existentes, PESSOA_BULK_FIELDS, batch_size=self.chunk_size)
+
+    def _map_new_familias(self, novas):
+        """Registra no mapa os ids das famílias recém-criadas."""
+        if all(f.pk is not None for f in novas):
+            for familia in novas:
+                self._familia_ids[familia.cod_familiar_fam] = familia.pk
+            return
+
+        # Backends sem RETURNING no bulk_create: buscar os ids criados
+        cods = [f.cod_familiar_fam for f in novas]
+        ids = dict(
+            Familia.objects.filter(import_batch=self.import_batch, cod_familiar_fam__in=cods)
+            .values_list('cod_familiar_fam', 'id')
+        )
+        self._familia_ids.update(ids)
+        for familia in novas:
+            familia.pk = ids[familia.cod_familiar_fam]
+
     def _parse_date(self, date_str):
         if not date_str:
             return None
@@ -186,3 +497,34 @@ class CecadImporter:
             return False
         # Extract first character and check if it's '1'
         return str(value).strip()[0] == '1'
+
+
+def build_importer(file_path, import_batch, correction_mode=False, **kwargs):
+    """
+    Retorna o importador adequado ao banco configurado.
+
+    Com `differential=True` a importação completa usa o DifferentialImporter,
+    que compara o arquivo com o último lote completo; `manter_validacoes=True`
+    (só na diferencial) preserva as validações das famílias inalteradas.
+    Importações completas com mais de um worker (argumento `workers` ou
+    settings.CECAD_IMPORT_WORKERS) usam o ParallelImporter. Em PostgreSQL,
+    as demais importações completas usam o caminho COPY + staging
+    (PostgresCopyImporter). Nos outros casos (SQLite, correções) usa o
+    CecadImporter baseado no ORM.
+    """
+    differential = kwargs.pop('differential', False)
+    manter_validacoes = kwargs.pop('manter_validacoes', False)
+    workers = kwargs.pop('workers', None)
+    if workers is None:
+        workers = getattr(settings, 'CECAD_IMPORT_WORKERS', 1)
+
+    if differential and not correction_mode:
+        from apps.cecad.services.differential_importer import DifferentialImporter
+        return DifferentialImporter(file_path, import_batch, manter_validacoes=manter_validacoes, **kwargs)
+    if not correction_mode and workers > 1:
+        from apps.cecad.services.parallel_importer import ParallelImporter
+        return ParallelImporter(file_path, import_batch, workers=workers, **kwargs)
+    if connection.vendor == 'postgresql' and not correction_mode:
+        from apps.cecad.services.copy_importer import PostgresCopyImporter
+        return PostgresCopyImporter(file_path, import_batch, **kwargs)
+    return CecadImporter(file_path, import_batch, correction_mode=correction_mode, **kwargs)
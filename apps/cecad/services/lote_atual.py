@@ -0,0 +1,46 @@
+"""
+Lote atual: a última importação completa (batch_type='full') concluída.
+
+É o lote "vigente" usado por todas as telas (fila, relatórios, aprovados,
+dashboards, exportações). O id fica no cache do Django e a instância numa
+memória do processo, então a resolução custa uma leitura de cache e nenhuma
+consulta enquanto o lote não mudar. O cache é invalidado pelos signals de
+ImportBatch (ver apps/cecad/signals.py). Com o cache local padrão (por
+processo) os demais processos enxergam a troca em até
+CECAD_LOTE_ATUAL_CACHE_TIMEOUT segundos.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.cecad.models import ImportBatch
+
+CACHE_KEY = 'cecad:lote_atual'
+# Marca "não há lote" no cache (None é indistinguível de ausência)
+SEM_LOTE = 0
+
+_memoria = {'id': None, 'lote': None}
+
+
+def _buscar():
+    return ImportBatch.objects.filter(status='completed', batch_type='full').order_by('-imported_at').first()
+
+
+def lote_atual():
+    """Retorna o ImportBatch vigente ou None se ainda não há importação completa."""
+    lote_id = cache.get(CACHE_KEY)
+    if lote_id == SEM_LOTE:
+        return None
+    if lote_id is not None and _memoria['id'] == lote_id:
+        return _memoria['lote']
+
+    lote = ImportBatch.objects.filter(pk=lote_id).first() if lote_id is not None else None
+    if lote is None:
+        lote = _buscar()
+        cache.set(CACHE_KEY, lote.pk if lote else SEM_LOTE, settings.CECAD_LOTE_ATUAL_CACHE_TIMEOUT)
+    _memoria.update(id=lote.pk if lote else None, lote=lote)
+    return lote
+
+
+def invalidar_lote_atual():
+    cache.delete(CACHE_KEY)
+    _memoria.update(id=None, lote=None)
@@ -0,0 +1,166 @@
+"""
+Importação CECAD paralela em processos.
+
+O arquivo é dividido em shards pelo hash de d.cod_familiar_fam (todas as
+linhas de uma família ficam no mesmo shard) e cada processo do pool faz o
+parse e a gravação em bulk do seu shard. O processo pai agrega o progresso
+dos workers em ImportBatch.processed_rows.
+"""
+import csv
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import zlib
+
+from django.db import connection, connections
+
+from apps.cecad.models import ImportBatch
+from apps.cecad.services.importer import CecadImporter
+
+logger = logging.getLogger(__name__)
+
+SHARD_DELIMITER = ';'
+
+# Contador compartilhado de linhas processadas (definido no initializer do pool)
+_progress_counter = None
+
+
+def shard_for(cod_familiar, num_shards):
+    """Retorna o shard de uma família (hash estável entre processos)."""
+    return zlib.crc32((cod_familiar or '').encode('utf-8')) % num_shards
+
+
+def _init_worker(counter):
+    global _progress_counter
+    _progress_counter = counter
+
+
+class _ShardImporter(CecadImporter):
+    """Importador bulk de um shard: reporta progresso ao contador compartilhado."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._reported_rows = 0
+
+    def _save_checkpoint(self):
+        """
+        O offset de um shard não corresponde ao arquivo original: em vez do
+        checkpoint, soma as linhas do chunk ao contador do processo pai.
+        """
+        delta = self.import_batch.processed_rows - self._reported_rows
+        self._reported_rows = self.import_batch.processed_rows
+        if _progress_counter is not None and delta:
+            with _progress_counter.get_lock():
+                _progress_counter.value += delta
+
+    def _notify_progress(self):
+        # O processo pai publica o progresso agregado dos shards
+        pass
+
+
+def _import_shard(shard_path, batch_id, chunk_size):
+    """Ponto de entrada do worker: importa um shard em modo bulk."""
+    try:
+        batch = ImportBatch.objects.get(pk=batch_id)
+        # O progresso do worker é contado a partir de zero e somado pelo pai
+        batch.processed_rows = 0
+        importer = _ShardImporter(shard_path, batch, bulk=True, chunk_size=chunk_size)
+        with open(shard_path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f, delimiter=SHARD_DELIMITER)
+            importer._run_bulk(reader, None)
+        return importer.import_batch.processed_rows
+    finally:
+        connections.close_all()
+
+
+class ParallelImporter(CecadImporter):
+    """
+    Importação completa distribuída entre `workers` processos.
+
+    Requer o start method 'fork' e um banco com escrita concorrente
+    (PostgreSQL); caso contrário cai para o modo bulk em processo único.
+    """
+
+    POLL_INTERVAL = 0.5
+    # Uma nova execução refaz todos os shards; o upsert por lote torna isso seguro
+    supports_resume = False
+
+    def __init__(self, file_path, import_batch, workers=2, **kwargs):
+        kwargs['bulk'] = True
+        super().__init__(file_path, import_batch, **kwargs)
+        self.workers = max(1, int(workers or 1))
+
+    def _can_fork(self):
+        return (
+            self.workers > 1
+            and connection.vendor != 'sqlite'
+            and 'fork' in multiprocessing.get_all_start_methods()
+        )
+
+    def _process_reader(self, reader, total_rows):
+        if not self._can_fork():
+            return super()._process_reader(reader, total_rows)
+
+        shard_dir = tempfile.mkdtemp(prefix=f'cecad_import_{self.import_batch.pk}_')
+        try:
+            shard_paths, total = self._write_shards(reader, shard_dir)
+            # Após a divisão o total de linhas é conhecido (útil na passada única)
+            self.import_batch.total_rows = total
+            self.import_batch.save(update_fields=['total_rows'])
+            self._run_pool(shard_paths)
+        finally:
+            shutil.rmtree(shard_dir, ignore_errors=True)
+
+    def _write_shards(self, reader, shard_dir):
+        """Distribui as linhas brutas do CSV em um arquivo por shard. Retorna (paths, total)."""
+        shard_paths = [os.path.join(shard_dir, f'shard_{i}.csv') for i in range(self.workers)]
+        files = [open(path, 'w', encoding='utf-8', newline='') for path in shard_paths]
+        try:
+            # Colunas excedentes (chave None no DictReader) são descartadas,
+            # como no importador serial, que lê apenas as colunas do cabeçalho
+            writers = [
+                csv.DictWriter(f, fieldnames=reader.fieldnames, delimiter=SHARD_DELIMITER, extrasaction='ignore')
+                for f in files
+            ]
+            for writer in writers:
+                writer.writeheader()
+            total = 0
+            for row in reader:
+                writers[shard_for(row.get('d.cod_familiar_fam'), self.workers)].writerow(row)
+                total += 1
+        finally:
+            for f in files:
+                f.close()
+        return shard_paths, total
+
+    def _run_pool(self, shard_paths):
+        """Executa os shards no pool e publica o progresso agregado."""
+        ctx = multiprocessing.get_context('fork')
+        counter = ctx.Value('q', 0)
+
+        # Os processos filhos não podem herdar a conexão aberta do pai
+        connections.close_all()
+
+        with ctx.Pool(self.workers, initializer=_init_worker, initargs=(counter,)) as pool:
+            results = [
+                pool.apply_async(_import_shard, (path, self.import_batch.pk, self.chunk_size))
+                for path in shard_paths
+            ]
+            while not all(r.ready() for r in results):
+                time.sleep(self.POLL_INTERVAL)
+                self._publish_progress(counter.value)
+
+            # Propaga exceções dos workers
+            processed = sum(r.get() for r in results)
+
+        logger.info(f"Importação paralela do lote {self.import_batch.pk}: {processed} linhas em {self.workers} workers")
+        self._publish_progress(counter.value)
+
+    def _publish_progress(self, processed_rows):
+        if processed_rows != self.import_batch.processed_rows:
+            self.import_batch.processed_rows = processed_rows
+            self.import_batch.save(update_fields=['processed_rows'])
+        self._notify_progress()
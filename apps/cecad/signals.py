@@ -0,0 +1,80 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.cecad.models import Familia, ImportBatch, Pessoa
+from apps.cecad.services.domicilios import atualizar_contagem_domicilio
+from apps.cecad.services.familia_profile import atualizar_perfil_familias, sincronizacao_ativa
+from apps.cecad.services.lote_atual import invalidar_lote_atual
+from apps.core.services.estatisticas_lote import acompanhar_familias
+from apps.core.services.versao_dados import incrementar_versao_validacoes
+
+
+def _familias_afetadas(pessoa):
+    ids = {pessoa.familia_id, getattr(pessoa, '_familia_id_original', None)}
+    ids.discard(None)
+    return ids
+
+
+@receiver(post_save, sender=Pessoa)
+def atualizar_perfil_apos_salvar(sender, instance, raw=False, **kwargs):
+    """Mantém o perfil denormalizado da família (e da família de origem, em transferências)."""
+    if raw or not sincronizacao_ativa():
+        return
+    familias = _familias_afetadas(instance)
+    # O perfil define a composição familiar das estatísticas e relatórios
+    with acompanhar_familias(familias):
+        atualizar_perfil_familias(familias)
+    incrementar_versao_validacoes()
+    instance._familia_id_original = instance.familia_id
+
+
+@receiver(post_delete, sender=Pessoa)
+def atualizar_perfil_apos_excluir(sender, instance, origin=None, **kwargs):
+    if not sincronizacao_ativa():
+        return
+    # Exclusão em cascata (família ou lote inteiro): a família também está sendo excluída
+    if origin is not None and not isinstance(origin, Pessoa) and getattr(origin, 'model', None) is not Pessoa:
+        return
+    familias = _familias_afetadas(instance)
+    with acompanhar_familias(familias):
+        atualizar_perfil_familias(familias)
+    incrementar_versao_validacoes()
+
+
+def _domicilios_afetados(familia):
+    domicilios = {(familia.import_batch_id, familia.cod_domicilio), getattr(familia, '_domicilio_original', None)}
+    domicilios.discard(None)
+    return domicilios
+
+
+@receiver(post_save, sender=Familia)
+def atualizar_domicilio_apos_salvar(sender, instance, raw=False, **kwargs):
+    """Mantém DomicilioContagem para famílias criadas ou alteradas fora da importação."""
+    if raw or not sincronizacao_ativa():
+        return
+    for import_batch_id, cod_domicilio in _domicilios_afetados(instance):
+        atualizar_contagem_domicilio(import_batch_id, cod_domicilio)
+    instance._domicilio_original = (instance.import_batch_id, instance.cod_domicilio)
+
+
+@receiver(post_delete, sender=Familia)
+def atualizar_domicilio_apos_excluir(sender, instance, origin=None, **kwargs):
+    if not sincronizacao_ativa():
+        return
+    # Exclusão de um lote inteiro: as contagens do lote saem em cascata
+    if isinstance(origin, ImportBatch):
+        return
+    for import_batch_id, cod_domicilio in _domicilios_afetados(instance):
+        atualizar_contagem_domicilio(import_batch_id, cod_domicilio)
+
+
+@receiver(post_save, sender=ImportBatch)
+def invalidar_lote_atual_apos_salvar(sender, instance, **kwargs):
+    """Um lote concluído pode ser o novo lote atual; as gravações de progresso são ignoradas."""
+    if instance.status == 'completed':
+        invalidar_lote_atual()
+
+
+@receiver(post_delete, sender=ImportBatch)
+def invalidar_lote_atual_apos_excluir(sender, instance, **kwargs):
+    invalidar_lote_atual()
@@ -0,0 +1,34 @@
+"""Tarefas da fila em segundo plano do app CECAD."""
+from apps.cecad.models import ImportBatch
+from apps.cecad.services.importer import build_importer
+from apps.core.services.jobs import task
+
+
+def _marcar_lote_com_erro(job):
+    """Evita que um lote fique em 'processing' quando a tarefa falha definitivamente."""
+    ImportBatch.objects.filter(pk=job.payload.get('batch_id'), status='processing').update(
+        status='error', error_message=job.error_message
+    )
+
+
+@task('cecad.import', on_failure=_marcar_lote_com_erro)
+def importar_cecad(ctx, batch_id, file_path=None, correction_mode=False, resume=False, **options):
+    """
+    Importa o arquivo do lote. Sem `file_path`, usa o arquivo original
+    armazenado no lote (compartilhado entre o web e o worker via MEDIA_ROOT).
+
+    Novas tentativas (retry ou worker interrompido) retomam do checkpoint.
+    """
+    batch = ImportBatch.objects.get(pk=batch_id)
+    file_path = file_path or batch.original_file.path
+
+    importer = build_importer(
+        file_path, batch, correction_mode=correction_mode, on_progress=ctx.check_cancelled, **options
+    )
+    success, message = importer.run(resume=resume or ctx.job.attempts > 1)
+
+    # O cancelamento interrompe o importador como um erro comum; aqui ele é
+    # propagado para que a tarefa fique como cancelada e não seja reexecutada.
+    ctx.check_cancelled()
+    if not success:
+        raise RuntimeError(message)
@@ -0,0 +1,149 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from apps.cecad.models import ImportBatch, Familia, Pessoa
+from apps.cecad.services.importer import CecadImporter
+from apps.cecad.services.lote_atual import lote_atual
+from apps.core.models import Validacao
+
+HEADER = "d.cod_familiar_fam;d.dat_atual_fam;d.vlr_renda_media_fam;d.vlr_renda_total_fam;d.marc_pbf;d.qtd_pessoas_domic_fam;d.nom_logradouro_fam;d.num_logradouro_fam;d.nom_localidade_fam;d.num_cep_logradouro_fam;p.num_nis_pessoa_atual;p.nom_pessoa;p.num_cpf_pessoa;p.dta_nasc_pessoa;p.cod_sexo_pessoa;p.cod_parentesco_rf_pessoa;p.cod_curso_frequentou_pessoa_memb;p.cod_ano_serie_frequentou_memb"
+
+ROWS = [
+    "11111111101;01/01/2024;100,00;200,00;1;2;Rua A;10;Centro;58228000;10000000001;Maria Souza;11122233344;01/01/1980;2;1;;",
+    "22222222201;15/03/2024;50,00;50,00;0;1;Rua B;20;Alto;58228000;20000000001;Jose Lima;;02/02/1970;1;1;;",
+    "11111111101;01/01/2024;100,00;200,00;1;2;Rua A;10;Centro;58228000;10000000002;Ana Souza;;05/05/2015;2;3;5;3",
+    # Mesma pessoa repetida: a última linha prevalece
+    "22222222201;15/03/2024;55,00;55,00;0;1;Rua B;20;Alto;58228000;20000000001;Jose Lima Filho;;02/02/1970;1;1;;",
+    "33333333301;10/10/2023;0,00;0,00;1;1;Rua C;;Sitio;58228000;30000000001;Rita Alves;;;2;1;;",
+]
+
+
+class CecadBulkImportTest(TestCase):
+    def setUp(self):
+        fd, self.file_path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as f:
+            f.write("\n".join([HEADER] + ROWS) + "\n")
+
+    def tearDown(self):
+        os.remove(self.file_path)
+
+    def _snapshot(self, batch):
+        familias = sorted(
+            Familia.objects.filter(import_batch=batch).values_list(
+                'cod_familiar_fam', 'dat_atual_fam', 'vlr_renda_media_fam', 'vlr_renda_total_fam',
+                'marc_pbf', 'qtde_pessoas', 'nom_localidade_fam'
+            )
+        )
+        pessoas = sorted(
+            Pessoa.objects.filter(familia__import_batch=batch).values_list(
+                'familia__cod_familiar_fam', 'num_nis_pessoa_atual', 'nom_pessoa', 'num_cpf_pessoa',
+                'dat_nasc_pessoa', 'cod_sexo_pessoa', 'cod_parentesco_rf_pessoa',
+                'cod_curso_frequentou_pessoa_membro', 'cod_ano_serie_frequentou_pessoa_membro'
+            )
+        )
+        validacoes = Validacao.objects.filter(familia__import_batch=batch).count()
+        return familias, pessoas, validacoes
+
+    def test_bulk_equivale_ao_modo_linha_a_linha(self):
+        batch_rows = ImportBatch.objects.create(description="Linha a linha")
+        success, _ = CecadImporter(self.file_path, batch_rows).run()
+        self.assertTrue(success)
+
+        # chunk_size=2 força famílias e pessoas a reaparecerem em chunks diferentes
+        batch_bulk = ImportBatch.objects.create(description="Bulk")
+        success, _ = CecadImporter(self.file_path, batch_bulk, bulk=True, chunk_size=2).run()
+        self.assertTrue(success)
+
+        self.assertEqual(self._snapshot(batch_rows), self._snapshot(batch_bulk))
+
+        familias, pessoas, validacoes = self._snapshot(batch_bulk)
+        self.assertEqual(len(familias), 3)
+        self.assertEqual(len(pessoas), 4)
+        self.assertEqual(validacoes, 3)
+
+    def test_bulk_atualiza_progresso_por_chunk(self):
+        batch = ImportBatch.objects.create(description="Bulk")
+        CecadImporter(self.file_path, batch, bulk=True, chunk_size=2).run()
+
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, 'completed')
+        self.assertEqual(batch.total_rows, len(ROWS))
+        self.assertEqual(batch.processed_rows, len(ROWS))
+
+    def test_single_pass_preenche_total_ao_final(self):
+        batch_rows = ImportBatch.objects.create(description="Duas passadas")
+        CecadImporter(self.file_path, batch_rows).run()
+
+        batch = ImportBatch.objects.create(description="Passada única")
+        success, _ = CecadImporter(self.file_path, batch, bulk=True, chunk_size=2, single_pass=True).run()
+        self.assertTrue(success)
+
+        batch.refresh_from_db()
+        self.assertEqual(batch.total_rows, len(ROWS))
+        self.assertEqual(batch.processed_rows, len(ROWS))
+        self.assertEqual(batch.file_size, os.path.getsize(self.file_path))
+        self.assertEqual(batch.processed_bytes, batch.file_size)
+        self.assertEqual(batch.progress_percent, 100)
+        self.assertEqual(self._snapshot(batch_rows), self._snapshot(batch))
+
+    def test_progresso_por_bytes_sem_total_de_linhas(self):
+        batch = ImportBatch(total_rows=0, file_size=1000, processed_bytes=250)
+        self.assertEqual(batch.progress_percent, 25)
+
+    def test_retoma_do_checkpoint_apos_falha(self):
+        batch = ImportBatch.objects.create(description="Interrompido")
+        importer = CecadImporter(self.file_path, batch, bulk=True, chunk_size=2)
+        write_chunk = importer._write_chunk
+        chunks = []
+
+        def falha_no_terceiro_chunk(rows):
+            chunks.append(rows)
+            if len(chunks) == 3:
+                write_chunk(rows)
+                raise RuntimeError("queda do worker")
+            write_chunk(rows)
+
+        importer._write_chunk = falha_no_terceiro_chunk
+        success, _ = importer.run()
+        self.assertFalse(success)
+
+        # O terceiro chunk foi revertido junto com o checkpoint
+        batch.refresh_from_db()
+        self.assertEqual((batch.status, batch.checkpoint_chunk, batch.processed_rows), ('error', 2, 4))
+        primeiras_linhas = "\n".join([HEADER] + ROWS[:4]) + "\n"
+        self.assertEqual(batch.checkpoint_offset, len(primeiras_linhas.encode('utf-8')))
+
+        retomada = CecadImporter(self.file_path, batch, bulk=True, chunk_size=2)
+        lidas = []
+        write_chunk_retomada = retomada._write_chunk
+        retomada._write_chunk = lambda rows: (lidas.extend(rows), write_chunk_retomada(rows))
+        success, _ = retomada.run(resume=True)
+        self.assertTrue(success)
+        self.assertEqual([row['p.num_nis_pessoa_atual'] for row in lidas], ['30000000001'])
+
+        batch.refresh_from_db()
+        self.assertEqual((batch.processed_rows, batch.checkpoint_chunk), (len(ROWS), 3))
+
+        batch_rows = ImportBatch.objects.create(description="Linha a linha")
+        CecadImporter(self.file_path, batch_rows).run()
+        self.assertEqual(self._snapshot(batch_rows), self._snapshot(batch))
+
+    def test_correcao_resolve_o_lote_alvo_uma_vez(self):
+        lote = ImportBatch.objects.create(description="Completo")
+        CecadImporter(self.file_path, lote, bulk=True).run()
+        lote.familias.update(qtde_pessoas=9)
+
+        correcao = ImportBatch.objects.create(description="Correção", batch_type='correction')
+        with patch('apps.cecad.services.importer.lote_atual', wraps=lote_atual) as resolver:
+            success, _ = CecadImporter(self.file_path, correcao, correction_mode=True).run()
+        self.assertTrue(success)
+        self.assertEqual(resolver.call_count, 1)
+        # Campos de correção aplicados às famílias do lote completo
+        self.assertEqual(
+            sorted(lote.familias.values_list('cod_familiar_fam', 'qtde_pessoas')),
+            [('11111111101', 2), ('22222222201', 1), ('33333333301', 1)],
+        )
+        self.assertFalse(correcao.familias.exists())
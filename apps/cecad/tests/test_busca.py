@@ -0,0 +1,47 @@
+import os
+import tempfile
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.cecad.models import Familia, ImportBatch, Pessoa, normalizar_nome
+from apps.cecad.services.busca import buscar_pessoas
+from apps.cecad.services.importer import CecadImporter
+from apps.cecad.tests.test_bulk_import import HEADER, ROWS
+
+
+class BuscaNomeTest(TestCase):
+    def test_normalizar_nome(self):
+        self.assertEqual(normalizar_nome('  José   da  Conceição '), 'JOSE DA CONCEICAO')
+        self.assertEqual(normalizar_nome(None), '')
+
+    def test_importacao_e_save_preenchem_nome_busca(self):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as f:
+            f.write("\n".join([HEADER] + ROWS) + "\n")
+        self.addCleanup(os.remove, path)
+        CecadImporter(path, ImportBatch.objects.create(), bulk=True).run()
+
+        self.assertEqual(Pessoa.objects.get(num_nis_pessoa_atual='20000000001').nom_pessoa_busca, 'JOSE LIMA FILHO')
+
+        pessoa = Pessoa.objects.get(num_nis_pessoa_atual='10000000001')
+        pessoa.nom_pessoa = 'Márcia Souza'
+        pessoa.save(update_fields=['nom_pessoa'])
+        pessoa.refresh_from_db()
+        self.assertEqual(pessoa.nom_pessoa_busca, 'MARCIA SOUZA')
+
+    def test_busca_ignora_acentos_sem_duplicar_familias(self):
+        familia = Familia.objects.create(cod_familiar_fam='1', dat_atual_fam=date(2024, 1, 1))
+        Pessoa.objects.create(familia=familia, num_nis_pessoa_atual='1', nom_pessoa='JOSÉ DA SILVA')
+        Pessoa.objects.create(familia=familia, num_nis_pessoa_atual='2', nom_pessoa='José Filho')
+
+        self.assertEqual(buscar_pessoas('jose').count(), 2)
+        # Trecho do nome, não só o início, em qualquer banco
+        self.assertEqual(list(buscar_pessoas('silva').values_list('num_nis_pessoa_atual', flat=True)), ['1'])
+        self.assertEqual(buscar_pessoas(' ').count(), 0)
+
+        self.client.force_login(User.objects.create_user('operador', password='x'))
+        response = self.client.get(reverse('cecad_familia_list'), {'q': 'josé'})
+        self.assertEqual(list(response.context['familias']), [familia])
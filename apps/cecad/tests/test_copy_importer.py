@@ -0,0 +1,81 @@
+import os
+import tempfile
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from apps.cecad.models import ImportBatch, Familia, Pessoa
+from apps.cecad.services.importer import CecadImporter, build_importer
+from apps.cecad.tests.test_bulk_import import HEADER, ROWS
+from apps.core.models import Validacao
+
+
+def _snapshot(batch):
+    familias = sorted(
+        Familia.objects.filter(import_batch=batch).values_list(
+            'cod_familiar_fam', 'dat_atual_fam', 'vlr_renda_media_fam', 'vlr_renda_total_fam',
+            'marc_pbf', 'ref_cad', 'ref_pbf', 'qtde_pessoas', 'nom_logradouro_fam',
+            'num_logradouro_fam', 'nom_localidade_fam', 'num_cep_logradouro_fam'
+        )
+    )
+    pessoas = sorted(
+        Pessoa.objects.filter(familia__import_batch=batch).values_list(
+            'familia__cod_familiar_fam', 'num_nis_pessoa_atual', 'nom_pessoa', 'num_cpf_pessoa',
+            'dat_nasc_pessoa', 'cod_sexo_pessoa', 'cod_parentesco_rf_pessoa',
+            'cod_curso_frequentou_pessoa_membro', 'cod_ano_serie_frequentou_pessoa_membro'
+        )
+    )
+    validacoes = sorted(
+        Validacao.objects.filter(familia__import_batch=batch).values_list(
+            'familia__cod_familiar_fam', 'status', 'pontuacao_total'
+        )
+    )
+    return familias, pessoas, validacoes
+
+
+class BuildImporterTest(TestCase):
+    def test_correcao_sempre_usa_orm(self):
+        batch = ImportBatch(batch_type='correction')
+        importer = build_importer('/tmp/x.csv', batch, correction_mode=True)
+        self.assertIs(type(importer), CecadImporter)
+
+    @skipUnless(connection.vendor == 'sqlite', "Fallback ORM é usado apenas fora do PostgreSQL")
+    def test_sqlite_usa_importador_orm(self):
+        importer = build_importer('/tmp/x.csv', ImportBatch(), bulk=True)
+        self.assertIs(type(importer), CecadImporter)
+        self.assertTrue(importer.bulk)
+
+
+@skipUnless(connection.vendor == 'postgresql', "COPY requer PostgreSQL")
+class PostgresCopyImporterTest(TransactionTestCase):
+    def setUp(self):
+        fd, self.file_path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as f:
+            f.write("\n".join([HEADER] + ROWS) + "\n")
+
+    def tearDown(self):
+        os.remove(self.file_path)
+
+    def test_copy_e_orm_geram_as_mesmas_linhas(self):
+        from apps.cecad.services.copy_importer import PostgresCopyImporter
+
+        batch_orm = ImportBatch.objects.create(description="ORM")
+        success, _ = CecadImporter(self.file_path, batch_orm).run()
+        self.assertTrue(success)
+
+        batch_copy = ImportBatch.objects.create(description="COPY")
+        importer = build_importer(self.file_path, batch_copy, chunk_size=2)
+        self.assertIsInstance(importer, PostgresCopyImporter)
+        success, message = importer.run()
+        self.assertTrue(success, message)
+
+        self.assertEqual(_snapshot(batch_orm), _snapshot(batch_copy))
+
+        batch_copy.refresh_from_db()
+        self.assertEqual(batch_copy.status, 'completed')
+        self.assertEqual(batch_copy.processed_rows, len(ROWS))
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [importer.staging_table])
+            self.assertIsNone(cursor.fetchone()[0])
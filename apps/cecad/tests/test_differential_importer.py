@@ -0,0 +1,164 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.cecad.models import ImportBatch, Familia, Pessoa
+from apps.cecad.services.differential_importer import DifferentialImporter
+from apps.cecad.services.importer import CecadImporter
+from apps.cecad.tests.test_bulk_import import HEADER, ROWS
+from apps.cecad.tests.test_copy_importer import _snapshot
+from apps.core.models import Criterio, Validacao, ValidacaoCriterio
+from apps.core.services.estatisticas_lote import resumo_lote
+
+# 111 inalterada (membros em outra ordem), 222 alterada, 333 removida, 444 nova
+ROWS_V2 = [
+    ROWS[2],
+    ROWS[0],
+    "22222222201;15/03/2024;80,00;80,00;0;1;Rua B;20;Alto;58228000;20000000001;Jose Lima Filho;;02/02/1970;1;1;;",
+    "44444444401;01/06/2024;30,00;90,00;1;3;Rua D;5;Centro;58228000;40000000001;Clara Dias;;03/03/1990;2;1;;",
+]
+
+# Famílias extras, inalteradas entre o lote de referência e o arquivo novo
+ROWS_EXTRAS = [
+    f"9{n:010d};01/01/2024;10,00;10,00;0;1;Rua E;{n};Centro;58228000;9{n:010d};Pessoa {n};;01/01/1990;2;1;;"
+    for n in range(6)
+]
+
+
+class DifferentialImporterTest(TestCase):
+    def _write(self, rows):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as f:
+            f.write("\n".join([HEADER] + rows) + "\n")
+        self.addCleanup(os.remove, path)
+        return path
+
+    def setUp(self):
+        # Lote de referência importado antes do hash existir
+        self.base = ImportBatch.objects.create(description="Base")
+        success, _ = CecadImporter(self._write(ROWS), self.base, bulk=True).run()
+        self.assertTrue(success)
+        self.familia_111 = Familia.objects.get(import_batch=self.base, cod_familiar_fam='11111111101')
+        Validacao.objects.filter(familia=self.familia_111).update(status='aprovado')
+
+    def _resumo_base(self):
+        return (
+            sorted(self.base.familias.values_list('cod_familiar_fam', 'import_batch_id')),
+            Pessoa.objects.filter(familia__import_batch=self.base).count(),
+            sorted(Validacao.objects.filter(familia__import_batch=self.base).values_list('familia_id', 'status')),
+            resumo_lote(self.base),
+        )
+
+    def test_classifica_sem_alterar_o_lote_de_referencia(self):
+        base_antes = self._resumo_base()
+        batch = ImportBatch.objects.create(description="Diferencial")
+        success, _ = DifferentialImporter(self._write(ROWS_V2), batch, chunk_size=2).run()
+        self.assertTrue(success)
+        batch.refresh_from_db()
+
+        self.assertEqual(batch.base_batch, self.base)
+        self.assertEqual(
+            (batch.familias_novas, batch.familias_alteradas, batch.familias_inalteradas, batch.familias_removidas),
+            (1, 1, 1, 1),
+        )
+        self.assertEqual((batch.processed_rows, batch.total_rows), (len(ROWS_V2), len(ROWS_V2)))
+
+        # Visão completa do arquivo no lote novo
+        self.assertEqual(
+            sorted(batch.familias.values_list('cod_familiar_fam', flat=True)),
+            ['11111111101', '22222222201', '44444444401'],
+        )
+        self.assertEqual(Pessoa.objects.filter(familia__import_batch=batch).count(), 4)
+
+        # Lote de referência intacto: famílias, membros, validações e estatísticas
+        self.assertEqual(self._resumo_base(), base_antes)
+        self.familia_111.refresh_from_db()
+        self.assertEqual(self.familia_111.import_batch, self.base)
+        self.assertEqual(self.familia_111.validacoes.get().status, 'aprovado')
+
+        # Como na importação completa, todas as famílias do lote novo ficam pendentes
+        self.assertEqual(
+            set(Validacao.objects.filter(familia__import_batch=batch).values_list('status', flat=True)),
+            {'pendente'},
+        )
+        alterada = batch.familias.get(cod_familiar_fam='22222222201')
+        self.assertEqual(str(alterada.vlr_renda_media_fam), '80.00')
+        self.assertTrue(alterada.content_hash)
+
+        # Estatísticas do lote novo
+        self.assertEqual(resumo_lote(batch)['total_familias'], 3)
+
+    def test_manter_validacoes_copia_as_das_inalteradas(self):
+        validacao = self.familia_111.validacoes.get()
+        criterio = Criterio.objects.create(codigo='C01', descricao='Critério', pontos=10)
+        ValidacaoCriterio.objects.create(validacao=validacao, criterio=criterio, atendido=True)
+
+        batch = ImportBatch.objects.create(description="Diferencial")
+        success, _ = DifferentialImporter(self._write(ROWS_V2), batch, manter_validacoes=True).run()
+        self.assertTrue(success)
+
+        copia = Validacao.objects.get(familia__import_batch=batch, familia__cod_familiar_fam='11111111101')
+        self.assertEqual(copia.status, 'aprovado')
+        self.assertNotEqual(copia.pk, validacao.pk)
+        self.assertEqual(
+            list(copia.criterios_avaliados.values_list('criterio_id', 'atendido')), [(criterio.pk, True)]
+        )
+        # A validação original continua na família do lote de referência
+        self.assertEqual(self.familia_111.validacoes.get().pk, validacao.pk)
+        self.assertEqual(validacao.criterios_avaliados.count(), 1)
+
+        # Alteradas e novas continuam pendentes
+        self.assertEqual(
+            set(
+                Validacao.objects.filter(familia__import_batch=batch)
+                .exclude(pk=copia.pk)
+                .values_list('status', flat=True)
+            ),
+            {'pendente'},
+        )
+
+    def test_reimportar_mesmo_arquivo_preserva_o_lote_anterior(self):
+        batch = ImportBatch.objects.create(description="Diferencial 1")
+        DifferentialImporter(self._write(ROWS_V2), batch).run()
+
+        batch2 = ImportBatch.objects.create(description="Diferencial 2")
+        success, _ = DifferentialImporter(self._write(ROWS_V2), batch2).run()
+        self.assertTrue(success)
+        batch2.refresh_from_db()
+        self.assertEqual(batch2.base_batch, batch)
+        self.assertEqual(batch2.familias_inalteradas, 3)
+        self.assertEqual(batch2.familias.count(), 3)
+        self.assertEqual(batch.familias.count(), 3)
+
+    def _diferencial_com_extras(self, extras):
+        """Arquivo com `extras` famílias inalteradas e 222 alterada; retorna (lote, famílias montadas, queries)."""
+        base = ImportBatch.objects.create(description="Base")
+        CecadImporter(self._write(ROWS + ROWS_EXTRAS[:extras]), base, bulk=True).run()
+        path = self._write(ROWS + ROWS_EXTRAS[:extras] + [ROWS_V2[2]])
+
+        batch = ImportBatch.objects.create(description="Diferencial")
+        bulk_create = Familia.objects.bulk_create
+        with patch.object(Familia.objects, 'bulk_create', wraps=bulk_create) as criadas, \
+                CaptureQueriesContext(connection) as queries:
+            success, _ = DifferentialImporter(path, batch, base_batch=base).run()
+        self.assertTrue(success)
+
+        completo = ImportBatch.objects.create(description="Completo")
+        CecadImporter(path, completo, bulk=True).run()
+        self.assertEqual(_snapshot(batch), _snapshot(completo))
+        self.assertFalse(batch.familias.exclude(rf_pessoa__familia__import_batch=batch).exists())
+        return batch, sum(len(c.args[0]) for c in criadas.call_args_list), len(queries)
+
+    def test_inalteradas_sao_copiadas_sem_passar_pelo_python(self):
+        _, montadas_pequeno, queries_pequeno = self._diferencial_com_extras(0)
+        lote, montadas_grande, queries_grande = self._diferencial_com_extras(len(ROWS_EXTRAS))
+
+        self.assertEqual(lote.familias_inalteradas, 2 + len(ROWS_EXTRAS))
+        # Só a família alterada é montada no Python, e o custo em queries não
+        # cresce com as inalteradas
+        self.assertEqual((montadas_pequeno, montadas_grande), (1, 1))
+        self.assertEqual(queries_pequeno, queries_grande)
@@ -0,0 +1,60 @@
+import os
+import tempfile
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.cecad.models import DomicilioContagem, Familia, ImportBatch
+from apps.cecad.services.domicilios import qtde_familias_domicilio
+from apps.cecad.services.importer import CecadImporter
+from apps.cecad.tests.test_bulk_import import HEADER, ROWS
+from apps.core.models import Validacao, ValidacaoHistorico
+
+
+class DomiciliosTest(TestCase):
+    def setUp(self):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as f:
+            f.write("\n".join([HEADER] + ROWS) + "\n")
+        self.addCleanup(os.remove, path)
+        self.batch = ImportBatch.objects.create()
+        CecadImporter(path, self.batch, bulk=True).run()
+
+    def test_importacao_preenche_codigo_e_contagens(self):
+        familia = self.batch.familias.get(cod_familiar_fam='11111111101')
+        self.assertEqual(familia.cod_domicilio, '11111111')
+        self.assertEqual(
+            dict(self.batch.domicilios.values_list('cod_domicilio', 'total')),
+            {'11111111': 1, '22222222': 1, '33333333': 1},
+        )
+
+    def test_familias_manuais_entram_na_contagem(self):
+        importada = self.batch.familias.get(cod_familiar_fam='11111111101')
+        manual = Familia.objects.create(cod_familiar_fam='11111111102', dat_atual_fam=date(2024, 1, 1))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(qtde_familias_domicilio(importada), 2)
+        self.assertEqual(qtde_familias_domicilio(manual), 2)
+
+        manual.cod_familiar_fam = '22222222202'
+        manual.save()
+        self.assertEqual(qtde_familias_domicilio(importada), 1)
+        self.assertEqual(qtde_familias_domicilio(manual), 2)
+
+        manual.delete()
+        self.assertFalse(DomicilioContagem.objects.filter(import_batch__isnull=True).exists())
+
+    def test_visualizacao_da_validacao_mostra_domicilio_e_historico(self):
+        usuario = User.objects.create_user('operador', password='x')
+        validacao = Validacao.objects.get(familia__cod_familiar_fam='11111111101')
+        ValidacaoHistorico.objects.create(
+            validacao=validacao, editado_por=usuario, campos_alterados={'status': ['pendente', 'aprovado']},
+            status_anterior='pendente', status_novo='aprovado',
+        )
+
+        self.client.force_login(usuario)
+        response = self.client.get(reverse('validacao_view', args=[validacao.pk]))
+        self.assertEqual(response.context['qtde_familias_domicilio'], 1)
+        self.assertEqual(list(response.context['historico']), list(validacao.historico_edicoes.all()))
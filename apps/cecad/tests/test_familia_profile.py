@@ -0,0 +1,64 @@
+import os
+import tempfile
+from datetime import date
+
+from django.test import TestCase
+
+from apps.cecad.models import ImportBatch, Familia, Pessoa
+from apps.cecad.services.importer import CecadImporter
+from apps.cecad.tests.test_bulk_import import HEADER, ROWS
+
+
+class FamiliaPerfilTest(TestCase):
+    def _familia(self, cod):
+        return Familia.objects.create(cod_familiar_fam=cod, dat_atual_fam=date(2024, 1, 1))
+
+    def test_importacao_preenche_perfil(self):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as f:
+            f.write("\n".join([HEADER] + ROWS) + "\n")
+        self.addCleanup(os.remove, path)
+
+        for bulk in (False, True):
+            batch = ImportBatch.objects.create(description=f"bulk={bulk}")
+            CecadImporter(path, batch, bulk=bulk).run()
+
+            familia = batch.familias.get(cod_familiar_fam='11111111101')
+            self.assertEqual((familia.num_membros, familia.num_filhos), (2, 1))
+            self.assertEqual(familia.rf_pessoa.num_nis_pessoa_atual, '10000000001')
+            self.assertEqual(familia.rf_sexo, '2')
+            self.assertFalse(familia.tem_conjuge)
+            self.assertEqual(familia.dat_nasc_mais_novo, date(2015, 5, 5))
+            self.assertEqual(familia.dat_nasc_mais_velho, date(1980, 1, 1))
+            self.assertTrue(familia.tem_criancas())
+
+            sem_nascimento = batch.familias.get(cod_familiar_fam='33333333301')
+            self.assertTrue(sem_nascimento.is_unipessoal())
+            self.assertIsNone(sem_nascimento.dat_nasc_mais_novo)
+
+    def test_perfil_acompanha_alteracoes_em_pessoa(self):
+        origem = self._familia('1')
+        destino = self._familia('2')
+        rf = Pessoa.objects.create(familia=origem, num_nis_pessoa_atual='1', nom_pessoa='RF', cod_sexo_pessoa='1')
+        conjuge = Pessoa.objects.create(
+            familia=origem, num_nis_pessoa_atual='2', nom_pessoa='Cônjuge', cod_parentesco_rf_pessoa=2
+        )
+
+        origem.refresh_from_db()
+        self.assertEqual((origem.num_membros, origem.rf_pessoa_id, origem.tem_conjuge), (2, rf.pk, True))
+        self.assertTrue(origem.is_rf_homem())
+
+        # Transferência atualiza origem e destino
+        conjuge = Pessoa.objects.get(pk=conjuge.pk)
+        conjuge.familia = destino
+        conjuge.cod_parentesco_rf_pessoa = 1
+        conjuge.save()
+        origem.refresh_from_db()
+        destino.refresh_from_db()
+        self.assertEqual((origem.num_membros, origem.tem_conjuge), (1, False))
+        self.assertEqual((destino.num_membros, destino.rf_pessoa_id, destino.rf_sexo), (1, conjuge.pk, '2'))
+
+        rf.delete()
+        origem.refresh_from_db()
+        self.assertEqual((origem.num_membros, origem.rf_pessoa, origem.rf_sexo), (0, None, ''))
+        self.assertIsNone(origem.get_responsavel_familiar())
@@ -0,0 +1,34 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.cecad.models import ImportBatch
+from apps.cecad.services.lote_atual import lote_atual
+
+
+class LoteAtualTest(TestCase):
+    def test_resolve_uma_vez_e_invalida_ao_concluir(self):
+        self.assertIsNone(lote_atual())
+        primeiro = ImportBatch.objects.create(status='completed')
+        ImportBatch.objects.create(status='completed', batch_type='correction')
+
+        self.assertEqual(lote_atual(), primeiro)
+        with self.assertNumQueries(0):
+            self.assertEqual(lote_atual(), primeiro)
+
+        # Progresso de uma importação em andamento não troca o lote
+        novo = ImportBatch.objects.create(status='processing')
+        self.assertEqual(lote_atual(), primeiro)
+
+        novo.status = 'completed'
+        novo.save()
+        self.assertEqual(lote_atual(), novo)
+
+        novo.delete()
+        self.assertEqual(lote_atual(), primeiro)
+
+    def test_context_processor(self):
+        lote = ImportBatch.objects.create(status='completed')
+        self.client.force_login(User.objects.create_user('operador', password='x'))
+        response = self.client.get(reverse('fila_validacao'))
+        self.assertEqual(response.context['lote_atual'], lote)
@@ -0,0 +1,115 @@
+import csv
+import os
+import tempfile
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from apps.cecad.models import ImportBatch
+from apps.cecad.services.importer import CecadImporter, build_importer
+from apps.cecad.services.parallel_importer import ParallelImporter, shard_for
+from apps.cecad.tests.test_bulk_import import HEADER, ROWS
+from apps.cecad.tests.test_copy_importer import _snapshot
+
+
+class ParallelImporterTest(TestCase):
+    def setUp(self):
+        fd, self.file_path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as f:
+            f.write("\n".join([HEADER] + ROWS) + "\n")
+
+    def tearDown(self):
+        os.remove(self.file_path)
+
+    def test_shard_for_e_estavel(self):
+        self.assertEqual(shard_for('11111111101', 4), shard_for('11111111101', 4))
+        self.assertTrue(all(0 <= shard_for(f'{i:011d}', 3) < 3 for i in range(50)))
+
+    def test_linhas_da_mesma_familia_ficam_no_mesmo_shard(self):
+        importer = ParallelImporter(self.file_path, ImportBatch(pk=1), workers=3)
+        shard_dir = tempfile.mkdtemp()
+        with open(self.file_path, encoding='utf-8') as f:
+            reader = csv.DictReader(f, delimiter=';')
+            paths, total = importer._write_shards(reader, shard_dir)
+
+        self.assertEqual(total, len(ROWS))
+        shards_por_familia = {}
+        linhas = 0
+        for idx, path in enumerate(paths):
+            with open(path, encoding='utf-8') as f:
+                for row in csv.DictReader(f, delimiter=';'):
+                    shards_por_familia.setdefault(row['d.cod_familiar_fam'], set()).add(idx)
+                    linhas += 1
+            os.remove(path)
+        os.rmdir(shard_dir)
+
+        self.assertEqual(linhas, len(ROWS))
+        self.assertTrue(all(len(shards) == 1 for shards in shards_por_familia.values()))
+
+    def test_colunas_excedentes_sao_descartadas(self):
+        path = os.path.join(tempfile.mkdtemp(), 'excedente.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("\n".join([HEADER, ROWS[0] + ";extra;colunas"]) + "\n")
+        self.addCleanup(os.remove, path)
+
+        importer = ParallelImporter(path, ImportBatch(pk=1), workers=2)
+        shard_dir = tempfile.mkdtemp()
+        with open(path, encoding='utf-8') as f:
+            paths, total = importer._write_shards(csv.DictReader(f, delimiter=';'), shard_dir)
+
+        self.assertEqual(total, 1)
+        linhas = []
+        for shard_path in paths:
+            with open(shard_path, encoding='utf-8') as f:
+                linhas += list(csv.DictReader(f, delimiter=';'))
+            os.remove(shard_path)
+        os.rmdir(shard_dir)
+        self.assertEqual(len(linhas), 1)
+        self.assertNotIn(None, linhas[0])
+        self.assertEqual(linhas[0]['p.nom_pessoa'], 'Maria Souza')
+
+    @skipUnless(connection.vendor == 'sqlite', "Fallback em processo único é usado apenas no SQLite")
+    def test_sqlite_cai_para_bulk_em_processo_unico(self):
+        batch = ImportBatch.objects.create(description="Paralelo")
+        importer = build_importer(self.file_path, batch, workers=4, chunk_size=2)
+        self.assertIsInstance(importer, ParallelImporter)
+        self.assertFalse(importer._can_fork())
+
+        success, _ = importer.run()
+        self.assertTrue(success)
+        batch.refresh_from_db()
+        self.assertEqual(batch.familias.count(), 3)
+        self.assertEqual(batch.processed_rows, len(ROWS))
+
+    @override_settings(CECAD_IMPORT_WORKERS=1)
+    def test_um_worker_nao_usa_importador_paralelo(self):
+        importer = build_importer(self.file_path, ImportBatch())
+        self.assertNotIsInstance(importer, ParallelImporter)
+
+
+@skipUnless(connection.vendor == 'postgresql', "O pool de processos requer PostgreSQL")
+class ParallelImporterPoolTest(TransactionTestCase):
+    def setUp(self):
+        fd, self.file_path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as f:
+            f.write("\n".join([HEADER] + ROWS) + "\n")
+
+    def tearDown(self):
+        os.remove(self.file_path)
+
+    def test_pool_equivale_ao_importador_serial(self):
+        batch_serial = ImportBatch.objects.create(description="Serial")
+        success, _ = CecadImporter(self.file_path, batch_serial).run()
+        self.assertTrue(success)
+
+        batch_pool = ImportBatch.objects.create(description="Paralelo")
+        importer = ParallelImporter(self.file_path, batch_pool, workers=2, chunk_size=2)
+        self.assertTrue(importer._can_fork())
+        success, message = importer.run()
+        self.assertTrue(success, message)
+
+        self.assertEqual(_snapshot(batch_serial), _snapshot(batch_pool))
+        batch_pool.refresh_from_db()
+        self.assertEqual(batch_pool.status, 'completed')
+        self.assertEqual(batch_pool.processed_rows, len(ROWS))
@@ -38,7 +38,7 @@ class CecadVersioningTest(TestCase):
         
         # Verify Batch 1 Data
         self.assertEqual(Familia.objects.filter(import_batch=batch1).count(), 1)
-        self.assertEqual(Pessoa.objects.filter(import_batch=batch1).count(), 2)
+        self.assertEqual(Pessoa.objects.filter(familia__import_batch=batch1).count(), 2)
         fam1 = Familia.objects.get(import_batch=batch1, cod_familiar_fam='12345678901')
         self.assertEqual(fam1.vlr_renda_media_fam, 100.00)
 
@@ -50,7 +50,7 @@ class CecadVersioningTest(TestCase):
         
         # Verify Batch 2 Data
         self.assertEqual(Familia.objects.filter(import_batch=batch2).count(), 1)
-        self.assertEqual(Pessoa.objects.filter(import_batch=batch2).count(), 2)
+        self.assertEqual(Pessoa.objects.filter(familia__import_batch=batch2).count(), 2)
         fam2 = Familia.objects.get(import_batch=batch2, cod_familiar_fam='12345678901')
         self.assertEqual(fam2.vlr_renda_media_fam, 150.00)
 
@@ -9,6 +9,7 @@ urlpatterns = [
     path('importar/progresso/<int:pk>/api/', views.ImportProgressAPIView.as_view(), name='cecad_import_progress_api'),
     path('historico/', views.ImportBatchListView.as_view(), name='cecad_batch_list'),
     path('historico/<int:pk>/', views.ImportBatchDetailView.as_view(), name='cecad_batch_detail'),
+    path('historico/<int:pk>/retomar/', views.ImportResumeView.as_view(), name='cecad_batch_resume'),
     path('comparar/', views.ComparisonView.as_view(), name='cecad_comparison'),
     
     # CRUD de Famílias
@@ -6,12 +6,16 @@ from django.db.models import Count, Sum, Avg, Q
 from django.core.paginator import Paginator
 from django.http import JsonResponse, HttpResponseBadRequest
 from django.urls import reverse_lazy, reverse
+from django.db import transaction
+from django.utils import timezone
 from .models import Familia, Pessoa, Beneficio, ImportBatch
 from .forms import FamiliaForm, PessoaForm
-from .services.importer import CecadImporter
-from apps.core.models import Validacao
-import os
-import threading
+from .services.busca import filtro_busca_familia
+from .services.lote_atual import lote_atual
+from apps.core.models import Job, Validacao
+from apps.core.services.jobs import enqueue
+from apps.core.services.estatisticas_lote import resumo_lote
+from apps.core.services.paginacao import PaginacaoCursorMixin
 
 class DashboardView(LoginRequiredMixin, TemplateView):
     template_name = "cecad/dashboard.html"
@@ -19,7 +23,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Get latest completed batch (only full imports)
-        latest_batch = ImportBatch.objects.filter(status='completed', batch_type='full').first()
+        latest_batch = lote_atual()
         context['latest_batch'] = latest_batch
         
         if latest_batch:
@@ -57,39 +61,28 @@ class ImportDataView(LoginRequiredMixin, UserPassesTestMixin, View):
 
         csv_file = request.FILES['csv_file']
         description = request.POST.get('description', '')
+        differential = request.POST.get('differential') == 'on'
+        manter_validacoes = differential and request.POST.get('manter_validacoes') == 'on'
         
         if not csv_file.name.endswith('.csv'):
             messages.error(request, 'O arquivo deve ser um CSV.')
             return redirect('cecad_import')
 
-        # Save temporary file
-        import uuid
-        ext = os.path.splitext(csv_file.name)[1]
-        unique_filename = f"{uuid.uuid4()}{ext}"
-        file_path = f'/tmp/{unique_filename}'
-        with open(file_path, 'wb+') as destination:
-            for chunk in csv_file.chunks():
-                destination.write(chunk)
-
         # Create ImportBatch
         batch = ImportBatch.objects.create(
             description=description or f"Importação de {csv_file.name}",
             original_file=csv_file
         )
 
-        # Run import in background thread
-        def run_import():
-            importer = CecadImporter(file_path, batch)
-            importer.run()
-            # Clean up temp file after import
-            try:
-                os.remove(file_path)
-            except:
-                pass
-        
-        thread = threading.Thread(target=run_import)
-        thread.daemon = True
-        thread.start()
+        # A importação roda no worker (manage.py run_workers), fora do processo web
+        enqueue(
+            'cecad.import',
+            {
+                'batch_id': batch.pk, 'bulk': True, 'single_pass': True,
+                'differential': differential, 'manter_validacoes': manter_validacoes,
+            },
+            user=request.user,
+        )
         
         # Redirect immediately to progress page
         return redirect('cecad_import_progress', pk=batch.pk)
@@ -109,15 +102,6 @@ class ImportCorrectionView(ImportDataView):
             messages.error(request, 'O arquivo deve ser um CSV.')
             return redirect('cecad_import_correction')
 
-        # Save temporary file
-        import uuid
-        ext = os.path.splitext(csv_file.name)[1]
-        unique_filename = f"{uuid.uuid4()}{ext}"
-        file_path = f'/tmp/{unique_filename}'
-        with open(file_path, 'wb+') as destination:
-            for chunk in csv_file.chunks():
-                destination.write(chunk)
-
         # Create ImportBatch
         batch = ImportBatch.objects.create(
             description=description or f"Correção de {csv_file.name}",
@@ -125,23 +109,55 @@ class ImportCorrectionView(ImportDataView):
             batch_type='correction'
         )
 
-        # Run import in background thread with correction_mode=True
-        def run_import():
-            importer = CecadImporter(file_path, batch, correction_mode=True)
-            importer.run()
-            # Clean up temp file after import
-            try:
-                os.remove(file_path)
-            except:
-                pass
-        
-        thread = threading.Thread(target=run_import)
-        thread.daemon = True
-        thread.start()
+        # Run import in the background worker with correction_mode=True
+        enqueue(
+            'cecad.import',
+            {'batch_id': batch.pk, 'correction_mode': True},
+            user=request.user,
+        )
         
         # Redirect immediately to progress page
         return redirect('cecad_import_progress', pk=batch.pk)
 
+class ImportResumeView(ImportDataView):
+    """Reenfileira um lote interrompido, retomando do último checkpoint."""
+
+    def get(self, request, pk):
+        return redirect('cecad_batch_detail', pk=pk)
+
+    def post(self, request, pk):
+        # O lock no lote serializa retomadas simultâneas do mesmo lote
+        with transaction.atomic():
+            batch = get_object_or_404(ImportBatch.objects.select_for_update(), pk=pk)
+            if not batch.can_resume:
+                messages.error(request, 'Este lote não pode ser retomado.')
+                return redirect('cecad_batch_detail', pk=pk)
+
+            jobs = Job.objects.filter(task='cecad.import', payload__batch_id=batch.pk)
+            # Uma falha deixa o lote em erro, mas o Job pode estar rodando ou
+            # aguardando o retry automático (que já retoma do checkpoint)
+            em_andamento = jobs.filter(status__in=['pending', 'running']).order_by('-created_at').first()
+            if em_andamento and em_andamento.status == 'running':
+                messages.info(request, 'A importação deste lote já está em andamento.')
+                return redirect('cecad_import_progress', pk=batch.pk)
+
+            batch.status = 'processing'
+            batch.error_message = ''
+            batch.save(update_fields=['status', 'error_message'])
+
+            if em_andamento:
+                # Antecipa o retry agendado em vez de criar um segundo Job
+                em_andamento.run_after = timezone.now()
+                em_andamento.save(update_fields=['run_after'])
+                return redirect('cecad_import_progress', pk=batch.pk)
+
+            # Reaproveita as opções da importação original
+            last_job = jobs.order_by('-created_at').first()
+            payload = dict(last_job.payload) if last_job else {'batch_id': batch.pk, 'bulk': True, 'single_pass': True}
+            payload['resume'] = True
+            enqueue('cecad.import', payload, user=request.user)
+        return redirect('cecad_import_progress', pk=batch.pk)
+
 class ImportBatchListView(LoginRequiredMixin, ListView):
     model = ImportBatch
     template_name = "cecad/import_batch_list.html"
@@ -180,18 +196,9 @@ class ComparisonView(LoginRequiredMixin, View):
         batch1 = get_object_or_404(ImportBatch, pk=batch1_id)
         batch2 = get_object_or_404(ImportBatch, pk=batch2_id)
         
-        # Simple comparison logic
-        stats1 = {
-            'total_familias': batch1.familias.count(),
-            'total_pessoas': Pessoa.objects.filter(familia__import_batch=batch1).count(),
-            'renda_media': batch1.familias.aggregate(Avg('vlr_renda_media_fam'))['vlr_renda_media_fam__avg'] or 0
-        }
-        
-        stats2 = {
-            'total_familias': batch2.familias.count(),
-            'total_pessoas': Pessoa.objects.filter(familia__import_batch=batch2).count(),
-            'renda_media': batch2.familias.aggregate(Avg('vlr_renda_media_fam'))['vlr_renda_media_fam__avg'] or 0
-        }
+        # Totais das estatísticas pré-agregadas de cada lote
+        stats1 = resumo_lote(batch1)
+        stats2 = resumo_lote(batch2)
         
         diff = {
             'familias': stats2['total_familias'] - stats1['total_familias'],
@@ -208,21 +215,22 @@ class ComparisonView(LoginRequiredMixin, View):
             'diff': diff
         })
 
-class FamiliaListView(LoginRequiredMixin, ListView):
+class FamiliaListView(LoginRequiredMixin, PaginacaoCursorMixin, ListView):
     model = Familia
     template_name = "cecad/familia_list.html"
     context_object_name = "familias"
     paginate_by = 20
+    keyset_ordering = ('-dat_atual_fam',)
 
     def get_queryset(self):
-        queryset = super().get_queryset().prefetch_related('membros')
+        queryset = super().get_queryset().select_related('rf_pessoa').prefetch_related('membros')
         
         # Filter by batch if provided
         batch_id = self.request.GET.get('batch')
         if batch_id:
             queryset = queryset.filter(import_batch_id=batch_id)
         elif batch_id != 'manual':  # Se não especificou batch, mostrar latest + manuais
-            latest_batch = ImportBatch.objects.filter(status='completed', batch_type='full').first()
+            latest_batch = lote_atual()
             if latest_batch:
                 queryset = queryset.filter(
                     Q(import_batch=latest_batch) | Q(import_batch__isnull=True)
@@ -233,11 +241,7 @@ class FamiliaListView(LoginRequiredMixin, ListView):
 
         query = self.request.GET.get('q')
         if query:
-            queryset = queryset.filter(
-                Q(cod_familiar_fam__icontains=query) |
-                Q(membros__nom_pessoa__icontains=query) |
-                Q(membros__num_nis_pessoa_atual__icontains=query)
-            ).distinct()
+            queryset = queryset.filter(filtro_busca_familia(query))
         return queryset
 
     def get_context_data(self, **kwargs):
@@ -269,17 +273,11 @@ class ImportProgressAPIView(LoginRequiredMixin, View):
     def get(self, request, pk):
         batch = get_object_or_404(ImportBatch, pk=pk)
         
-        # Calculate progress percentage
-        if batch.total_rows > 0:
-            percent = int((batch.processed_rows / batch.total_rows) * 100)
-        else:
-            percent = 0
-        
         data = {
             'status': batch.status,
             'total_rows': batch.total_rows,
             'processed_rows': batch.processed_rows,
-            'percent': percent,
+            'percent': batch.progress_percent,
             'error_message': batch.error_message,
         }
         
@@ -490,11 +488,7 @@ class PessoaTransferStartView(LoginRequiredMixin, View):
                     Q(membros__num_nis_pessoa_atual=q)
                 ).distinct()
             else:
-                familias = familias.filter(
-                    Q(cod_familiar_fam__icontains=q) |
-                    Q(membros__nom_pessoa__icontains=q) |
-                    Q(membros__num_nis_pessoa_atual__icontains=q)
-                ).distinct()
+                familias = familias.filter(filtro_busca_familia(q))
 
             familias = familias.exclude(pk=familia.pk)
             paginator = Paginator(familias, 10)
@@ -520,11 +514,7 @@ class PessoaTransferExistingSearchView(LoginRequiredMixin, View):
                     Q(membros__num_nis_pessoa_atual=q)
                 ).distinct()
             else:
-                familias = familias.filter(
-                    Q(cod_familiar_fam__icontains=q) |
-                    Q(membros__nom_pessoa__icontains=q) |
-                    Q(membros__num_nis_pessoa_atual__icontains=q)
-                ).distinct()
+                familias = familias.filter(filtro_busca_familia(q))
         if exclude_familia_id:
             familias = familias.exclude(pk=exclude_familia_id)
 
@@ -556,8 +546,8 @@ class PessoaTransferCreateFamilyView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         from apps.core.models import Validacao
         
-        # Sempre vincular ao último lote importado (status concluído)
-        last_batch = ImportBatch.objects.filter(status='completed').first()
+        # Sempre vincular ao lote atual (última importação completa)
+        last_batch = lote_atual()
         form.instance.import_batch = last_batch
         response = super().form_valid(form)
         
@@ -6,7 +6,8 @@ from .models import (
     ValidacaoCriterio, 
     ValidacaoHistorico,
     DocumentoPessoa,
-    DocumentoValidacao
+    DocumentoValidacao,
+    Job
 )
 
 
@@ -85,3 +86,24 @@ class DocumentoValidacaoAdmin(admin.ModelAdmin):
     list_filter = ('created_at', 'tipo')
     search_fields = ('tipo', 'descricao', 'validacao__familia__cod_familiar_fam')
 
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('task', 'status', 'progresso', 'attempts', 'locked_by', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'task')
+    readonly_fields = (
+        'attempts', 'locked_by', 'heartbeat_at', 'progress_done', 'progress_total',
+        'started_at', 'finished_at', 'created_at'
+    )
+    actions = ['cancelar']
+
+    @admin.display(description="Progresso")
+    def progresso(self, obj):
+        if not obj.progress_total:
+            return "-"
+        return f"{obj.progress_done}/{obj.progress_total} ({obj.progress_percent}%)"
+
+    @admin.action(description="Cancelar tarefas selecionadas")
+    def cancelar(self, request, queryset):
+        for job in queryset.filter(status__in=['pending', 'running']):
+            job.request_cancel()
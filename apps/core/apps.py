@@ -6,6 +6,9 @@ class CoreConfig(AppConfig):
     name = 'apps.core'
 
     def ready(self):
-        """Importa signals quando a aplicação é carregada."""
+        """Importa signals e registra as tarefas (módulos tasks.py) quando a aplicação é carregada."""
+        from django.utils.module_loading import autodiscover_modules
+
         import apps.core.signals  # noqa
+        autodiscover_modules('tasks')
 
@@ -1,6 +1,8 @@
+import time
+
 from django.core.management.base import BaseCommand
-from django.db import transaction
 from apps.core.models import Validacao, Criterio, ValidacaoCriterio
+from apps.core.services.criteria_bulk import associar_em_blocos, pode_usar_processos
 
 
 class Command(BaseCommand):
@@ -12,53 +14,80 @@ class Command(BaseCommand):
             action='store_true',
             help='Força a recriação de todos os critérios, removendo os existentes primeiro',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Validações processadas (e commitadas) por bloco',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Número de processos (requer PostgreSQL; no SQLite roda em processo único)',
+        )
+        parser.add_argument(
+            '--after-id',
+            type=int,
+            default=None,
+            metavar='VALIDACAO_ID',
+            help='Retoma a partir da validação seguinte a este id (último id processado)',
+        )
 
     def handle(self, *args, **options):
         force = options.get('force', False)
-        
+        chunk_size = max(1, options['chunk_size'])
+        workers = max(1, options['workers'])
+        after_id = options['after_id']
+
         self.stdout.write(self.style.MIGRATE_HEADING('🚀 Associando critérios em massa...'))
-        
+
         # Buscar todos os critérios ativos
-        criterios = list(Criterio.objects.filter(ativo=True))
-        total_criterios = len(criterios)
-        
+        total_criterios = Criterio.objects.filter(ativo=True).count()
+
         if total_criterios == 0:
             self.stdout.write(self.style.ERROR('❌ Nenhum critério ativo encontrado!'))
             self.stdout.write(self.style.WARNING('Execute primeiro: python manage.py popular_criterios'))
             return
-        
+
         self.stdout.write(f'📋 Critérios ativos: {total_criterios}')
-        
-        self.stdout.write(f'👥 Processando {Validacao.objects.count()} validações...')
-        self.stdout.write('⏳ Verificando critérios aplicáveis (pode levar alguns minutos)...')
-        
-        from apps.core.services.criteria_logic import CriteriaAssociator
-        
+
+        pendentes = Validacao.objects.filter(pk__gt=after_id) if after_id else Validacao.objects.all()
+        total_validacoes = pendentes.count()
+        self.stdout.write(f'👥 Processando {total_validacoes} validações em blocos de {chunk_size}...')
+        if after_id:
+            self.stdout.write(f'↪️  Retomando após a validação {after_id}')
+        if workers > 1 and not pode_usar_processos(workers):
+            self.stdout.write(self.style.WARNING('⚠️  Banco sem escrita concorrente: executando em processo único.'))
+
+        # Cada bloco associa, repontua no banco e faz commit
+        inicio = time.monotonic()
+        processadas = 0
         total_associacoes = 0
-        validacoes = Validacao.objects.select_related('familia').prefetch_related('familia__membros').all()
-        
-        # Processar em transação para garantir integridade
-        with transaction.atomic():
-            for i, validacao in enumerate(validacoes, 1):
-                criados = CriteriaAssociator.associate_criteria(validacao)
-                total_associacoes += criados
-                
-                if i % 100 == 0:
-                    self.stdout.write('.', ending='')
-                    self.stdout.flush()
-        
-        self.stdout.write('')
-        self.stdout.write('')
-        self.stdout.write(self.style.SUCCESS(f'✅ Processo concluído! {total_associacoes} novas associações criadas.'))
-        
-        # Recalcular pontuações em massa
-        self.stdout.write('🔢 Recalculando pontuações...')
-        
-        for validacao in validacoes:
-            validacao.atualizar_pontuacao()
-        
+        ultimo_id = after_id
+        try:
+            for ultimo_id, validacoes, criadas in associar_em_blocos(chunk_size, after_id, workers):
+                processadas += validacoes
+                total_associacoes += criadas
+                decorrido = time.monotonic() - inicio
+                taxa = processadas / decorrido if decorrido else 0
+                self.stdout.write(
+                    f'  {processadas}/{total_validacoes} validações '
+                    f'({taxa:,.0f} validações/s) - último id {ultimo_id}'
+                )
+        except (Exception, KeyboardInterrupt):
+            if ultimo_id:
+                self.stderr.write(self.style.ERROR(
+                    f'❌ Interrompido. Para retomar: manage.py associar_criterios --after-id {ultimo_id}'
+                ))
+            raise
+
+        decorrido = time.monotonic() - inicio
         self.stdout.write('')
-        self.stdout.write(self.style.SUCCESS('✨ Todas as pontuações foram atualizadas.'))
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Processo concluído! {total_associacoes} novas associações criadas '
+            f'em {decorrido:.1f}s; pontuações recalculadas.'
+        ))
         self.stdout.write(self.style.NOTICE(
             f'📈 Total de critérios cadastrados: {ValidacaoCriterio.objects.count():,}'
         ))
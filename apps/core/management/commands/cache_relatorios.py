@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.services.relatorios_cache import contadores_cache, zerar_contadores_cache
+
+
+class Command(BaseCommand):
+    help = 'Mostra os acertos e falhas do cache dos relatórios de composição familiar'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--zerar', action='store_true', help='Zera os contadores após exibi-los')
+
+    def handle(self, *args, **options):
+        contadores = contadores_cache()
+        self.stdout.write(
+            f"Acertos: {contadores['acertos']} | Falhas: {contadores['falhas']} "
+            f"| Taxa de acerto: {contadores['taxa_acerto']}%"
+        )
+        if options['zerar']:
+            zerar_contadores_cache()
+            self.stdout.write(self.style.SUCCESS('Contadores zerados.'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.models import LOCK_TIMEOUT_MINUTOS
+from apps.core.services.fila_validacao import liberar_locks_expirados
+
+
+class Command(BaseCommand):
+    help = 'Libera as validações cujo lock de avaliação expirou (também executado periodicamente pelos workers)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout-minutos',
+            type=int,
+            default=LOCK_TIMEOUT_MINUTOS,
+            help=f'Minutos sem renovação para considerar o lock expirado (padrão: {LOCK_TIMEOUT_MINUTOS})',
+        )
+
+    def handle(self, *args, **options):
+        liberadas = liberar_locks_expirados(options['timeout_minutos'])
+        self.stdout.write(self.style.SUCCESS(f'{liberadas} validação(ões) liberada(s).'))
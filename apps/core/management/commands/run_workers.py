@@ -0,0 +1,47 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from apps.core.services.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = 'Executa o worker da fila de tarefas em segundo plano (importações, exportações, critérios)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Executa no máximo uma tarefa pendente e encerra',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=None,
+            help='Encerra após executar esta quantidade de tarefas',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=None,
+            help='Segundos entre consultas quando a fila está vazia (padrão: settings.JOB_POLL_INTERVAL)',
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(poll_interval=options['poll_interval'])
+
+        if options['once']:
+            job = worker.run_once()
+            if job is None:
+                self.stdout.write('Nenhuma tarefa pendente.')
+            else:
+                self.stdout.write(f'{job}')
+            return
+
+        # Encerramento gracioso: termina a tarefa atual antes de sair
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker.worker_id} aguardando tarefas...'))
+        executed = worker.run(max_jobs=options['max_jobs'])
+        self.stdout.write(self.style.SUCCESS(f'Worker encerrado após {executed} tarefa(s).'))
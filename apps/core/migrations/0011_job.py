@@ -0,0 +1,133 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:09
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_validacaohistorico"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="validacao",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pendente", "Pendente"),
+                    ("aprovado", "Aprovado"),
+                    ("reprovado", "Reprovado"),
+                    ("em_analise", "Em Análise"),
+                ],
+                db_index=True,
+                default="pendente",
+                max_length=20,
+                verbose_name="Status",
+            ),
+        ),
+        migrations.CreateModel(
+            name="Job",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("task", models.CharField(max_length=100, verbose_name="Tarefa")),
+                (
+                    "payload",
+                    models.JSONField(
+                        blank=True, default=dict, verbose_name="Parâmetros"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pendente"),
+                            ("running", "Em Execução"),
+                            ("completed", "Concluída"),
+                            ("failed", "Falhou"),
+                            ("cancelled", "Cancelada"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                        verbose_name="Status",
+                    ),
+                ),
+                ("attempts", models.IntegerField(default=0, verbose_name="Tentativas")),
+                (
+                    "max_attempts",
+                    models.IntegerField(default=3, verbose_name="Máximo de Tentativas"),
+                ),
+                (
+                    "run_after",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="Executar a partir de",
+                    ),
+                ),
+                (
+                    "locked_by",
+                    models.CharField(blank=True, max_length=100, verbose_name="Worker"),
+                ),
+                (
+                    "heartbeat_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Último Sinal do Worker"
+                    ),
+                ),
+                (
+                    "cancel_requested",
+                    models.BooleanField(
+                        default=False, verbose_name="Cancelamento Solicitado"
+                    ),
+                ),
+                (
+                    "error_message",
+                    models.TextField(blank=True, verbose_name="Mensagem de Erro"),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "started_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Iniciada em"
+                    ),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Finalizada em"
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="jobs",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Criado por",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Tarefa em Segundo Plano",
+                "verbose_name_plural": "Tarefas em Segundo Plano",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(fields=["status", "run_after"], name="job_fila_idx")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_job"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="progress_done",
+            field=models.IntegerField(default=0, verbose_name="Itens Processados"),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="progress_total",
+            field=models.IntegerField(default=0, verbose_name="Total de Itens"),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cecad", "0013_familia_perfil"),
+        ("core", "0012_job_progress"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="validacao",
+            index=models.Index(
+                fields=["em_avaliacao_por", "iniciado_em"], name="validacao_lock_idx"
+            ),
+        ),
+    ]
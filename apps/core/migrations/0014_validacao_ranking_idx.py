@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_validacao_lock_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="validacao",
+            index=models.Index(
+                fields=["status", "-pontuacao_total"], name="validacao_ranking_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,185 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import (
+    BooleanField,
+    Case,
+    Count,
+    ExpressionWrapper,
+    F,
+    IntegerField,
+    Q,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+
+FAIXAS_RENDA = [0, 100, 200, 300, 400, 600, 1000, 999999]
+
+
+def preencher_estatisticas(apps, schema_editor):
+    """Mesma regra de services/estatisticas_lote.py: um GROUP BY sobre famílias e validações."""
+    Familia = apps.get_model("cecad", "Familia")
+    EstatisticaLote = apps.get_model("core", "EstatisticaLote")
+    faixa = Case(
+        *[
+            When(
+                vlr_renda_media_fam__gte=FAIXAS_RENDA[i],
+                vlr_renda_media_fam__lt=FAIXAS_RENDA[i + 1],
+                then=Value(i),
+            )
+            for i in range(len(FAIXAS_RENDA) - 1)
+        ],
+        default=None,
+        output_field=IntegerField(),
+    )
+    linhas = (
+        Familia.objects.annotate(
+            e_filhos=Case(
+                When(num_filhos__gte=5, then=Value(5)),
+                default=F("num_filhos"),
+                output_field=IntegerField(),
+            ),
+            e_mae_solo=ExpressionWrapper(
+                Q(rf_sexo="2", tem_conjuge=False), output_field=BooleanField()
+            ),
+            e_faixa=faixa,
+            e_status=Coalesce("validacoes__status", Value("")),
+        )
+        .values_list(
+            "import_batch_id",
+            "nom_localidade_fam",
+            "num_membros",
+            "e_filhos",
+            "e_mae_solo",
+            "e_faixa",
+            "e_status",
+        )
+        .annotate(
+            total=Count("id"),
+            com_renda=Count("vlr_renda_media_fam"),
+            renda_total=Sum("vlr_renda_media_fam"),
+        )
+        .order_by()
+    )
+    EstatisticaLote.objects.bulk_create(
+        [
+            EstatisticaLote(
+                import_batch_id=import_batch_id,
+                bairro=bairro or "",
+                num_membros=num_membros,
+                num_filhos=num_filhos,
+                mae_solo=bool(mae_solo),
+                faixa_renda=faixa_renda,
+                status=status,
+                total=total,
+                com_renda=com_renda,
+                renda_total=renda_total or 0,
+            )
+            for (
+                import_batch_id,
+                bairro,
+                num_membros,
+                num_filhos,
+                mae_solo,
+                faixa_renda,
+                status,
+                total,
+                com_renda,
+                renda_total,
+            ) in linhas.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cecad", "0016_domicilios"),
+        ("core", "0014_validacao_ranking_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EstatisticaLote",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "bairro",
+                    models.CharField(
+                        blank=True, max_length=100, verbose_name="Bairro/Localidade"
+                    ),
+                ),
+                (
+                    "num_membros",
+                    models.IntegerField(default=0, verbose_name="Número de Membros"),
+                ),
+                (
+                    "num_filhos",
+                    models.IntegerField(
+                        default=0, verbose_name="Número de Filhos (5 = 5 ou mais)"
+                    ),
+                ),
+                (
+                    "mae_solo",
+                    models.BooleanField(default=False, verbose_name="Mãe Solo"),
+                ),
+                (
+                    "faixa_renda",
+                    models.SmallIntegerField(
+                        blank=True, null=True, verbose_name="Faixa de Renda"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(blank=True, max_length=20, verbose_name="Status"),
+                ),
+                ("total", models.IntegerField(default=0, verbose_name="Total")),
+                (
+                    "com_renda",
+                    models.IntegerField(default=0, verbose_name="Com Renda Informada"),
+                ),
+                (
+                    "renda_total",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=16,
+                        verbose_name="Soma da Renda Média",
+                    ),
+                ),
+                (
+                    "import_batch",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="estatisticas",
+                        to="cecad.importbatch",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Estatística de Lote",
+                "verbose_name_plural": "Estatísticas de Lote",
+                "indexes": [
+                    models.Index(
+                        fields=["import_batch", "status"],
+                        name="estatistica_lote_status_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(preencher_estatisticas, migrations.RunPython.noop),
+    ]
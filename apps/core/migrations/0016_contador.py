@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_estatistica_lote"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Contador",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "chave",
+                    models.CharField(max_length=100, unique=True, verbose_name="Chave"),
+                ),
+                ("valor", models.BigIntegerField(default=0, verbose_name="Valor")),
+            ],
+            options={
+                "verbose_name": "Contador",
+                "verbose_name_plural": "Contadores",
+            },
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
-from apps.cecad.models import Familia
+from django.utils import timezone
+from apps.cecad.models import Familia, ImportBatch
 
 
 class Categoria(models.Model):
@@ -109,6 +111,10 @@ class Criterio(models.Model):
         return f"[{cat_nome}] {self.descricao} ({self.pontos} pts)"
 
 
+# Tempo sem renovação após o qual o lock de avaliação expira
+LOCK_TIMEOUT_MINUTOS = 30
+
+
 class Validacao(models.Model):
     STATUS_CHOICES = [
         ('pendente', 'Pendente'),
@@ -146,9 +152,22 @@ class Validacao(models.Model):
     class Meta:
         verbose_name = "Validação"
         verbose_name_plural = "Validações"
+        indexes = [
+            # Varredura de locks expirados (liberar_locks_expirados)
+            models.Index(fields=['em_avaliacao_por', 'iniciado_em'], name='validacao_lock_idx'),
+            # Paginação por cursor de relatórios e aprovados (ordem por pontuação)
+            models.Index(fields=['status', '-pontuacao_total'], name='validacao_ranking_idx'),
+        ]
 
     def __str__(self):
         return f"Validação {self.familia} - {self.get_status_display()}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Status carregado, para os signals detectarem mudanças
+        instance._status_original = instance.__dict__.get('status')
+        return instance
     
     def is_disponivel_para_usuario(self, usuario, timeout_minutos=30):
         """
@@ -179,6 +198,34 @@ class Validacao(models.Model):
         # Caso contrário, está bloqueada
         return False
     
+    def reservar_avaliacao(self, usuario, timeout_minutos=LOCK_TIMEOUT_MINUTOS):
+        """
+        Reserva a validação para o usuário num único UPDATE condicional
+        (livre, já do usuário ou com lock expirado). Evita a corrida entre
+        `is_disponivel_para_usuario` e `iniciar_avaliacao`.
+        Retorna True se o usuário ficou com a validação.
+        """
+        from django.utils import timezone
+        from datetime import timedelta
+        
+        agora = timezone.now()
+        reservada = Validacao.objects.filter(
+            Q(em_avaliacao_por__isnull=True)
+            | Q(em_avaliacao_por=usuario)
+            | Q(iniciado_em__lt=agora - timedelta(minutes=timeout_minutos)),
+            pk=self.pk,
+        ).update(em_avaliacao_por=usuario, iniciado_em=agora, status='em_analise')
+        if reservada:
+            if self.status != 'em_analise':
+                from apps.core.services.estatisticas_lote import registrar_validacao
+                from apps.core.services.versao_dados import incrementar_versao_validacoes
+                incrementar_versao_validacoes()
+                registrar_validacao(self, self.status, 'em_analise')
+            self.em_avaliacao_por = usuario
+            self.iniciado_em = agora
+            self.status = self._status_original = 'em_analise'
+        return bool(reservada)
+    
     def iniciar_avaliacao(self, usuario):
         """Marca a validação como sendo avaliada pelo usuário."""
         from django.utils import timezone
@@ -250,7 +297,7 @@ class Validacao(models.Model):
     def atualizar_pontuacao(self):
         """Atualiza o campo pontuacao_total com o cálculo atual e persiste no banco."""
         self.pontuacao_total = self.calcular_pontuacao()
-        self.save(update_fields=['pontuacao_total'])
+        self.save(update_fields=['pontuacao_total', 'updated_at'])
 
 
 class ValidacaoCriterio(models.Model):
@@ -277,6 +324,53 @@ class ValidacaoCriterio(models.Model):
         verbose_name_plural = "Avaliações de Critérios"
 
 
+class EstatisticaLote(models.Model):
+    """
+    Contagem pré-agregada de validações por lote, bairro, composição familiar,
+    faixa de renda e status (status vazio = famílias ainda sem validação).
+    Mantida por services/estatisticas_lote.py; lote nulo = famílias
+    cadastradas manualmente. Sem unicidade na chave: as leituras sempre somam.
+    """
+    import_batch = models.ForeignKey(
+        ImportBatch, on_delete=models.CASCADE, related_name='estatisticas', null=True, blank=True
+    )
+    bairro = models.CharField("Bairro/Localidade", max_length=100, blank=True)
+    num_membros = models.IntegerField("Número de Membros", default=0)
+    num_filhos = models.IntegerField("Número de Filhos (5 = 5 ou mais)", default=0)
+    mae_solo = models.BooleanField("Mãe Solo", default=False)
+    faixa_renda = models.SmallIntegerField("Faixa de Renda", null=True, blank=True)
+    status = models.CharField("Status", max_length=20, blank=True)
+    total = models.IntegerField("Total", default=0)
+    com_renda = models.IntegerField("Com Renda Informada", default=0)
+    renda_total = models.DecimalField("Soma da Renda Média", max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Estatística de Lote"
+        verbose_name_plural = "Estatísticas de Lote"
+        indexes = [
+            models.Index(fields=['import_batch', 'status'], name='estatistica_lote_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.import_batch_id or 'manual'} {self.bairro} {self.status or 'sem validação'}: {self.total}"
+
+
+class Contador(models.Model):
+    """
+    Contador compartilhado entre os processos (web, workers), atualizado
+    com UPDATE atômico. Ver services/contadores.py.
+    """
+    chave = models.CharField("Chave", max_length=100, unique=True)
+    valor = models.BigIntegerField("Valor", default=0)
+
+    class Meta:
+        verbose_name = "Contador"
+        verbose_name_plural = "Contadores"
+
+    def __str__(self):
+        return f"{self.chave}: {self.valor}"
+
+
 class DocumentoPessoa(models.Model):
     """Documentos pessoais vinculados a membros da família."""
     
@@ -432,3 +526,76 @@ class ValidacaoHistorico(models.Model):
     
     def __str__(self):
         return f"Edição de {self.validacao} por {self.editado_por} em {self.editado_em.strftime('%d/%m/%Y %H:%M')}"
+
+
+class Job(models.Model):
+    """Tarefa em segundo plano, executada pelo comando run_workers."""
+
+    STATUS_CHOICES = [
+        ('pending', 'Pendente'),
+        ('running', 'Em Execução'),
+        ('completed', 'Concluída'),
+        ('failed', 'Falhou'),
+        ('cancelled', 'Cancelada'),
+    ]
+
+    task = models.CharField("Tarefa", max_length=100)
+    payload = models.JSONField("Parâmetros", default=dict, blank=True)
+    status = models.CharField("Status", max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField("Tentativas", default=0)
+    max_attempts = models.IntegerField("Máximo de Tentativas", default=3)
+    run_after = models.DateTimeField("Executar a partir de", default=timezone.now)
+
+    # Controle de execução
+    locked_by = models.CharField("Worker", max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField("Último Sinal do Worker", null=True, blank=True)
+    cancel_requested = models.BooleanField("Cancelamento Solicitado", default=False)
+    error_message = models.TextField("Mensagem de Erro", blank=True)
+
+    # Progresso informado pela tarefa (JobContext.set_progress)
+    progress_done = models.IntegerField("Itens Processados", default=0)
+    progress_total = models.IntegerField("Total de Itens", default=0)
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        verbose_name="Criado por"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField("Iniciada em", null=True, blank=True)
+    finished_at = models.DateTimeField("Finalizada em", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Tarefa em Segundo Plano"
+        verbose_name_plural = "Tarefas em Segundo Plano"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_fila_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def progress_percent(self):
+        if self.progress_total:
+            return min(100, int(self.progress_done * 100 / self.progress_total))
+        return 100 if self.status == 'completed' else 0
+
+    def request_cancel(self):
+        """
+        Cancela a tarefa. Pendentes são canceladas na hora; em execução
+        recebem o pedido e param no próximo ponto de verificação.
+        """
+        if self.status == 'pending':
+            updated = Job.objects.filter(pk=self.pk, status='pending').update(
+                status='cancelled', finished_at=timezone.now()
+            )
+            if updated:
+                self.status = 'cancelled'
+                return
+        Job.objects.filter(pk=self.pk, status='running').update(cancel_requested=True)
+        self.cancel_requested = True
@@ -0,0 +1,33 @@
+"""
+Contadores compartilhados entre os processos.
+
+O cache padrão do Django é local a cada processo (web com vários workers do
+gunicorn e o container de workers da fila), então contadores que precisam ser
+vistos por todos ficam no banco (model Contador): o incremento é um UPDATE
+atômico e, dentro de uma transação, só fica visível para os demais processos
+junto com os dados que o motivaram.
+
+    incrementar('core:versao_validacoes')
+    valores('a', 'b')  # {'a': 3, 'b': 0}
+"""
+from django.db.models import F
+
+from apps.core.models import Contador
+
+
+def incrementar(chave, quantidade=1):
+    """Soma `quantidade` ao contador, criando-o na primeira vez."""
+    if not Contador.objects.filter(chave=chave).update(valor=F('valor') + quantidade):
+        # get_or_create trata a corrida entre processos que criam a mesma chave
+        Contador.objects.get_or_create(chave=chave)
+        Contador.objects.filter(chave=chave).update(valor=F('valor') + quantidade)
+
+
+def valores(*chaves):
+    """Valores dos contadores; os inexistentes valem 0."""
+    encontrados = dict(Contador.objects.filter(chave__in=chaves).values_list('chave', 'valor'))
+    return {chave: encontrados.get(chave, 0) for chave in chaves}
+
+
+def zerar(*chaves):
+    Contador.objects.filter(chave__in=chaves).update(valor=0)
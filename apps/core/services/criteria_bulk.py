@@ -0,0 +1,81 @@
+"""
+Associação de critérios e repontuação em massa, por blocos de validações.
+
+Usado pelo comando `associar_criterios`. As validações são percorridas por
+id (keyset), em blocos de tamanho fixo: cada bloco associa os critérios
+ativos com a avaliação em lote, repontua no banco e faz commit. Com mais de
+um worker os blocos são distribuídos num pool de processos (fork), como na
+importação paralela do CECAD.
+"""
+import multiprocessing
+
+from django.db import connection, connections, transaction
+
+from apps.core.models import Criterio, Validacao
+from apps.core.services.criteria_logic import CriteriaAssociator
+from apps.core.services.scoring import recalcular_pontuacoes
+
+
+def blocos_de_validacoes(chunk_size, after_id=None):
+    """Gera listas de ids de validação em ordem crescente, a partir de `after_id` (exclusivo)."""
+    ultimo = after_id or 0
+    while True:
+        ids = list(
+            Validacao.objects.filter(pk__gt=ultimo).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return
+        yield ids
+        ultimo = ids[-1]
+
+
+def processar_bloco(validacao_ids):
+    """
+    Associa os critérios ativos e recalcula a pontuação de um bloco, numa
+    transação. Retorna (último id do bloco, validações, associações criadas).
+    """
+    criterios = list(Criterio.objects.filter(ativo=True))
+    with transaction.atomic():
+        validacoes = Validacao.objects.filter(pk__in=validacao_ids).only('id', 'familia_id')
+        criadas = CriteriaAssociator.associate_criteria_bulk(validacoes, criterios, chunk_size=len(validacao_ids))
+        recalcular_pontuacoes(validacao_ids, chunk_size=len(validacao_ids))
+    return validacao_ids[-1], len(validacao_ids), criadas
+
+
+def _processar_bloco_worker(validacao_ids):
+    try:
+        return processar_bloco(validacao_ids)
+    finally:
+        connections.close_all()
+
+
+def pode_usar_processos(workers):
+    """Processos paralelos exigem fork e um banco com escrita concorrente (PostgreSQL)."""
+    return (
+        workers > 1
+        and connection.vendor != 'sqlite'
+        and 'fork' in multiprocessing.get_all_start_methods()
+    )
+
+
+def associar_em_blocos(chunk_size=1000, after_id=None, workers=1):
+    """
+    Processa todas as validações com id maior que `after_id`.
+
+    Gera (último id, validações, associações) por bloco concluído, na ordem
+    dos ids: o último id gerado é o ponto de retomada se a execução parar.
+    """
+    blocos = blocos_de_validacoes(chunk_size, after_id)
+    if not pode_usar_processos(workers):
+        for ids in blocos:
+            yield processar_bloco(ids)
+        return
+
+    # Os processos filhos não podem herdar a conexão aberta do pai; a
+    # listagem de ids é materializada antes do fork pelo mesmo motivo.
+    blocos = list(blocos)
+    connections.close_all()
+    ctx = multiprocessing.get_context('fork')
+    with ctx.Pool(workers) as pool:
+        # imap mantém a ordem dos blocos, então o ponto de retomada é contíguo
+        yield from pool.imap(_processar_bloco_worker, blocos)
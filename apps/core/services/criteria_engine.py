@@ -0,0 +1,165 @@
+"""
+Avaliação vetorizada da aplicabilidade dos critérios.
+
+Equivalente a `CriteriaAssociator.check_applicability`, mas para um
+conjunto de famílias de uma vez: os membros são carregados numa única
+consulta para arrays compactos (idade, sexo, parentesco, índice da
+família) e cada critério ativo é avaliado contra todas as famílias com
+operações sobre os arrays, sem laço por membro.
+
+Exemplo:
+
+    matriz = avaliar_aplicabilidade(criterios, familia_ids)
+    for i, criterio in enumerate(matriz.criterios):
+        for j, familia_id in enumerate(matriz.familia_ids):
+            matriz.aplicavel[i, j], matriz.observacao(i, j)
+"""
+from datetime import date
+
+import numpy as np
+
+from apps.cecad.models import Familia, Pessoa
+
+# Códigos de observação (motivo da não aplicabilidade)
+APLICAVEL = 0
+SEM_CRIANCAS = 1
+RF_HOMEM = 2
+UNIPESSOAL = 3
+SEM_MEMBRO = 4
+
+OBSERVACOES = {
+    APLICAVEL: "",
+    SEM_CRIANCAS: "Não aplicável: Família sem crianças",
+    RF_HOMEM: "Não aplicável: RF é homem",
+    UNIPESSOAL: "Não aplicável: Família unipessoal",
+    SEM_MEMBRO: "Não aplicável: Nenhum membro atende aos requisitos",
+}
+
+# Idade usada para membros sem data de nascimento
+SEM_IDADE = -1
+SEM_PARENTESCO = -1
+
+
+def _idade(nascimento, today):
+    return today.year - nascimento.year - ((today.month, today.day) < (nascimento.month, nascimento.day))
+
+
+def _parentescos(criterio):
+    """Códigos de parentesco permitidos, ou None se o campo for inválido."""
+    try:
+        return [int(c.strip()) for c in criterio.parentescos_permitidos.split(',') if c.strip()]
+    except ValueError:
+        return None
+
+
+class MatrizAplicabilidade:
+    """Resultado da avaliação: `aplicavel` e `codigos` têm forma (critérios, famílias)."""
+
+    def __init__(self, criterios, familia_ids, aplicavel, codigos):
+        self.criterios = criterios
+        self.familia_ids = familia_ids
+        self.aplicavel = aplicavel
+        self.codigos = codigos
+        self._indice = {familia_id: j for j, familia_id in enumerate(familia_ids)}
+
+    def indice(self, familia_id):
+        return self._indice[familia_id]
+
+    def observacao(self, i, j):
+        return OBSERVACOES[int(self.codigos[i, j])]
+
+    def resultado(self, i, familia_id):
+        """(is_applicable, observacao) no formato de `check_applicability`."""
+        j = self._indice[familia_id]
+        return bool(self.aplicavel[i, j]), self.observacao(i, j)
+
+
+class PerfilFamilias:
+    """Famílias e membros carregados em arrays, na ordem de `familia_ids`."""
+
+    def __init__(self, familia_ids, today=None):
+        today = today or date.today()
+        self.familia_ids = list(dict.fromkeys(familia_ids))
+        indice = {familia_id: j for j, familia_id in enumerate(self.familia_ids)}
+        n = len(self.familia_ids)
+
+        self.sem_criancas = np.ones(n, dtype=bool)
+        self.rf_homem = np.zeros(n, dtype=bool)
+        self.unipessoal = np.zeros(n, dtype=bool)
+        # Condições da família a partir das colunas de perfil (mesma regra dos métodos de Familia)
+        for familia_id, mais_novo, rf_sexo, qtde_pessoas, num_membros in Familia.objects.filter(
+            pk__in=self.familia_ids
+        ).values_list('id', 'dat_nasc_mais_novo', 'rf_sexo', 'qtde_pessoas', 'num_membros'):
+            j = indice[familia_id]
+            self.sem_criancas[j] = not (mais_novo and _idade(mais_novo, today) < 18)
+            self.rf_homem[j] = rf_sexo == '1'
+            self.unipessoal[j] = qtde_pessoas == 1 or num_membros == 1
+
+        familia, idade, sexo, parentesco = [], [], [], []
+        for familia_id, nascimento, cod_sexo, cod_parentesco in Pessoa.objects.filter(
+            familia_id__in=self.familia_ids
+        ).values_list('familia_id', 'dat_nasc_pessoa', 'cod_sexo_pessoa', 'cod_parentesco_rf_pessoa'):
+            familia.append(indice[familia_id])
+            idade.append(_idade(nascimento, today) if nascimento else SEM_IDADE)
+            sexo.append(cod_sexo or '')
+            parentesco.append(SEM_PARENTESCO if cod_parentesco is None else cod_parentesco)
+
+        self.membro_familia = np.array(familia, dtype=np.int64)
+        self.membro_idade = np.array(idade, dtype=np.int16)
+        self.membro_sexo = np.array(sexo, dtype='U1')
+        self.membro_parentesco = np.array(parentesco, dtype=np.int16)
+
+    def __len__(self):
+        return len(self.familia_ids)
+
+    def familias_com_membro(self, criterio):
+        """Máscara das famílias com algum membro que atende sexo/parentesco/idade do critério."""
+        mascara = np.ones(len(self.membro_familia), dtype=bool)
+        if criterio.sexo_necessario:
+            mascara &= self.membro_sexo == criterio.sexo_necessario
+        if criterio.parentescos_permitidos:
+            permitidos = _parentescos(criterio)
+            if permitidos is None:
+                return np.zeros(len(self), dtype=bool)
+            mascara &= np.isin(self.membro_parentesco, permitidos)
+        # Membros sem data de nascimento nunca atendem (mesma regra de check_applicability)
+        mascara &= self.membro_idade != SEM_IDADE
+        if criterio.idade_minima is not None:
+            mascara &= self.membro_idade >= criterio.idade_minima
+        if criterio.idade_maxima is not None:
+            mascara &= self.membro_idade <= criterio.idade_maxima
+        return np.bincount(self.membro_familia[mascara], minlength=len(self)) > 0
+
+
+def avaliar_aplicabilidade(criterios, familia_ids, perfil=None):
+    """
+    Avalia todos os `criterios` contra todas as famílias de `familia_ids`.
+
+    Retorna uma MatrizAplicabilidade. As regras seguem a ordem de
+    `check_applicability`: a primeira condição que exclui a família define
+    o código da observação.
+    """
+    criterios = list(criterios)
+    perfil = perfil if perfil is not None else PerfilFamilias(familia_ids)
+    n = len(perfil)
+
+    codigos = np.full((len(criterios), n), APLICAVEL, dtype=np.int8)
+    for i, criterio in enumerate(criterios):
+        linha = codigos[i]
+        livre = np.ones(n, dtype=bool)
+        if not criterio.aplica_se_a_sem_criancas:
+            excluidas = livre & perfil.sem_criancas
+            linha[excluidas] = SEM_CRIANCAS
+            livre &= ~excluidas
+        if not criterio.aplica_se_a_rf_homem:
+            excluidas = livre & perfil.rf_homem
+            linha[excluidas] = RF_HOMEM
+            livre &= ~excluidas
+        if not criterio.aplica_se_a_unipessoais:
+            excluidas = livre & perfil.unipessoal
+            linha[excluidas] = UNIPESSOAL
+            livre &= ~excluidas
+        if criterio.idade_minima is not None or criterio.idade_maxima is not None or criterio.sexo_necessario:
+            linha[livre & ~perfil.familias_com_membro(criterio)] = SEM_MEMBRO
+
+    return MatrizAplicabilidade(criterios, perfil.familia_ids, codigos == APLICAVEL, codigos)
@@ -1,5 +1,9 @@
 from apps.core.models import Criterio, ValidacaoCriterio, Validacao
+from apps.core.services.criteria_engine import avaliar_aplicabilidade
+from apps.core.services.scoring import recalcular_pontuacoes
 from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
 
 class CriteriaAssociator:
     @staticmethod
@@ -86,84 +90,132 @@ class CriteriaAssociator:
         Associa critérios a uma validação, respeitando as condições de aplicação.
         Retorna o número de critérios associados.
         """
-        criterios = Criterio.objects.filter(ativo=True)
-        
-        to_create = []
-        existing_ids = set(ValidacaoCriterio.objects.filter(validacao=validacao).values_list('criterio_id', flat=True))
-        
-        for criterio in criterios:
-            if criterio.id in existing_ids:
-                continue
-                
-            is_applicable, observacao = CriteriaAssociator.check_applicability(criterio, validacao.familia)
-            
-            to_create.append(
-                ValidacaoCriterio(
-                    validacao=validacao,
-                    criterio=criterio,
-                    atendido=not is_applicable, # Se não aplicável, conta como atendido (pontuação máxima)
-                    aplicavel=is_applicable,
-                    observacao=observacao
-                )
+        return CriteriaAssociator.associate_criteria_bulk([validacao])
+
+    @staticmethod
+    def associate_criteria_bulk(validacoes, criterios=None, chunk_size=1000):
+        """
+        Associa os critérios ativos (ou `criterios`) a um conjunto de validações,
+        avaliando a aplicabilidade de cada bloco de famílias de uma vez.
+        Retorna o número de associações criadas.
+        """
+        if criterios is None:
+            criterios = Criterio.objects.filter(ativo=True)
+        criterios = list(criterios)
+        if not criterios:
+            return 0
+
+        validacoes = list(validacoes)
+        total = 0
+        for start in range(0, len(validacoes), chunk_size):
+            bloco = validacoes[start:start + chunk_size]
+            existentes = set(
+                ValidacaoCriterio.objects.filter(
+                    validacao__in=bloco, criterio__in=criterios
+                ).values_list('validacao_id', 'criterio_id')
             )
-        
-        if to_create:
-            ValidacaoCriterio.objects.bulk_create(to_create)
-            return len(to_create)
-        return 0
+            matriz = avaliar_aplicabilidade(criterios, [v.familia_id for v in bloco])
+
+            to_create = []
+            for validacao in bloco:
+                for i, criterio in enumerate(criterios):
+                    if (validacao.pk, criterio.pk) in existentes:
+                        continue
+                    is_applicable, observacao = matriz.resultado(i, validacao.familia_id)
+                    to_create.append(
+                        ValidacaoCriterio(
+                            validacao=validacao,
+                            criterio=criterio,
+                            atendido=not is_applicable, # Se não aplicável, conta como atendido (pontuação máxima)
+                            aplicavel=is_applicable,
+                            observacao=observacao
+                        )
+                    )
+
+            if to_create:
+                ValidacaoCriterio.objects.bulk_create(to_create)
+            total += len(to_create)
+        return total
 
     @staticmethod
-    def update_criterion_impact(criterio):
+    def propagate_criterion(criterio, chunk_size=1000, on_progress=None):
+        """
+        Associa um critério novo a todas as validações que ainda não o possuem.
+
+        Os pares faltantes saem de uma única consulta (NOT EXISTS) e são
+        gravados com bulk_create por bloco. `on_progress(feitas, total)` é
+        chamado após cada bloco. Retorna o número de associações criadas.
+        """
+        faltantes = list(
+            Validacao.objects.filter(
+                ~Exists(ValidacaoCriterio.objects.filter(validacao=OuterRef('pk'), criterio=criterio))
+            ).order_by('id').values_list('id', 'familia_id')
+        )
+        total = len(faltantes)
+        if on_progress:
+            on_progress(0, total)
+
+        for start in range(0, total, chunk_size):
+            bloco = faltantes[start:start + chunk_size]
+            matriz = avaliar_aplicabilidade([criterio], [familia_id for _, familia_id in bloco])
+            to_create = []
+            for validacao_id, familia_id in bloco:
+                is_applicable, observacao = matriz.resultado(0, familia_id)
+                to_create.append(
+                    ValidacaoCriterio(
+                        validacao_id=validacao_id,
+                        criterio=criterio,
+                        atendido=not is_applicable,
+                        aplicavel=is_applicable,
+                        observacao=observacao
+                    )
+                )
+            # Outra associação (ex.: abertura da validação) pode ter criado o par no meio do caminho
+            ValidacaoCriterio.objects.bulk_create(to_create, ignore_conflicts=True)
+            if on_progress:
+                on_progress(start + len(bloco), total)
+        return total
+
+    @staticmethod
+    def update_criterion_impact(criterio, chunk_size=1000):
         """
         Atualiza todas as validações quando um critério é alterado.
         Reavalia a aplicabilidade e recalcula a pontuação.
         """
-        # Buscar todas as validações que possuem este critério associado
-        # Usar select_related para otimizar o acesso à família e membros
-        validacoes_afetadas = Validacao.objects.filter(
-            criterios_avaliados__criterio=criterio
-        ).select_related('familia').prefetch_related('familia__membros').distinct()
-        
-        updates_vc = []
-        validacoes_to_update = []
+        # Associações do critério com a família de cada validação; a aplicabilidade
+        # vem da avaliação em lote, sem carregar membros por validação
+        associacoes = list(
+            ValidacaoCriterio.objects.filter(criterio=criterio)
+            .annotate(familia_id=F('validacao__familia_id'))
+            .only('id', 'validacao_id', 'aplicavel', 'atendido', 'observacao')
+            .order_by('id')
+        )
         
-        print(f"Atualizando impacto do critério '{criterio}' em {validacoes_afetadas.count()} validações...")
+        print(f"Atualizando impacto do critério '{criterio}' em {len(associacoes)} validações...")
         
         with transaction.atomic():
-            for validacao in validacoes_afetadas:
-                # Reavaliar aplicabilidade
-                is_applicable, observacao = CriteriaAssociator.check_applicability(criterio, validacao.familia)
+            for start in range(0, len(associacoes), chunk_size):
+                bloco = associacoes[start:start + chunk_size]
+                matriz = avaliar_aplicabilidade([criterio], [vc.familia_id for vc in bloco])
                 
-                # Buscar o ValidacaoCriterio específico
-                vc = validacao.criterios_avaliados.get(criterio=criterio)
-                
-                changed = False
-                if vc.aplicavel != is_applicable:
+                alteradas = []
+                for vc in bloco:
+                    is_applicable, observacao = matriz.resultado(0, vc.familia_id)
+                    if vc.aplicavel == is_applicable:
+                        continue
                     vc.aplicavel = is_applicable
-                    # Se tornou não aplicável -> atendido = True
-                    # Se tornou aplicável -> atendido = False (precisa comprovar) - A MENOS que já tenha sido validado antes?
-                    # Regra de negócio: Se tornou aplicável agora, assume que não foi atendido ainda.
-                    # Se tornou não aplicável, assume atendido.
-                    if not is_applicable:
-                        vc.atendido = True
-                    else:
-                        # CUIDADO: Se já estava atendido (por exemplo, tinha documento), manter?
-                        # Se a condição mudou para ser aplicável, talvez o usuário precise enviar documento.
-                        # Vamos assumir False para forçar nova validação se necessário, ou manter se tiver documento validado?
-                        # Por segurança, se tem documento validado, mantemos atendido?
-                        # O modelo atual não linka documento diretamente ao atendido de forma rígida sem lógica.
-                        # Vamos simplificar: Se virou aplicável, reseta para não atendido (False).
-                        vc.atendido = False
-                    
+                    # Regra de negócio: se tornou não aplicável, conta como atendido;
+                    # se tornou aplicável, volta para não atendido (precisa comprovar).
+                    vc.atendido = not is_applicable
                     vc.observacao = observacao
-                    vc.save() # Salvar individualmente ou adicionar a lista para bulk_update?
-                    # Como vamos recalcular pontuação, melhor salvar logo para o cálculo pegar o valor novo no banco
-                    # Ou atualizar o objeto em memória e passar para o calculo?
-                    # O método calcular_pontuacao usa self.criterios_avaliados.filter(atendido=True)
-                    # Então precisa estar salvo no banco.
-                    changed = True
-                
-                # Se a pontuação do critério mudou, ou peso, ou aplicabilidade, precisa recalcular total da validação
-                # Mesmo que aplicabilidade não mude, os pontos do critério podem ter mudado.
-                validacao.atualizar_pontuacao()
-
+                    alteradas.append(vc)
+                ValidacaoCriterio.objects.bulk_update(alteradas, ['aplicavel', 'atendido', 'observacao'])
+                # A pontuação total pode não mudar (limite por categoria), mas os
+                # subtotais guardados pelo autosave incremental deixam de valer
+                Validacao.objects.filter(pk__in={vc.validacao_id for vc in alteradas}).update(
+                    updated_at=timezone.now()
+                )
+            
+            # Mesmo sem mudança de aplicabilidade, pontos e peso podem ter mudado:
+            # todas as validações com o critério são repontuadas de uma vez
+            recalcular_pontuacoes({vc.validacao_id for vc in associacoes}, chunk_size=chunk_size)
@@ -0,0 +1,127 @@
+"""
+Dados do dashboard principal, a partir das estatísticas pré-agregadas por
+lote (EstatisticaLote, ver services/estatisticas_lote.py):
+
+- total de famílias e status das validações: um aggregate sobre as linhas
+  do lote atual e das famílias manuais;
+- últimos lotes: as linhas aprovadas/reprovadas agrupadas por lote;
+- faixa de renda e composição das aprovadas: um GROUP BY sobre as linhas
+  aprovadas (faixa, número de membros), do qual saem os dois gráficos;
+- critérios mais reprovados: um GROUP BY por critério.
+
+O resultado é guardado no cache com a versão dos dados de validação e o
+lote atual na chave (ver services/versao_dados.py): mudar o status de uma
+validação ou concluir uma importação gera um snapshot novo.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from apps.cecad.models import ImportBatch
+from apps.core.models import EstatisticaLote, ValidacaoCriterio
+from apps.core.services.estatisticas_lote import FAIXAS_RENDA, FAIXAS_RENDA_LABELS
+from apps.core.services.versao_dados import versao_validacoes
+
+GRAFICOS_VAZIOS = {
+    'grafico_lotes': {'labels': [], 'aprovados': [], 'reprovados': []},
+    'grafico_renda': {'labels': [], 'valores': []},
+    'grafico_membros': {'labels': [], 'valores': []},
+    'grafico_criterios': {'labels': [], 'valores': []},
+}
+
+
+def _grafico_lotes():
+    ultimos_lotes = list(ImportBatch.objects.filter(status='completed').order_by('-imported_at')[:6])
+    por_lote = {
+        linha['import_batch']: linha
+        for linha in EstatisticaLote.objects.filter(import_batch__in=ultimos_lotes)
+        .values('import_batch')
+        .annotate(
+            aprovados=Sum('total', filter=Q(status='aprovado'), default=0),
+            reprovados=Sum('total', filter=Q(status='reprovado'), default=0),
+        )
+        .order_by()
+    }
+    ultimos_lotes.reverse()
+    return {
+        'labels': [lote.imported_at.strftime('%d/%m') for lote in ultimos_lotes],
+        'aprovados': [por_lote.get(lote.pk, {}).get('aprovados', 0) for lote in ultimos_lotes],
+        'reprovados': [por_lote.get(lote.pk, {}).get('reprovados', 0) for lote in ultimos_lotes],
+    }
+
+
+def _graficos_aprovadas(escopo):
+    """Faixa de renda e número de membros das famílias aprovadas, num único GROUP BY."""
+    renda = [0] * (len(FAIXAS_RENDA) - 1)
+    membros = {}
+    for faixa, num_membros, total in (
+        EstatisticaLote.objects.filter(escopo, status='aprovado')
+        .values_list('faixa_renda', 'num_membros')
+        .annotate(soma=Sum('total'))
+        .order_by()
+    ):
+        if faixa is not None:
+            renda[faixa] += total
+        membros[num_membros] = membros.get(num_membros, 0) + total
+
+    membros_labels = sorted(n for n in membros if membros[n])
+    return (
+        {'labels': FAIXAS_RENDA_LABELS, 'valores': renda},
+        {
+            'labels': [str(n) + ' membros' for n in membros_labels],
+            'valores': [membros[n] for n in membros_labels],
+        },
+    )
+
+
+def calcular_dashboard(latest_batch):
+    """Contexto do dashboard (sem o lote) para o lote atual."""
+    escopo = Q(import_batch__isnull=True)
+    if latest_batch:
+        escopo |= Q(import_batch=latest_batch)
+
+    contagens = EstatisticaLote.objects.filter(escopo).aggregate(
+        familias=Sum('total', default=0),
+        pendente=Sum('total', filter=Q(status='pendente'), default=0),
+        aprovado=Sum('total', filter=Q(status='aprovado'), default=0),
+        reprovado=Sum('total', filter=Q(status='reprovado'), default=0),
+    )
+    status = {chave: contagens[chave] for chave in ('pendente', 'aprovado', 'reprovado')}
+    dados = {
+        'total_familias': contagens['familias'],
+        'validacoes_pendentes': status['pendente'],
+        'validacoes_aprovadas': status['aprovado'],
+        'validacoes_reprovadas': status['reprovado'],
+        'grafico_status': status,
+    }
+    if not latest_batch:
+        dados.update(GRAFICOS_VAZIOS)
+        return dados
+
+    grafico_renda, grafico_membros = _graficos_aprovadas(escopo)
+    # Critérios mais determinantes (top 5 critérios mais reprovados)
+    criterios_reprovados = ValidacaoCriterio.objects.filter(
+        Q(validacao__familia__import_batch=latest_batch) | Q(validacao__familia__import_batch__isnull=True),
+        atendido=False,
+        aplicavel=True
+    ).values('criterio__descricao').annotate(qtd=Count('id')).order_by('-qtd')[:5]
+    dados.update({
+        'grafico_lotes': _grafico_lotes(),
+        'grafico_renda': grafico_renda,
+        'grafico_membros': grafico_membros,
+        'grafico_criterios': {
+            'labels': [c['criterio__descricao'] for c in criterios_reprovados],
+            'valores': [c['qtd'] for c in criterios_reprovados],
+        },
+    })
+    return dados
+
+
+def snapshot_dashboard(latest_batch):
+    """`calcular_dashboard` em cache, pela versão dos dados e pelo lote atual."""
+    chave = f'core:dashboard:{versao_validacoes()}:{latest_batch.pk if latest_batch else 0}'
+    dados = cache.get(chave)
+    if dados is None:
+        dados = calcular_dashboard(latest_batch)
+        cache.set(chave, dados, settings.DASHBOARD_CACHE_TIMEOUT)
+    return dados
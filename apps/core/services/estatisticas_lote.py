@@ -0,0 +1,311 @@
+"""
+Estatísticas pré-agregadas por lote (EstatisticaLote).
+
+Cada linha conta as validações de um lote (ou as famílias ainda sem
+validação, com status vazio) por bairro, composição familiar (número de
+membros, número de filhos até 5+, mãe solo), faixa de renda e status. O
+dashboard, o relatório de composição familiar e a comparação de lotes somam
+essas linhas em vez de varrer famílias e validações.
+
+Manutenção:
+- importação concluída: `reconstruir_estatisticas(lote)` concilia as linhas
+  do lote com um único GROUP BY (CecadImporter, ao final);
+- mudança de status: `registrar_validacao` move uma unidade entre as linhas
+  (signals de Validacao e as reservas feitas por UPDATE);
+- famílias e membros alterados fora da importação: `acompanhar_familias`
+  compara a contribuição das famílias antes e depois da alteração.
+
+A chave não é única: gravações incrementais concorrentes podem criar duas
+linhas iguais, e as leituras sempre somam. Famílias com mais de uma
+validação entram uma vez por validação (a importação e os cadastros criam
+uma por família).
+"""
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import BooleanField, Case, Count, ExpressionWrapper, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from apps.cecad.models import Familia
+from apps.core.models import EstatisticaLote, Validacao
+
+FAIXAS_RENDA = [0, 100, 200, 300, 400, 600, 1000, 999999]
+FAIXAS_RENDA_LABELS = [
+    'Até R$100', 'R$100-200', 'R$200-300', 'R$300-400', 'R$400-600', 'R$600-1000', 'Acima de R$1000'
+]
+
+# Status das famílias que ainda não têm validação
+SEM_VALIDACAO = ''
+# num_filhos é agrupado até este valor ("5 ou mais")
+FILHOS_MAXIMO = 5
+
+CAMPOS_CHAVE = ('import_batch_id', 'bairro', 'num_membros', 'num_filhos', 'mae_solo', 'faixa_renda', 'status')
+_ZERO = (0, 0, Decimal(0))
+
+
+def faixa_renda_expression():
+    """Índice da faixa de renda (FAIXAS_RENDA) da família; nulo fora das faixas."""
+    return Case(
+        *[
+            When(
+                vlr_renda_media_fam__gte=FAIXAS_RENDA[i],
+                vlr_renda_media_fam__lt=FAIXAS_RENDA[i + 1],
+                then=Value(i),
+            )
+            for i in range(len(FAIXAS_RENDA) - 1)
+        ],
+        default=None,
+        output_field=IntegerField(),
+    )
+
+
+def _dimensoes(familias):
+    """Valores de chave (sem o status) das famílias do queryset."""
+    return familias.annotate(
+        e_filhos=Case(
+            When(num_filhos__gte=FILHOS_MAXIMO, then=Value(FILHOS_MAXIMO)),
+            default=F('num_filhos'),
+            output_field=IntegerField(),
+        ),
+        e_mae_solo=ExpressionWrapper(Q(rf_sexo='2', tem_conjuge=False), output_field=BooleanField()),
+        e_faixa=faixa_renda_expression(),
+    )
+
+
+_CAMPOS_DIMENSAO = ('import_batch_id', 'nom_localidade_fam', 'num_membros', 'e_filhos', 'e_mae_solo', 'e_faixa')
+
+
+def _chave(import_batch_id, bairro, num_membros, num_filhos, mae_solo, faixa, status):
+    return (import_batch_id, bairro or '', num_membros, num_filhos, bool(mae_solo), faixa, status)
+
+
+def contribuicoes(familias):
+    """
+    {chave: (total, com_renda, renda_total)} das famílias do queryset, num
+    único GROUP BY com LEFT JOIN nas validações.
+    """
+    linhas = (
+        _dimensoes(familias)
+        .annotate(e_status=Coalesce('validacoes__status', Value(SEM_VALIDACAO)))
+        .values_list(*_CAMPOS_DIMENSAO, 'e_status')
+        .annotate(
+            total=Count('id'),
+            com_renda=Count('vlr_renda_media_fam'),
+            renda_total=Sum('vlr_renda_media_fam'),
+        )
+        .order_by()
+    )
+    return {
+        _chave(*chave): (total, com_renda, renda_total or Decimal(0))
+        for *chave, total, com_renda, renda_total in linhas
+    }
+
+
+def _criar(contagens):
+    EstatisticaLote.objects.bulk_create(
+        [
+            EstatisticaLote(
+                **dict(zip(CAMPOS_CHAVE, chave)), total=total, com_renda=com_renda, renda_total=renda_total
+            )
+            for chave, (total, com_renda, renda_total) in contagens.items()
+        ],
+        batch_size=1000,
+    )
+
+
+def reconstruir_estatisticas(import_batch):
+    """
+    Concilia as linhas de um lote (None = famílias cadastradas manualmente)
+    com as famílias: só grava as chaves que mudaram e junta as duplicadas.
+    """
+    lote_id = getattr(import_batch, 'pk', import_batch)
+    esperado = contribuicoes(Familia.objects.filter(import_batch_id=lote_id))
+    with transaction.atomic():
+        existentes = {}
+        for linha in EstatisticaLote.objects.filter(import_batch_id=lote_id).order_by('pk'):
+            chave = tuple(getattr(linha, campo) for campo in CAMPOS_CHAVE)
+            existentes.setdefault(chave, []).append(linha)
+
+        atualizar, remover = [], []
+        for chave, (linha, *duplicadas) in existentes.items():
+            remover.extend(duplicadas)
+            valores = esperado.pop(chave, None)
+            if valores is None:
+                remover.append(linha)
+            elif duplicadas or (linha.total, linha.com_renda, linha.renda_total) != valores:
+                linha.total, linha.com_renda, linha.renda_total = valores
+                atualizar.append(linha)
+
+        if remover:
+            EstatisticaLote.objects.filter(pk__in=[linha.pk for linha in remover]).delete()
+        EstatisticaLote.objects.bulk_update(atualizar, ['total', 'com_renda', 'renda_total'], batch_size=1000)
+        _criar(esperado)
+
+
+def reconstruir_todas_estatisticas():
+    """Refaz a tabela inteira (ex.: reavaliação em massa dos status)."""
+    with transaction.atomic():
+        EstatisticaLote.objects.all().delete()
+        _criar(contribuicoes(Familia.objects.all()))
+
+
+def _somar(chave, total, com_renda, renda_total):
+    filtro = dict(zip(CAMPOS_CHAVE, chave))
+    pk = EstatisticaLote.objects.filter(**filtro).values_list('pk', flat=True).first()
+    if pk is None:
+        EstatisticaLote.objects.create(**filtro, total=total, com_renda=com_renda, renda_total=renda_total)
+    else:
+        EstatisticaLote.objects.filter(pk=pk).update(
+            total=F('total') + total,
+            com_renda=F('com_renda') + com_renda,
+            renda_total=F('renda_total') + renda_total,
+        )
+
+
+def aplicar_diferenca(antes, depois):
+    """Soma às linhas a diferença entre duas `contribuicoes`."""
+    for chave in antes.keys() | depois.keys():
+        delta = [d - a for a, d in zip(antes.get(chave, _ZERO), depois.get(chave, _ZERO))]
+        if any(delta):
+            _somar(chave, *delta)
+
+
+@contextmanager
+def acompanhar_familias(familia_ids):
+    """
+    Atualiza as linhas das famílias alteradas dentro do bloco (perfil,
+    bairro, renda, lote):
+
+        with acompanhar_familias(ids):
+            atualizar_perfil_familias(ids)
+    """
+    familia_ids = list(familia_ids)
+    if not familia_ids:
+        yield
+        return
+    antes = contribuicoes(Familia.objects.filter(pk__in=familia_ids))
+    yield
+    aplicar_diferenca(antes, contribuicoes(Familia.objects.filter(pk__in=familia_ids)))
+
+
+def registrar_status(familia_id, anterior, novo):
+    """Move uma validação da família do status `anterior` para `novo` (None = nenhum)."""
+    if anterior == novo:
+        return
+    linha = _dimensoes(Familia.objects.filter(pk=familia_id)).values_list(
+        *_CAMPOS_DIMENSAO, 'vlr_renda_media_fam'
+    ).first()
+    if linha is None:
+        return
+    *dimensoes, renda = linha
+    unidade = (1, int(renda is not None), renda or Decimal(0))
+    if anterior is not None:
+        _somar(_chave(*dimensoes, anterior), *(-valor for valor in unidade))
+    if novo is not None:
+        _somar(_chave(*dimensoes, novo), *unidade)
+
+
+def registrar_validacao(validacao, anterior, novo):
+    """
+    Atualiza as linhas após criar (`anterior` None), excluir (`novo` None) ou
+    mudar o status de uma validação. Na única validação da família, a
+    família sai da (ou volta para a) linha sem validação.
+    """
+    if (anterior is None or novo is None) and not (
+        Validacao.objects.filter(familia_id=validacao.familia_id).exclude(pk=validacao.pk).exists()
+    ):
+        anterior = SEM_VALIDACAO if anterior is None else anterior
+        novo = SEM_VALIDACAO if novo is None else novo
+    registrar_status(validacao.familia_id, anterior, novo)
+
+
+def _percentual(contagem):
+    total = contagem['total']
+    contagem['percentual_aprovacao'] = round((contagem['aprovados'] / total * 100) if total > 0 else 0, 2)
+    return contagem
+
+
+class EstatisticasComposicao:
+    """
+    Relatório de composição familiar a partir de EstatisticaLote, com os
+    mesmos formatos de FamiliaStatsService (total, aprovados, reprovados e
+    percentual_aprovacao por categoria e por bairro).
+    """
+
+    def __init__(self, import_batch=None, filtros=None):
+        self.import_batch = import_batch
+        self.filtros = filtros or {}
+        self._linhas = None
+
+    def linhas(self):
+        """Linhas do escopo somadas por (bairro, composição, status), em uma consulta."""
+        if self._linhas is None:
+            qs = EstatisticaLote.objects.all()
+            if self.import_batch:
+                qs = qs.filter(import_batch=self.import_batch)
+            if self.filtros.get('bairro'):
+                qs = qs.filter(bairro=self.filtros['bairro'])
+            self._linhas = list(
+                qs.values_list('bairro', 'num_membros', 'num_filhos', 'mae_solo', 'status')
+                .annotate(soma=Sum('total'))
+                .order_by()
+            )
+        return self._linhas
+
+    def _contar(self, incluir):
+        contagem = {'total': 0, 'aprovados': 0, 'reprovados': 0}
+        for bairro, num_membros, num_filhos, mae_solo, status, soma in self.linhas():
+            if not incluir(num_membros, num_filhos, mae_solo):
+                continue
+            contagem['total'] += soma
+            if status == 'aprovado':
+                contagem['aprovados'] += soma
+            elif status == 'reprovado':
+                contagem['reprovados'] += soma
+        return _percentual(contagem)
+
+    def get_maes_solo(self):
+        return self._contar(lambda membros, filhos, mae_solo: mae_solo)
+
+    def get_unipessoa(self):
+        return self._contar(lambda membros, filhos, mae_solo: membros == 1)
+
+    def get_casal_sem_filho(self):
+        return self._contar(lambda membros, filhos, mae_solo: membros == 2 and filhos == 0)
+
+    def get_filhos_quantitativos(self):
+        return {
+            chave: self._contar(lambda membros, filhos, mae_solo, n=n: filhos == n)
+            for chave, n in (('2', 2), ('3', 3), ('4', 4), ('5+', FILHOS_MAXIMO))
+        }
+
+    def get_por_bairro(self, min_familias=0):
+        por_bairro = {}
+        for bairro, _membros, _filhos, _mae_solo, status, soma in self.linhas():
+            contagem = por_bairro.setdefault(bairro or 'Sem Bairro', {'total': 0, 'aprovados': 0, 'reprovados': 0})
+            contagem['total'] += soma
+            if status == 'aprovado':
+                contagem['aprovados'] += soma
+            elif status == 'reprovado':
+                contagem['reprovados'] += soma
+        return {
+            bairro: _percentual(contagem)
+            for bairro, contagem in por_bairro.items()
+            if contagem['total'] >= min_familias
+        }
+
+
+def resumo_lote(import_batch):
+    """Totais de famílias, pessoas e renda média de um lote (comparação de lotes)."""
+    ag = EstatisticaLote.objects.filter(import_batch=import_batch).aggregate(
+        familias=Sum('total'),
+        pessoas=Sum(F('num_membros') * F('total')),
+        com_renda=Sum('com_renda'),
+        renda_total=Sum('renda_total'),
+    )
+    return {
+        'total_familias': ag['familias'] or 0,
+        'total_pessoas': ag['pessoas'] or 0,
+        'renda_media': (ag['renda_total'] / ag['com_renda']) if ag['com_renda'] else 0,
+    }
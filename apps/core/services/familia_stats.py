@@ -3,13 +3,31 @@ Serviço de Cálculos e Agregações para Relatórios de Famílias.
 
 Fornece métodos para calcular estatísticas sobre composição familiar
 com filtros por bairro, import batch, e período de análise.
+
+No modo `um_passo` o serviço busca, numa única consulta, uma linha compacta
+por família (membros, filhos, sexo do RF, cônjuge, bairro e as flags de
+aprovação/reprovação) e calcula todas as categorias e o agrupamento por
+bairro sobre arrays numpy, sem voltar ao banco.
 """
 
-from django.db.models import Count, Q, Exists, OuterRef, QuerySet, IntegerField, Case, When, Sum
-from apps.cecad.models import Familia, Pessoa, ImportBatch
+import numpy as np
+from django.db.models import Count, Exists, OuterRef, QuerySet, IntegerField, Case, When, Sum
+from apps.cecad.models import Familia, ImportBatch
 from apps.core.models import Validacao
 
 
+def _resultado(total, aprovados, reprovados) -> dict:
+    """Dicionário padronizado de contagens, com o percentual de aprovação."""
+    total, aprovados, reprovados = int(total), int(aprovados), int(reprovados)
+    percentual = (aprovados / total * 100) if total > 0 else 0
+    return {
+        'total': total,
+        'aprovados': aprovados,
+        'reprovados': reprovados,
+        'percentual_aprovacao': round(percentual, 2)
+    }
+
+
 class FamiliaStatsService:
     """
     Serviço para calcular estatísticas de composição familiar.
@@ -21,17 +39,20 @@ class FamiliaStatsService:
     - percentual_aprovacao: float (percentual de aprovação)
     """
     
-    def __init__(self, import_batch=None, filtros=None):
+    def __init__(self, import_batch=None, filtros=None, um_passo=False):
         """
         Inicializa o serviço.
         
         Args:
             import_batch: ImportBatch para filtrar, ou None (usa o mais recente)
             filtros: dict com {'bairro': str, ...} para filtros adicionais
+            um_passo: Calcula todos os relatórios a partir de uma única consulta
         """
         self.import_batch = import_batch
         self.filtros = filtros or {}
+        self.um_passo = um_passo
         self.queryset_base = self._get_queryset_base()
+        self._perfil = None
     
     def _get_queryset_base(self) -> QuerySet:
         """Retorna queryset base com filtros aplicados."""
@@ -50,6 +71,43 @@ class FamiliaStatsService:
     def get_familias_queryset(self) -> QuerySet:
         """Retorna o queryset base de famílias com filtros aplicados (para uso externo)."""
         return self.queryset_base
+
+    def _get_perfil(self) -> dict:
+        """
+        Uma linha por família, numa única consulta, carregada em arrays
+        (modo um_passo). Reaproveitada por todos os relatórios do serviço.
+        """
+        if self._perfil is None:
+            linhas = list(
+                self.queryset_base.annotate(
+                    has_aprovada=Exists(Validacao.objects.filter(familia_id=OuterRef('pk'), status='aprovado')),
+                    has_reprovada=Exists(Validacao.objects.filter(familia_id=OuterRef('pk'), status='reprovado')),
+                ).values_list(
+                    'num_membros', 'num_filhos', 'rf_sexo', 'tem_conjuge', 'nom_localidade_fam',
+                    'has_aprovada', 'has_reprovada',
+                ).order_by()
+            )
+            membros, filhos, rf_sexo, conjuge, bairros, aprovada, reprovada = (
+                zip(*linhas) if linhas else ((),) * 7
+            )
+            self._perfil = {
+                'membros': np.array(membros, dtype=np.int32),
+                'filhos': np.array(filhos, dtype=np.int32),
+                'mae_solo': (np.array(rf_sexo, dtype='U1') == '2') & ~np.array(conjuge, dtype=bool),
+                'bairro': np.array([b or 'Sem Bairro' for b in bairros], dtype=str),
+                'aprovada': np.array(aprovada, dtype=bool),
+                'reprovada': np.array(reprovada, dtype=bool),
+            }
+        return self._perfil
+
+    def _contar_mascara(self, mascara) -> dict:
+        """Equivalente a `_contar_por_status` sobre as famílias selecionadas em `mascara`."""
+        perfil = self._get_perfil()
+        return _resultado(
+            np.count_nonzero(mascara),
+            np.count_nonzero(mascara & perfil['aprovada']),
+            np.count_nonzero(mascara & perfil['reprovada']),
+        )
     
     def _contar_por_status(self, familia_qs: QuerySet) -> dict:
         """
@@ -73,39 +131,11 @@ class FamiliaStatsService:
             reprovados=Sum(Case(When(has_reprovada=True, then=1), default=0, output_field=IntegerField())),
         )
 
-        total = ag.get('total') or 0
-        aprovados = ag.get('aprovados') or 0
-        reprovados = ag.get('reprovados') or 0
-
-        percentual = (aprovados / total * 100) if total > 0 else 0
-
-        return {
-            'total': int(total),
-            'aprovados': int(aprovados),
-            'reprovados': int(reprovados),
-            'percentual_aprovacao': round(percentual, 2)
-        }
+        return _resultado(ag.get('total') or 0, ag.get('aprovados') or 0, ag.get('reprovados') or 0)
     
     def _get_maes_solo_queryset(self) -> QuerySet:
         """Retorna queryset de famílias com mães solo (RF feminina sem cônjuge)."""
-        return self.queryset_base.annotate(
-            tem_conjugue=Exists(
-                Pessoa.objects.filter(
-                    familia_id=OuterRef('id'),
-                    cod_parentesco_rf_pessoa=2  # Cônjuge
-                )
-            ),
-            rf_feminina=Exists(
-                Pessoa.objects.filter(
-                    familia_id=OuterRef('id'),
-                    cod_parentesco_rf_pessoa=1,  # RF
-                    cod_sexo_pessoa='2'  # Feminina
-                )
-            )
-        ).filter(
-            rf_feminina=True,
-            tem_conjugue=False
-        )
+        return self.queryset_base.filter(rf_sexo='2', tem_conjuge=False)
 
     def get_maes_solo(self) -> dict:
         """
@@ -116,13 +146,13 @@ class FamiliaStatsService:
         Returns:
             dict com total, aprovados, reprovados e percentual_aprovacao
         """
+        if self.um_passo:
+            return self._contar_mascara(self._get_perfil()['mae_solo'])
         return self._contar_por_status(self._get_maes_solo_queryset())
     
     def _get_unipessoa_queryset(self) -> QuerySet:
         """Retorna queryset de famílias unipessoais (1 membro)."""
-        return self.queryset_base.annotate(
-            num_pessoas=Count('membros')
-        ).filter(num_pessoas=1)
+        return self.queryset_base.filter(num_membros=1)
 
     def get_unipessoa(self) -> dict:
         """
@@ -133,17 +163,13 @@ class FamiliaStatsService:
         Returns:
             dict com total, aprovados, reprovados e percentual_aprovacao
         """
+        if self.um_passo:
+            return self._contar_mascara(self._get_perfil()['membros'] == 1)
         return self._contar_por_status(self._get_unipessoa_queryset())
     
     def _get_casal_sem_filho_queryset(self) -> QuerySet:
         """Retorna queryset de casais sem filhos (2 membros, 0 filhos)."""
-        return self.queryset_base.annotate(
-            num_pessoas=Count('membros'),
-            num_filhos=Count(
-                'membros',
-                filter=Q(membros__cod_parentesco_rf_pessoa=3)  # Filho
-            )
-        ).filter(num_pessoas=2, num_filhos=0)
+        return self.queryset_base.filter(num_membros=2, num_filhos=0)
 
     def get_casal_sem_filho(self) -> dict:
         """
@@ -154,6 +180,9 @@ class FamiliaStatsService:
         Returns:
             dict com total, aprovados, reprovados e percentual_aprovacao
         """
+        if self.um_passo:
+            perfil = self._get_perfil()
+            return self._contar_mascara((perfil['membros'] == 2) & (perfil['filhos'] == 0))
         return self._contar_por_status(self._get_casal_sem_filho_queryset())
     
     def _contar_filhos(self, familia_id: int) -> int:
@@ -166,10 +195,7 @@ class FamiliaStatsService:
         Returns:
             int com quantidade de filhos (cod_parentesco_rf_pessoa=3)
         """
-        return Pessoa.objects.filter(
-            familia_id=familia_id,
-            cod_parentesco_rf_pessoa=3  # Filho
-        ).count()
+        return Familia.objects.filter(pk=familia_id).values_list('num_filhos', flat=True).first() or 0
     
     def get_filhos_quantitativos(self) -> dict:
         """
@@ -186,14 +212,18 @@ class FamiliaStatsService:
                 '5+': {...}
             }
         """
-        from django.db.models import IntegerField
+        if self.um_passo:
+            filhos = np.minimum(self._get_perfil()['filhos'], 5)
+            return {
+                chave: self._contar_mascara(filhos == n)
+                for chave, n in (('2', 2), ('3', 3), ('4', 4), ('5+', 5))
+            }
 
         resultado = {'2': None, '3': None, '4': None, '5+': None}
 
         # Anotar número de filhos e presença de validações aprovadas/reprovadas
         # Buscar uma linha por família com número de filhos e flags de aprovação
         familias_annot = self.queryset_base.annotate(
-            num_filhos=Count('membros', filter=Q(membros__cod_parentesco_rf_pessoa=3)),
             has_aprovada=Exists(Validacao.objects.filter(familia_id=OuterRef('pk'), status='aprovado')),
             has_reprovada=Exists(Validacao.objects.filter(familia_id=OuterRef('pk'), status='reprovado')),
         ).values('id', 'num_filhos', 'has_aprovada', 'has_reprovada')
@@ -236,6 +266,9 @@ class FamiliaStatsService:
                 ...
             }
         """
+        if self.um_passo:
+            return self._get_por_bairro_um_passo(min_familias)
+
         resultado = {}
 
         # Anotar existência de validações por família e agregar por bairro
@@ -272,6 +305,19 @@ class FamiliaStatsService:
 
         return resultado
 
+    def _get_por_bairro_um_passo(self, min_familias) -> dict:
+        """`get_por_bairro` com contagens por bincount sobre os arrays do perfil."""
+        perfil = self._get_perfil()
+        nomes, indice = np.unique(perfil['bairro'], return_inverse=True)
+        totais = np.bincount(indice, minlength=len(nomes))
+        aprovados = np.bincount(indice, weights=perfil['aprovada'], minlength=len(nomes))
+        reprovados = np.bincount(indice, weights=perfil['reprovada'], minlength=len(nomes))
+        return {
+            str(nome): _resultado(totais[i], aprovados[i], reprovados[i])
+            for i, nome in enumerate(nomes)
+            if totais[i] >= min_familias
+        }
+
     def _get_filhos_queryset(self, num_filhos: int) -> QuerySet:
         """
         Retorna queryset de famílias com determinado número de filhos.
@@ -279,9 +325,7 @@ class FamiliaStatsService:
         Args:
             num_filhos: Número exato de filhos (use 5 para '5+')
         """
-        qs = self.queryset_base.annotate(
-            num_filhos=Count('membros', filter=Q(membros__cod_parentesco_rf_pessoa=3))
-        )
+        qs = self.queryset_base
         if num_filhos >= 5:
             return qs.filter(num_filhos__gte=5)
         return qs.filter(num_filhos=num_filhos)
@@ -315,4 +359,4 @@ class FamiliaStatsService:
         return qs.annotate(
             has_aprovada=Exists(Validacao.objects.filter(familia_id=OuterRef('pk'), status='aprovado')),
             has_reprovada=Exists(Validacao.objects.filter(familia_id=OuterRef('pk'), status='reprovado')),
-        ).prefetch_related('membros')
+        ).select_related('rf_pessoa').prefetch_related('membros')
@@ -0,0 +1,100 @@
+"""
+Distribuição de validações entre operadores.
+
+`reservar_proxima` entrega ao operador a próxima validação livre da fila
+(lote completo mais recente ou cadastro manual) e já a reserva. No
+PostgreSQL a candidata é travada com SELECT ... FOR UPDATE SKIP LOCKED, de
+modo que operadores simultâneos recebem linhas diferentes sem esperar uns
+pelos outros; em qualquer banco a reserva é um UPDATE condicional, que só
+vale se a validação continuar livre.
+
+Locks abandonados são liberados em lote por `liberar_locks_expirados`
+(rotina periódica dos workers e comando liberar_avaliacoes_expiradas).
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.cecad.services.lote_atual import lote_atual
+from apps.core.models import LOCK_TIMEOUT_MINUTOS, Validacao
+from apps.core.services.estatisticas_lote import registrar_validacao
+from apps.core.services.versao_dados import incrementar_versao_validacoes
+
+logger = logging.getLogger(__name__)
+
+# Novas tentativas quando outra reserva vence a corrida (bancos sem SKIP LOCKED)
+TENTATIVAS = 5
+
+
+def validacoes_da_fila():
+    """Validações do último lote completo e das famílias cadastradas manualmente."""
+    latest_batch = lote_atual()
+    if latest_batch:
+        return Validacao.objects.filter(
+            Q(familia__import_batch=latest_batch) | Q(familia__import_batch__isnull=True)
+        )
+    return Validacao.objects.filter(familia__import_batch__isnull=True)
+
+
+def _livres(agora, timeout_minutos):
+    return Q(em_avaliacao_por__isnull=True) | Q(iniciado_em__lt=agora - timedelta(minutes=timeout_minutos))
+
+
+def reservar_proxima(usuario, timeout_minutos=LOCK_TIMEOUT_MINUTOS):
+    """
+    Reserva e retorna a próxima validação disponível para o usuário, ou None.
+
+    Se o usuário já tem uma validação em andamento com lock válido, ela é
+    devolvida (renovada) em vez de reservar outra.
+    """
+    agora = timezone.now()
+    fila = validacoes_da_fila().filter(status__in=['pendente', 'em_analise'])
+
+    atual = (
+        fila.filter(em_avaliacao_por=usuario, iniciado_em__gte=agora - timedelta(minutes=timeout_minutos))
+        .order_by('iniciado_em')
+        .first()
+    )
+    if atual and atual.reservar_avaliacao(usuario, timeout_minutos):
+        return atual
+
+    for _ in range(TENTATIVAS):
+        with transaction.atomic():
+            candidata = (
+                fila.filter(_livres(agora, timeout_minutos))
+                .select_for_update(skip_locked=True, of=('self',))
+                .order_by('pk')
+                .first()
+            )
+            if candidata is None:
+                return None
+            reservada = Validacao.objects.filter(_livres(agora, timeout_minutos), pk=candidata.pk).update(
+                em_avaliacao_por=usuario, iniciado_em=agora, status='em_analise'
+            )
+        if reservada:
+            if candidata.status != 'em_analise':
+                incrementar_versao_validacoes()
+                registrar_validacao(candidata, candidata.status, 'em_analise')
+            candidata.refresh_from_db()
+            candidata._status_original = candidata.status
+            return candidata
+    return None
+
+
+def liberar_locks_expirados(timeout_minutos=LOCK_TIMEOUT_MINUTOS):
+    """
+    Libera, num único UPDATE, as validações com lock expirado (ou sem data
+    de início). O status é mantido: o progresso salvo continua na validação.
+    Retorna a quantidade de validações liberadas.
+    """
+    limite = timezone.now() - timedelta(minutes=timeout_minutos)
+    liberadas = Validacao.objects.filter(
+        Q(iniciado_em__lt=limite) | Q(iniciado_em__isnull=True),
+        em_avaliacao_por__isnull=False,
+    ).update(em_avaliacao_por=None, iniciado_em=None)
+    if liberadas:
+        logger.info(f"{liberadas} validação(ões) com lock expirado liberada(s)")
+    return liberadas
@@ -0,0 +1,305 @@
+"""
+Fila de tarefas em segundo plano baseada no banco de dados.
+
+As tarefas são registradas com o decorator `task` e enfileiradas com
+`enqueue`. O comando `manage.py run_workers` executa um ou mais Workers,
+que reservam a próxima tarefa pendente, mantêm um heartbeat enquanto ela
+roda e aplicam retry com backoff em caso de erro.
+
+Rotinas de manutenção registradas com `periodic` são executadas pelos
+próprios Workers, no máximo uma vez a cada `interval` segundos por processo
+(devem ser idempotentes, já que vários workers podem executá-las).
+
+Exemplo:
+
+    @task('cecad.import', on_failure=marcar_lote_com_erro)
+    def importar(ctx, batch_id):
+        ...
+        ctx.check_cancelled()
+
+    enqueue('cecad.import', {'batch_id': batch.pk}, user=request.user)
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from apps.core.models import Job
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY_SECONDS = 30
+
+_registry = {}
+_periodic = {}
+
+
+class JobCancelled(Exception):
+    """Levantada dentro da tarefa quando o cancelamento foi solicitado."""
+
+    def __init__(self, message="Tarefa cancelada."):
+        super().__init__(message)
+
+
+class _Task:
+    def __init__(self, name, func, on_failure=None):
+        self.name = name
+        self.func = func
+        self.on_failure = on_failure
+
+
+def task(name, on_failure=None):
+    """
+    Registra uma função como tarefa da fila.
+
+    A função recebe um JobContext seguido do payload como kwargs.
+    `on_failure(job)` é chamado quando a tarefa falha definitivamente
+    (sem novas tentativas ou com o worker interrompido).
+    """
+    def decorator(func):
+        _registry[name] = _Task(name, func, on_failure)
+        return func
+    return decorator
+
+
+def get_task(name):
+    return _registry.get(name)
+
+
+def periodic(name, interval):
+    """Registra uma rotina de manutenção (sem argumentos) executada periodicamente pelos Workers."""
+    def decorator(func):
+        _periodic[name] = (func, interval)
+        return func
+    return decorator
+
+
+def enqueue(task_name, payload=None, user=None, max_attempts=3, delay=None):
+    """Enfileira uma tarefa registrada e retorna o Job criado."""
+    if task_name not in _registry:
+        raise ValueError(f"Tarefa não registrada: {task_name}")
+    run_after = timezone.now() + timedelta(seconds=delay) if delay else timezone.now()
+    return Job.objects.create(
+        task=task_name,
+        payload=payload or {},
+        created_by=user,
+        max_attempts=max_attempts,
+        run_after=run_after,
+    )
+
+
+class JobContext:
+    """Acesso da tarefa ao Job em execução (cancelamento cooperativo)."""
+
+    def __init__(self, job):
+        self.job = job
+        self._cancel = threading.Event()
+
+    def check_cancelled(self, *args):
+        """Levanta JobCancelled se o cancelamento foi solicitado. Pode ser usado como callback de progresso."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def set_progress(self, done, total=None):
+        """Grava o progresso da tarefa e verifica o cancelamento."""
+        self.job.progress_done = done
+        fields = {'progress_done': done}
+        if total is not None:
+            self.job.progress_total = total
+            fields['progress_total'] = total
+        Job.objects.filter(pk=self.job.pk).update(**fields)
+        self.check_cancelled()
+
+
+class _Heartbeat(threading.Thread):
+    """Atualiza Job.heartbeat_at periodicamente e repassa pedidos de cancelamento."""
+
+    def __init__(self, context, interval):
+        super().__init__(daemon=True)
+        self.context = context
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                job = self.context.job
+                Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now())
+                if Job.objects.filter(pk=job.pk, cancel_requested=True).exists():
+                    self.context._cancel.set()
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def claim_next(worker_id):
+    """Reserva a próxima tarefa pendente para o worker. Retorna o Job ou None."""
+    now = timezone.now()
+    with transaction.atomic():
+        # SKIP LOCKED permite vários workers sem disputa pela mesma linha;
+        # em bancos sem SELECT ... FOR UPDATE (SQLite) a cláusula é ignorada.
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', run_after__lte=now)
+            .order_by('run_after', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = 'running'
+        job.attempts += 1
+        job.locked_by = worker_id
+        job.started_at = now
+        job.heartbeat_at = now
+        job.error_message = ''
+        job.save(update_fields=[
+            'status', 'attempts', 'locked_by', 'started_at', 'heartbeat_at', 'error_message'
+        ])
+    return job
+
+
+def recover_stale_jobs(stale_after=None):
+    """
+    Trata tarefas cujo worker parou de enviar heartbeat (processo reciclado,
+    container reiniciado). Voltam para a fila se ainda houver tentativas.
+    """
+    stale_after = stale_after if stale_after is not None else settings.JOB_STALE_AFTER
+    limite = timezone.now() - timedelta(seconds=stale_after)
+    recovered = 0
+    for job in Job.objects.filter(status='running', heartbeat_at__lt=limite):
+        mensagem = f"Worker {job.locked_by} parou de responder."
+        if job.attempts < job.max_attempts:
+            updated = Job.objects.filter(pk=job.pk, status='running', heartbeat_at__lt=limite).update(
+                status='pending', error_message=mensagem, locked_by='', run_after=timezone.now()
+            )
+        else:
+            updated = Job.objects.filter(pk=job.pk, status='running', heartbeat_at__lt=limite).update(
+                status='failed', error_message=mensagem, finished_at=timezone.now()
+            )
+            if updated:
+                job.status = 'failed'
+                job.error_message = mensagem
+                _call_on_failure(job)
+        recovered += updated
+        if updated:
+            logger.warning(f"Tarefa {job} recuperada: {mensagem}")
+    return recovered
+
+
+def _call_on_failure(job):
+    registered = get_task(job.task)
+    if registered and registered.on_failure:
+        try:
+            registered.on_failure(job)
+        except Exception:
+            logger.exception(f"Erro no on_failure da tarefa {job}")
+
+
+def execute(job, heartbeat_interval=None):
+    """Executa um Job já reservado e grava o resultado."""
+    heartbeat_interval = (
+        heartbeat_interval if heartbeat_interval is not None else settings.JOB_HEARTBEAT_INTERVAL
+    )
+    registered = get_task(job.task)
+    if registered is None:
+        job.status = 'failed'
+        job.error_message = f"Tarefa não registrada: {job.task}"
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error_message', 'finished_at'])
+        return job
+
+    context = JobContext(job)
+    heartbeat = _Heartbeat(context, heartbeat_interval) if heartbeat_interval else None
+    if heartbeat:
+        heartbeat.start()
+
+    failed = False
+    try:
+        registered.func(context, **job.payload)
+        job.status = 'completed'
+    except JobCancelled as e:
+        job.status = 'cancelled'
+        job.error_message = str(e)
+    except Exception as e:
+        logger.exception(f"Erro na tarefa {job}")
+        job.error_message = str(e)
+        if job.attempts < job.max_attempts:
+            # Backoff exponencial: 30s, 60s, 120s...
+            job.status = 'pending'
+            job.locked_by = ''
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_DELAY_SECONDS * 2 ** (job.attempts - 1))
+        else:
+            job.status = 'failed'
+            failed = True
+    finally:
+        if heartbeat:
+            heartbeat.stop()
+
+    if job.status != 'pending':
+        job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error_message', 'run_after', 'finished_at', 'locked_by'])
+
+    if failed:
+        _call_on_failure(job)
+    return job
+
+
+class Worker:
+    """Laço de execução usado pelo comando run_workers."""
+
+    def __init__(self, worker_id=None, poll_interval=None, heartbeat_interval=None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = poll_interval if poll_interval is not None else settings.JOB_POLL_INTERVAL
+        self.heartbeat_interval = heartbeat_interval
+        self._stopping = False
+        self._last_periodic = {}
+
+    def stop(self, *args):
+        self._stopping = True
+
+    def run_periodic(self):
+        """Executa as rotinas periódicas cujo intervalo já passou."""
+        now = time.monotonic()
+        for name, (func, interval) in _periodic.items():
+            last = self._last_periodic.get(name)
+            if last is not None and now - last < interval:
+                continue
+            self._last_periodic[name] = now
+            try:
+                func()
+            except Exception:
+                logger.exception(f"Erro na rotina periódica {name}")
+
+    def run_once(self):
+        """Recupera tarefas interrompidas, roda a manutenção e executa no máximo uma tarefa. Retorna o Job ou None."""
+        # Dentro de um bloco atômico (ex.: TestCase) a conexão em uso não pode ser descartada
+        if not connection.in_atomic_block:
+            close_old_connections()
+        recover_stale_jobs()
+        self.run_periodic()
+        job = claim_next(self.worker_id)
+        if job is None:
+            return None
+        logger.info(f"Worker {self.worker_id} executando {job}")
+        return execute(job, heartbeat_interval=self.heartbeat_interval)
+
+    def run(self, max_jobs=None):
+        executed = 0
+        while not self._stopping:
+            job = self.run_once()
+            if job is None:
+                time.sleep(self.poll_interval)
+                continue
+            executed += 1
+            if max_jobs and executed >= max_jobs:
+                break
+        return executed
@@ -0,0 +1,223 @@
+"""
+Paginação por cursor (keyset) para as listagens grandes.
+
+Em vez de OFFSET, cada página é buscada a partir dos valores de ordenação da
+última linha exibida (`WHERE (pontuacao, cod) > (...) ORDER BY ... LIMIT n`),
+então o custo não cresce com o número da página. O cursor vai na querystring
+(`?cursor=...`) e carrega também a posição da linha, para que "Mostrando X até
+Y" e o ranking continuem corretos sem contar as linhas anteriores.
+
+A ordenação precisa ser total: a pk é acrescentada como desempate, no mesmo
+sentido do último campo (assim `('-dat_atual_fam',)` vira `-dat_atual_fam,
+-id` e usa um índice `(-dat_atual_fam, -id)`). Campos de ordenação não podem
+ser nulos.
+
+    class MinhaListView(PaginacaoCursorMixin, ListView):
+        paginate_by = 50
+        keyset_ordering = ('-pontuacao_total', 'familia__cod_familiar_fam')
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from django.db import connection
+from django.db.models import Q
+
+# Abaixo desta estimativa do planejador a contagem exata é barata o bastante
+LIMITE_CONTAGEM_EXATA = 10000
+
+
+def _codificar(dados):
+    texto = json.dumps(dados, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def _decodificar(cursor):
+    """Retorna o conteúdo do cursor ou None se ele for inválido."""
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        dados = json.loads(texto)
+        if dados['d'] not in ('n', 'p') or not isinstance(dados['v'], list):
+            return None
+        int(dados['i'])
+        return dados
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        return None
+
+
+def _valor(obj, campo):
+    for parte in campo.split('__'):
+        obj = getattr(obj, parte)
+    if isinstance(obj, (datetime.date, datetime.datetime)):
+        return obj.isoformat()
+    return obj
+
+
+def _ordenacao_total(ordering):
+    campos = list(ordering)
+    if not any(campo.lstrip('-') in ('pk', 'id') for campo in campos):
+        campos.append('-pk' if campos and campos[-1].startswith('-') else 'pk')
+    return campos
+
+
+def _inverter(ordering):
+    return [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in ordering]
+
+
+def filtro_keyset(ordering, valores):
+    """
+    Q das linhas posteriores a `valores` na ordem `ordering`:
+    (a > x) OR (a = x AND b > y) OR ..., com < nos campos decrescentes.
+    """
+    filtro = Q()
+    iguais = {}
+    for campo, valor in zip(ordering, valores):
+        nome = campo.lstrip('-')
+        lookup = 'lt' if campo.startswith('-') else 'gt'
+        filtro |= Q(**iguais, **{f'{nome}__{lookup}': valor})
+        iguais[nome] = valor
+    return filtro
+
+
+def contagem_aproximada(queryset):
+    """
+    Total de linhas do queryset. No PostgreSQL usa a estimativa do
+    planejador (EXPLAIN) quando ela é grande; retorna (total, aproximado).
+    """
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plano = cursor.fetchone()[0]
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+        estimativa = int(plano[0]['Plan']['Plan Rows'])
+        if estimativa >= LIMITE_CONTAGEM_EXATA:
+            return estimativa, True
+    return queryset.count(), False
+
+
+class PaginaCursor:
+    """Página de resultados com a mesma interface usada pelos templates de `Page`."""
+
+    def __init__(self, object_list, ordering, page_size, inicio, anterior, proxima, params, param='cursor'):
+        self.object_list = object_list
+        self.ordering = ordering
+        self.page_size = page_size
+        self.inicio = inicio
+        self._anterior = anterior
+        self._proxima = proxima
+        self.params = params
+        self.param = param
+        self.count = None
+        self.count_aproximado = False
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_previous(self):
+        return self._anterior
+
+    def has_next(self):
+        return self._proxima
+
+    def has_other_pages(self):
+        return self._anterior or self._proxima
+
+    def start_index(self):
+        return self.inicio if self.object_list else 0
+
+    def end_index(self):
+        return self.inicio + len(self.object_list) - 1
+
+    def _cursor(self, obj, direcao, posicao):
+        valores = [_valor(obj, campo.lstrip('-')) for campo in self.ordering]
+        return _codificar({'v': valores, 'd': direcao, 'i': posicao})
+
+    @property
+    def next_cursor(self):
+        if not self._proxima:
+            return None
+        return self._cursor(self.object_list[-1], 'n', self.end_index())
+
+    @property
+    def previous_cursor(self):
+        if not self._anterior:
+            return None
+        return self._cursor(self.object_list[0], 'p', self.inicio)
+
+    def _querystring(self, cursor):
+        params = self.params.copy()
+        params.pop('page', None)
+        params[self.param] = cursor
+        return params.urlencode()
+
+    @property
+    def next_querystring(self):
+        return self._querystring(self.next_cursor) if self._proxima else ''
+
+    @property
+    def previous_querystring(self):
+        if not self._anterior:
+            return ''
+        if self.inicio - self.page_size <= 1 or not self.object_list:
+            # A página anterior é a primeira: link sem cursor
+            params = self.params.copy()
+            params.pop('page', None)
+            params.pop(self.param, None)
+            return params.urlencode()
+        return self._querystring(self.previous_cursor)
+
+
+def paginar_por_cursor(queryset, ordering, page_size, params, param='cursor'):
+    """
+    Busca a página indicada por `params[param]` (um QueryDict) e retorna uma
+    `PaginaCursor`. Sem cursor, ou com cursor inválido, retorna a primeira página.
+    """
+    ordering = _ordenacao_total(ordering)
+    dados = _decodificar(params.get(param, ''))
+
+    if dados is None:
+        linhas = list(queryset.order_by(*ordering)[:page_size + 1])
+        return PaginaCursor(linhas[:page_size], ordering, page_size, 1, False, len(linhas) > page_size, params, param)
+
+    posicao = int(dados['i'])
+    if dados['d'] == 'n':
+        linhas = list(queryset.filter(filtro_keyset(ordering, dados['v'])).order_by(*ordering)[:page_size + 1])
+        return PaginaCursor(linhas[:page_size], ordering, page_size, posicao + 1, True, len(linhas) > page_size, params, param)
+
+    # Página anterior: percorre a ordem invertida e desfaz a inversão
+    invertida = _inverter(ordering)
+    linhas = list(queryset.filter(filtro_keyset(invertida, dados['v'])).order_by(*invertida)[:page_size + 1])
+    anterior = len(linhas) > page_size
+    linhas = linhas[:page_size][::-1]
+    inicio = max(posicao - len(linhas), 1) if anterior else 1
+    return PaginaCursor(linhas, ordering, page_size, inicio, anterior, True, params, param)
+
+
+class PaginacaoCursorMixin:
+    """
+    Substitui a paginação por OFFSET de uma ListView pela paginação por
+    cursor. O contexto continua com `page_obj` e `is_paginated`; `paginator`
+    fica None e o total vai em `page_obj.count` (aproximado no PostgreSQL
+    quando `keyset_count_aproximado`, ou omitido com `keyset_count = False`).
+    """
+    keyset_ordering = ('pk',)
+    keyset_count = True
+    keyset_count_aproximado = True
+    cursor_param = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        page = paginar_por_cursor(
+            queryset, self.keyset_ordering, page_size, self.request.GET, self.cursor_param
+        )
+        if self.keyset_count:
+            if self.keyset_count_aproximado:
+                page.count, page.count_aproximado = contagem_aproximada(queryset)
+            else:
+                page.count = queryset.count()
+        return (None, page, page.object_list, page.has_other_pages())
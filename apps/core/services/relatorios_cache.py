@@ -0,0 +1,83 @@
+"""
+Cache dos relatórios de composição familiar.
+
+`RelatoriosEmCache` envolve um serviço de relatórios (FamiliaStatsService ou
+EstatisticasComposicao) e guarda o resultado de cada relatório no cache do
+Django com o lote, os filtros e a versão dos dados de validação na chave
+(ver services/versao_dados.py). Mudanças de status de validação, de membros
+ou de famílias geram uma versão nova: as entradas antigas deixam de ser
+alcançadas e saem pelo TTL (FAMILIA_STATS_CACHE_TIMEOUT) ou pelo descarte
+do backend (LRU no cache local, no Redis e no Memcached).
+
+Os contadores de acertos e falhas ficam no banco (services/contadores.py),
+somados por todos os processos; o comando `cache_relatorios` os exibe:
+
+    contadores_cache()  # {'acertos': 10, 'falhas': 2, 'taxa_acerto': 83.33}
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.core.services.contadores import incrementar, valores, zerar
+from apps.core.services.versao_dados import versao_validacoes
+
+PREFIXO = 'core:relatorios'
+CHAVE_ACERTOS = f'{PREFIXO}:acertos'
+CHAVE_FALHAS = f'{PREFIXO}:falhas'
+
+# Métodos cujo resultado depende só do lote, dos filtros e dos dados
+RELATORIOS = ('get_maes_solo', 'get_unipessoa', 'get_casal_sem_filho', 'get_filhos_quantitativos', 'get_por_bairro')
+
+
+def contadores_cache():
+    """Acertos, falhas e taxa de acerto (%) do cache de relatórios."""
+    contadores = valores(CHAVE_ACERTOS, CHAVE_FALHAS)
+    acertos = contadores[CHAVE_ACERTOS]
+    falhas = contadores[CHAVE_FALHAS]
+    total = acertos + falhas
+    return {
+        'acertos': acertos,
+        'falhas': falhas,
+        'taxa_acerto': round(acertos / total * 100, 2) if total else 0,
+    }
+
+
+def zerar_contadores_cache():
+    zerar(CHAVE_ACERTOS, CHAVE_FALHAS)
+
+
+class RelatoriosEmCache:
+    """
+    Mesma interface do serviço envolvido; os métodos de RELATORIOS passam
+    pelo cache e os demais (ex.: get_familias_para_exportacao) vão direto
+    ao serviço.
+    """
+
+    def __init__(self, servico):
+        self.servico = servico
+        lote = servico.import_batch.pk if servico.import_batch else 0
+        filtros = '&'.join(f'{campo}={valor}' for campo, valor in sorted(servico.filtros.items()))
+        # Filtros em hash: a chave não pode ter espaços (ex.: nome do bairro)
+        self._escopo = f'{type(servico).__name__}:{lote}:{hashlib.md5(filtros.encode()).hexdigest()}'
+
+    def __getattr__(self, nome):
+        atributo = getattr(self.servico, nome)
+        if nome not in RELATORIOS:
+            return atributo
+
+        def em_cache(*args, **kwargs):
+            return self._obter(nome, atributo, args, kwargs)
+        return em_cache
+
+    def _obter(self, nome, metodo, args, kwargs):
+        argumentos = ','.join([*map(str, args), *(f'{k}={v}' for k, v in sorted(kwargs.items()))])
+        chave = f'{PREFIXO}:{versao_validacoes()}:{self._escopo}:{nome}:{argumentos}'
+        resultado = cache.get(chave)
+        if resultado is not None:
+            incrementar(CHAVE_ACERTOS)
+            return resultado
+        incrementar(CHAVE_FALHAS)
+        resultado = metodo(*args, **kwargs)
+        cache.set(chave, resultado, settings.FAMILIA_STATS_CACHE_TIMEOUT)
+        return resultado
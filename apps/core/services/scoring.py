@@ -0,0 +1,153 @@
+"""
+Pontuação das validações calculada no banco.
+
+Mesma regra de `Validacao.calcular_pontuacao`: cada critério atendido vale
+int(pontos * float(peso)), os pontos são somados por categoria, cada
+categoria é limitada a 25 e o total é a soma das categorias.
+
+Cada categoria vira uma subquery agrupada, correlacionada com a validação,
+e o limite é aplicado com LEAST. Assim é possível anotar ou atualizar a
+pontuação de muitas validações sem carregar os critérios em Python:
+
+    Validacao.objects.annotate(pontuacao=pontuacao_expression())
+    recalcular_pontuacoes(Validacao.objects.filter(status='pendente'))
+"""
+from django.db.models import (
+    Case, F, FloatField, Func, IntegerField, OuterRef, QuerySet, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Cast, Coalesce, Least
+from django.utils import timezone
+
+from apps.core.models import Criterio, Validacao, ValidacaoCriterio
+
+LIMITE_POR_CATEGORIA = 25
+
+
+class TruncarInteiro(Func):
+    """int() do Python sobre um float: trunca em direção a zero."""
+
+    template = 'CAST(TRUNC(%(expressions)s) AS integer)'
+    output_field = IntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # No SQLite o CAST de REAL para INTEGER já trunca (TRUNC pode não existir)
+        return self.as_sql(compiler, connection, template='CAST(%(expressions)s AS integer)', **extra_context)
+
+
+def pontos_criterio_expression(prefixo='criterio__'):
+    """
+    int(pontos * float(peso)) no banco: a multiplicação é feita em double
+    precision, como no Python, para que o truncamento dê o mesmo resultado
+    (ex.: 100 * 0.29 = 28.999999999999996 -> 28).
+    """
+    return TruncarInteiro(
+        Cast(F(f'{prefixo}pontos'), FloatField()) * Cast(F(f'{prefixo}peso'), FloatField())
+    )
+
+
+def pontuacao_categorias_expressions(categoria_ids=None):
+    """
+    Soma (sem limite) dos pontos atendidos por categoria, relativa à validação
+    (OuterRef('pk')). Retorna {categoria_id: expressão}; critérios sem
+    categoria ficam na chave -1, como em `get_pontuacao_detalhada`.
+    """
+    if categoria_ids is None:
+        categoria_ids = Criterio.objects.order_by().values_list('categoria_id', flat=True).distinct()
+
+    atendidos = ValidacaoCriterio.objects.filter(validacao=OuterRef('pk'), atendido=True).order_by()
+    expressions = {}
+    for categoria_id in categoria_ids:
+        if categoria_id is None:
+            criterios = atendidos.filter(criterio__categoria__isnull=True)
+        else:
+            criterios = atendidos.filter(criterio__categoria_id=categoria_id)
+        soma = criterios.values('validacao_id').annotate(total=Sum(pontos_criterio_expression())).values('total')
+        expressions[categoria_id if categoria_id is not None else -1] = Coalesce(
+            Subquery(soma, output_field=IntegerField()), 0
+        )
+    return expressions
+
+
+def pontuacao_expression(categoria_ids=None):
+    """Pontuação total da validação (OuterRef('pk')), com o limite de 25 por categoria."""
+    total = Value(0)
+    for expression in pontuacao_categorias_expressions(categoria_ids).values():
+        total = total + Least(expression, Value(LIMITE_POR_CATEGORIA))
+    return total
+
+
+def recalcular_pontuacoes(validacoes, chunk_size=1000):
+    """
+    Recalcula e grava pontuacao_total das validações (queryset ou ids) com
+    UPDATEs no banco, por bloco. Só as pontuações que mudaram são gravadas.
+    Retorna a quantidade de validações atualizadas.
+    """
+    if isinstance(validacoes, QuerySet):
+        validacao_ids = list(validacoes.order_by().values_list('pk', flat=True))
+    else:
+        validacao_ids = list(validacoes)
+
+    categoria_ids = list(Criterio.objects.order_by().values_list('categoria_id', flat=True).distinct())
+    # updated_at invalida os subtotais guardados pelo autosave incremental
+    agora = timezone.now()
+    alteradas = 0
+    for start in range(0, len(validacao_ids), chunk_size):
+        bloco = validacao_ids[start:start + chunk_size]
+        alteradas += (
+            Validacao.objects.filter(pk__in=bloco)
+            .alias(nova=pontuacao_expression(categoria_ids))
+            .exclude(pontuacao_total=F('nova'))
+            .update(pontuacao_total=pontuacao_expression(categoria_ids), updated_at=agora)
+        )
+    return alteradas
+
+
+def subtotais_de_detalhes(detalhes):
+    """{categoria: total} a partir de `get_pontuacao_detalhada` (chaves como texto, serializáveis)."""
+    return {str(categoria_id): dados['total'] for categoria_id, dados in detalhes.items()}
+
+
+def detalhes_de_subtotais(subtotais):
+    """Formato de `get_pontuacao_detalhada` a partir dos subtotais por categoria."""
+    return {
+        categoria_id: {'total': total, 'efetivo': min(total, LIMITE_POR_CATEGORIA)}
+        for categoria_id, total in subtotais.items()
+        if total
+    }
+
+
+def pontuacao_de_subtotais(subtotais):
+    return sum(min(total, LIMITE_POR_CATEGORIA) for total in subtotais.values())
+
+
+def aplicar_alteracoes_criterios(validacao, marcados, desmarcados, subtotais):
+    """
+    Aplica a marcação de critérios alterados (autosave) e ajusta os subtotais
+    por categoria de forma incremental.
+
+    Apenas os critérios aplicáveis listados são lidos (uma consulta) e os que
+    de fato mudaram são gravados num único UPDATE. `subtotais` ({categoria:
+    total}, ver `subtotais_de_detalhes`) deve refletir o estado atual do banco.
+    Retorna os novos subtotais; a pontuação é `pontuacao_de_subtotais`.
+    """
+    marcados = set(marcados)
+    desmarcados = set(desmarcados) - marcados
+    subtotais = dict(subtotais)
+
+    mudaram = []
+    for vc_id, criterio_id, atendido, categoria_id, pontos, peso in ValidacaoCriterio.objects.filter(
+        validacao=validacao, aplicavel=True, criterio_id__in=marcados | desmarcados
+    ).values_list('id', 'criterio_id', 'atendido', 'criterio__categoria_id', 'criterio__pontos', 'criterio__peso'):
+        novo = criterio_id in marcados
+        if novo == atendido:
+            continue
+        mudaram.append(vc_id)
+        chave = str(categoria_id if categoria_id else -1)
+        delta = int(pontos * float(peso))
+        subtotais[chave] = subtotais.get(chave, 0) + (delta if novo else -delta)
+
+    if mudaram:
+        ValidacaoCriterio.objects.filter(pk__in=mudaram).update(
+            atendido=Case(When(criterio_id__in=marcados, then=Value(True)), default=Value(False))
+        )
+    return subtotais
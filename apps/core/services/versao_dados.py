@@ -0,0 +1,25 @@
+"""
+Versão dos dados de validação.
+
+Contador incrementado a cada mudança de status de validação, a cada família
+ou membro gravado fora da importação e a cada importação concluída.
+Resultados agregados (dashboard, relatórios) entram no cache com a versão na
+chave, então uma mudança torna as entradas antigas inalcançáveis sem precisar
+apagá-las uma a uma.
+
+A versão fica no banco (services/contadores.py), não no cache: com o cache
+local de cada processo, um incremento feito no worker ou em outro processo
+do gunicorn não seria visto pelos demais. Como a versão faz parte da chave,
+os caches locais continuam corretos.
+"""
+from apps.core.services.contadores import incrementar, valores
+
+CHAVE = 'core:versao_validacoes'
+
+
+def versao_validacoes():
+    return valores(CHAVE)[CHAVE]
+
+
+def incrementar_versao_validacoes():
+    incrementar(CHAVE)
@@ -1,39 +1,106 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from apps.core.models import Criterio, Validacao, ValidacaoCriterio
+from apps.cecad.models import Familia, ImportBatch
+from apps.cecad.services.familia_profile import sincronizacao_ativa
+from apps.core.models import Criterio, Validacao
 from apps.core.services.criteria_logic import CriteriaAssociator
+from apps.core.services.estatisticas_lote import aplicar_diferenca, contribuicoes, registrar_validacao
+from apps.core.services.jobs import enqueue
+from apps.core.services.versao_dados import incrementar_versao_validacoes
 
 
 @receiver(post_save, sender=Criterio)
 def associar_criterio_a_validacoes(sender, instance, created, **kwargs):
     """
-    Quando um novo critério é criado, associa automaticamente a todas as validações existentes.
+    Quando um novo critério é criado, enfileira a associação a todas as validações existentes.
     Quando um critério é atualizado, reavalia o impacto em todas as validações.
     """
     if created and instance.ativo:
-        # Buscar todas as validações que não possuem este critério
-        validacoes = Validacao.objects.select_related('familia').prefetch_related('familia__membros').all()
-        
-        # Criar associações em massa usando a lógica centralizada
-        count = 0
-        for validacao in validacoes:
-            # Verifica se já existe
-            if not ValidacaoCriterio.objects.filter(validacao=validacao, criterio=instance).exists():
-                is_applicable, observacao = CriteriaAssociator.check_applicability(instance, validacao.familia)
-                
-                ValidacaoCriterio.objects.create(
-                    validacao=validacao,
-                    criterio=instance,
-                    atendido=not is_applicable,
-                    aplicavel=is_applicable,
-                    observacao=observacao
-                )
-                count += 1
-                
-        if count > 0:
-            print(f"✓ Critério '{instance.descricao}' associado a {count} validações")
+        # A propagação roda em segundo plano (tarefa core.propagar_criterio);
+        # a validação aberta antes disso recebe o critério pelo associate_criteria
+        transaction.on_commit(
+            lambda: enqueue('core.propagar_criterio', {'criterio_id': instance.pk})
+        )
             
     elif not created and instance.ativo:
         # Se foi atualizado, chama o serviço de atualização de impacto
         CriteriaAssociator.update_criterion_impact(instance)
 
+
+@receiver(post_save, sender=Validacao)
+def versionar_status_validacao(sender, instance, created, raw=False, **kwargs):
+    """
+    Nova versão dos dados agregados quando o status de uma validação muda;
+    as estatísticas do lote são atualizadas fora da importação (que as
+    reconstrói ao final).
+    """
+    anterior = None if created else getattr(instance, '_status_original', None)
+    if created or anterior != instance.status:
+        incrementar_versao_validacoes()
+        if not raw and sincronizacao_ativa():
+            registrar_validacao(instance, anterior, instance.status)
+    instance._status_original = instance.status
+
+
+@receiver(post_delete, sender=Validacao)
+def versionar_exclusao_validacao(sender, instance, origin=None, **kwargs):
+    # Exclusão de um lote inteiro: uma única versão nova, no signal do lote
+    if not isinstance(origin, ImportBatch):
+        incrementar_versao_validacoes()
+    # Exclusão em cascata (família ou lote): as estatísticas saem com a família
+    if origin is not None and not isinstance(origin, Validacao) and getattr(origin, 'model', None) is not Validacao:
+        return
+    if not sincronizacao_ativa():
+        return
+    registrar_validacao(instance, instance.status, None)
+
+
+@receiver(pre_save, sender=Familia)
+def guardar_estatisticas_familia(sender, instance, raw=False, **kwargs):
+    """Contribuição da família nas estatísticas antes de gravar (lote, bairro, perfil, renda)."""
+    if raw or not sincronizacao_ativa() or instance.pk is None:
+        instance._estatisticas_antes = {}
+        return
+    instance._estatisticas_antes = contribuicoes(Familia.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Familia)
+def atualizar_estatisticas_familia(sender, instance, raw=False, **kwargs):
+    if raw or not sincronizacao_ativa():
+        return
+    antes = getattr(instance, '_estatisticas_antes', {})
+    aplicar_diferenca(antes, contribuicoes(Familia.objects.filter(pk=instance.pk)))
+    incrementar_versao_validacoes()
+
+
+def _exclusao_de_familia(origin):
+    """Exclusão da própria família (instância ou queryset), e não em cascata de um lote."""
+    return origin is None or isinstance(origin, Familia) or getattr(origin, 'model', None) is Familia
+
+
+@receiver(pre_delete, sender=Familia)
+def guardar_estatisticas_familia_excluida(sender, instance, origin=None, **kwargs):
+    if not _exclusao_de_familia(origin) or not sincronizacao_ativa():
+        return
+    instance._estatisticas_antes = contribuicoes(Familia.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Familia)
+def atualizar_estatisticas_familia_excluida(sender, instance, origin=None, **kwargs):
+    # Exclusão de um lote inteiro: as linhas do lote saem em cascata
+    if not _exclusao_de_familia(origin) or not sincronizacao_ativa():
+        return
+    aplicar_diferenca(getattr(instance, '_estatisticas_antes', {}), {})
+    incrementar_versao_validacoes()
+
+
+@receiver(post_save, sender=ImportBatch)
+def versionar_importacao_concluida(sender, instance, **kwargs):
+    if instance.status == 'completed':
+        incrementar_versao_validacoes()
+
+
+@receiver(post_delete, sender=ImportBatch)
+def versionar_exclusao_lote(sender, instance, **kwargs):
+    incrementar_versao_validacoes()
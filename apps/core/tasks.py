@@ -0,0 +1,23 @@
+"""Tarefas da fila em segundo plano do app core."""
+from django.conf import settings
+
+from apps.core.models import Criterio
+from apps.core.services.criteria_logic import CriteriaAssociator
+from apps.core.services.fila_validacao import liberar_locks_expirados
+from apps.core.services.jobs import periodic, task
+
+
+@task('core.propagar_criterio')
+def propagar_criterio(ctx, criterio_id):
+    """Associa um critério recém-criado às validações existentes."""
+    criterio = Criterio.objects.filter(pk=criterio_id, ativo=True).first()
+    if criterio is None:
+        # Critério removido ou desativado antes da execução
+        return
+    CriteriaAssociator.propagate_criterion(criterio, on_progress=ctx.set_progress)
+
+
+@periodic('core.liberar_locks_expirados', interval=settings.VALIDACAO_LOCK_SWEEP_INTERVAL)
+def liberar_avaliacoes_expiradas():
+    """Devolve à fila as validações abandonadas com lock expirado."""
+    liberar_locks_expirados()
@@ -0,0 +1,38 @@
+from datetime import date
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.cecad.models import Familia
+from apps.core.models import Criterio, Validacao, ValidacaoCriterio
+
+
+class AssociarCriteriosCommandTest(TestCase):
+    def setUp(self):
+        for n in range(5):
+            familia = Familia.objects.create(cod_familiar_fam=str(n), dat_atual_fam=date(2024, 1, 1), qtde_pessoas=1)
+            Validacao.objects.create(familia=familia)
+        # Criados direto no banco para não depender da propagação pela fila
+        Criterio.objects.bulk_create([
+            Criterio(codigo='a', descricao='A', pontos=10),
+            Criterio(codigo='b', descricao='B', pontos=8, aplica_se_a_unipessoais=False),
+        ])
+
+    def test_processa_em_blocos_e_repontua(self):
+        out = StringIO()
+        call_command('associar_criterios', chunk_size=2, stdout=out)
+
+        self.assertEqual(ValidacaoCriterio.objects.count(), 10)
+        self.assertIn('5/5 validações', out.getvalue())
+        # Critério não aplicável conta como atendido
+        for validacao in Validacao.objects.all():
+            self.assertEqual(validacao.pontuacao_total, 8)
+            self.assertEqual(validacao.pontuacao_total, validacao.calcular_pontuacao())
+
+    def test_retoma_apos_ultimo_id(self):
+        ids = list(Validacao.objects.order_by('pk').values_list('pk', flat=True))
+        call_command('associar_criterios', chunk_size=2, after_id=ids[2], stdout=StringIO())
+
+        processadas = set(ValidacaoCriterio.objects.values_list('validacao_id', flat=True))
+        self.assertEqual(processadas, set(ids[3:]))
@@ -0,0 +1,71 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.cecad.models import Familia
+from apps.core.models import Categoria, Criterio, Validacao, ValidacaoCriterio
+
+
+class AutosaveIncrementalTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('operador', password='x')
+        self.client.force_login(self.user)
+        familia = Familia.objects.create(cod_familiar_fam='1', dat_atual_fam=date(2024, 1, 1))
+        self.validacao = Validacao.objects.create(familia=familia, em_avaliacao_por=self.user)
+        categoria = Categoria.objects.create(codigo='saude', nome='Saúde')
+        self.criterios = Criterio.objects.bulk_create([
+            Criterio(codigo=f'c{i}', descricao=f'C{i}', categoria=categoria, pontos=5, peso=Decimal('1.50'))
+            for i in range(4)
+        ])
+        ValidacaoCriterio.objects.bulk_create([
+            ValidacaoCriterio(validacao=self.validacao, criterio=c) for c in self.criterios
+        ])
+        self.url = reverse('validacao_detail', args=[self.validacao.pk])
+
+    def _autosave(self, alterados, marcados):
+        dados = {'action': 'save_criteria', 'alterados': ','.join(str(c.pk) for c in alterados)}
+        dados.update({f'criterio_{c.pk}': 'on' for c in marcados})
+        response = self.client.post(self.url, dados, HTTP_HX_REQUEST='true')
+        self.assertEqual(response.status_code, 204)
+        return json.loads(response['HX-Trigger'])['autoSaved']
+
+    def test_aplica_somente_os_alterados_e_ajusta_subtotais(self):
+        c0, c1, c2, c3 = self.criterios
+        self.assertEqual(self._autosave([c0, c1], [c0, c1])['pontuacao'], 14)
+
+        # Marcar outros dois ultrapassa o limite de 25 da categoria
+        with CaptureQueriesContext(connection) as queries:
+            evento = self._autosave([c2, c3], [c2, c3])
+        self.assertEqual(evento['pontuacao'], 25)
+        self.assertEqual(evento['detalhes'][str(c0.categoria_id)], {'total': 28, 'efetivo': 25})
+        self.assertLessEqual(len(queries), 10)
+
+        evento = self._autosave([c0, c1, c2], [])
+        self.validacao.refresh_from_db()
+        self.assertEqual(evento['pontuacao'], 7)
+        self.assertEqual(self.validacao.pontuacao_total, self.validacao.calcular_pontuacao())
+        self.assertEqual(list(self.validacao.criterios_avaliados.filter(atendido=True)), [
+            ValidacaoCriterio.objects.get(validacao=self.validacao, criterio=c3)
+        ])
+
+    def test_alteracao_externa_invalida_os_subtotais_da_sessao(self):
+        c0, c1 = self.criterios[:2]
+        self.client.get(self.url)
+        self.assertEqual(self._autosave([c0], [c0])['pontuacao'], 7)
+
+        # Mudança de peso fora desta aba: update_criterion_impact repontua a validação
+        c0.peso = Decimal('2.00')
+        c0.save()
+        self.validacao.refresh_from_db()
+        self.assertEqual(self.validacao.pontuacao_total, 10)
+
+        evento = self._autosave([c1], [c0, c1])
+        self.assertEqual(evento['pontuacao'], 17)
+        self.validacao.refresh_from_db()
+        self.assertEqual(self.validacao.pontuacao_total, self.validacao.calcular_pontuacao())
@@ -0,0 +1,101 @@
+from datetime import date
+
+from django.test import TestCase
+
+from apps.cecad.models import Familia, Pessoa
+from apps.core.models import Criterio, Validacao, ValidacaoCriterio
+from apps.core.services.criteria_engine import avaliar_aplicabilidade
+from apps.core.services.criteria_logic import CriteriaAssociator
+from apps.core.services.jobs import Worker
+
+
+class CriteriaEngineTest(TestCase):
+    def setUp(self):
+        hoje = date.today()
+        membros = {
+            # RF homem com filho de 10 anos
+            '1': [('1', 1, date(1980, 1, 1)), ('2', 3, date(hoje.year - 10, 1, 1))],
+            # RF mulher unipessoal, idosa
+            '2': [('2', 1, date(1950, 6, 1))],
+            # Família sem crianças, cônjuge sem data de nascimento
+            '3': [('2', 1, date(1990, 1, 1)), ('1', 2, None)],
+            # Família sem membros
+            '4': [],
+        }
+        self.familias = []
+        for cod, pessoas in membros.items():
+            familia = Familia.objects.create(cod_familiar_fam=cod, dat_atual_fam=date(2024, 1, 1))
+            for n, (sexo, parentesco, nascimento) in enumerate(pessoas):
+                Pessoa.objects.create(
+                    familia=familia, num_nis_pessoa_atual=f'{cod}{n}', nom_pessoa='X',
+                    cod_sexo_pessoa=sexo, cod_parentesco_rf_pessoa=parentesco, dat_nasc_pessoa=nascimento,
+                )
+            familia.refresh_from_db()
+            self.familias.append(familia)
+
+    def _criterios(self):
+        opcoes = [
+            {},
+            {'aplica_se_a_sem_criancas': False},
+            {'aplica_se_a_rf_homem': False},
+            {'aplica_se_a_unipessoais': False},
+            {'aplica_se_a_sem_criancas': False, 'aplica_se_a_rf_homem': False},
+            {'idade_maxima': 17},
+            {'idade_minima': 60},
+            {'sexo_necessario': '1'},
+            {'sexo_necessario': '2', 'parentescos_permitidos': '1, 2'},
+            {'idade_minima': 18, 'parentescos_permitidos': '2'},
+            {'sexo_necessario': '1', 'parentescos_permitidos': 'x'},
+            {'parentescos_permitidos': '3'},
+        ]
+        return [Criterio(codigo=f'c{i}', descricao=f'c{i}', **campos) for i, campos in enumerate(opcoes)]
+
+    def test_matriz_igual_a_avaliacao_individual(self):
+        criterios = self._criterios()
+        matriz = avaliar_aplicabilidade(criterios, [f.pk for f in self.familias])
+
+        self.assertEqual(matriz.aplicavel.shape, (len(criterios), len(self.familias)))
+        for i, criterio in enumerate(criterios):
+            for familia in self.familias:
+                self.assertEqual(
+                    matriz.resultado(i, familia.pk),
+                    CriteriaAssociator.check_applicability(criterio, familia),
+                    f"{criterio.codigo} / família {familia.cod_familiar_fam}",
+                )
+
+    def test_novo_criterio_e_propagado_em_segundo_plano(self):
+        for familia in self.familias:
+            Validacao.objects.create(familia=familia)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            criterio = Criterio.objects.create(codigo='unipessoal', descricao='X', aplica_se_a_unipessoais=False)
+        # A propagação fica na fila
+        self.assertFalse(ValidacaoCriterio.objects.filter(criterio=criterio).exists())
+
+        job = Worker(worker_id='teste', heartbeat_interval=0).run_once()
+        self.assertEqual(job.status, 'completed')
+        job.refresh_from_db()
+        self.assertEqual((job.progress_done, job.progress_total), (len(self.familias), len(self.familias)))
+
+        associacoes = ValidacaoCriterio.objects.filter(criterio=criterio)
+        self.assertEqual(associacoes.count(), len(self.familias))
+        unipessoal = associacoes.get(validacao__familia__cod_familiar_fam='2')
+        self.assertEqual((unipessoal.aplicavel, unipessoal.atendido), (False, True))
+        self.assertEqual(unipessoal.observacao, "Não aplicável: Família unipessoal")
+        self.assertEqual(associacoes.filter(aplicavel=True).count(), len(self.familias) - 1)
+
+    def test_edicao_do_criterio_reavalia_e_repontua_em_lote(self):
+        criterio = Criterio.objects.create(codigo='c', descricao='C', pontos=10)
+        validacoes = [Validacao.objects.create(familia=familia) for familia in self.familias]
+        CriteriaAssociator.associate_criteria_bulk(validacoes, [criterio])
+        ValidacaoCriterio.objects.filter(criterio=criterio).update(atendido=True)
+
+        criterio.pontos = 15
+        criterio.aplica_se_a_unipessoais = False
+        criterio.save()
+
+        unipessoal = ValidacaoCriterio.objects.get(criterio=criterio, validacao__familia__cod_familiar_fam='2')
+        self.assertEqual((unipessoal.aplicavel, unipessoal.observacao), (False, "Não aplicável: Família unipessoal"))
+        for validacao in Validacao.objects.all():
+            self.assertEqual(validacao.pontuacao_total, 15)
+            self.assertEqual(validacao.pontuacao_total, validacao.calcular_pontuacao())
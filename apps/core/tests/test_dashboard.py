@@ -0,0 +1,44 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.cecad.models import Familia, ImportBatch
+from apps.core.models import Validacao
+
+
+class DashboardSnapshotTest(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('operador', password='x'))
+        lote = ImportBatch.objects.create(status='completed')
+        rendas = ['50.00', '150.00', '150.00', None, '5000.00']
+        for n, renda in enumerate(rendas):
+            familia = Familia.objects.create(
+                cod_familiar_fam=str(n), dat_atual_fam=date(2024, 1, 1), import_batch=lote,
+                vlr_renda_media_fam=Decimal(renda) if renda else None, num_membros=1 + n % 2,
+            )
+            Validacao.objects.create(familia=familia, status='aprovado' if n else 'reprovado')
+
+    def test_agrega_e_reaproveita_snapshot(self):
+        with CaptureQueriesContext(connection) as queries:
+            context = self.client.get(reverse('dashboard')).context
+        consultas = len(queries)
+
+        self.assertEqual(context['grafico_status'], {'pendente': 0, 'aprovado': 4, 'reprovado': 1})
+        self.assertEqual(context['grafico_renda']['valores'], [0, 2, 0, 0, 0, 0, 1])
+        self.assertEqual(context['grafico_membros'], {'labels': ['1 membros', '2 membros'], 'valores': [2, 2]})
+        self.assertEqual(context['grafico_lotes']['aprovados'], [4])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('dashboard'))
+        self.assertLess(len(queries), consultas - 5)
+
+        validacao = Validacao.objects.get(familia__cod_familiar_fam='0')
+        validacao.status = 'aprovado'
+        validacao.save()
+        context = self.client.get(reverse('dashboard')).context
+        self.assertEqual(context['validacoes_aprovadas'], 5)
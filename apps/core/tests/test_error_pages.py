@@ -1,6 +1,20 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth.models import User
-from django.urls import reverse
+from django.core.exceptions import PermissionDenied
+from django.urls import include, path
+
+
+def acesso_negado(request):
+    raise PermissionDenied
+
+
+# URLs do projeto mais uma página que sempre nega acesso (as views do projeto
+# redirecionam com mensagem em vez de responder 403)
+urlpatterns = [
+    path('acesso-negado/', acesso_negado),
+    path('', include('comidanamesa.urls')),
+]
+
 
 class ErrorTemplatesTests(TestCase):
     def setUp(self):
@@ -14,12 +28,11 @@ class ErrorTemplatesTests(TestCase):
         self.assertTemplateUsed(response, '404.html')
         self.assertTemplateUsed(response, 'core/base.html')
 
+    @override_settings(ROOT_URLCONF=__name__)
     def test_403_template(self):
-        """Test that the 403 template is used when accessing restricted page."""
+        """Test that the 403 template is used when access is denied."""
         self.client.login(username='testuser', password='password')
-        # Accessing Cecad import page which is restricted to superusers
-        url = reverse('cecad_import')
-        response = self.client.get(url)
+        response = self.client.get('/acesso-negado/')
         self.assertEqual(response.status_code, 403)
         self.assertTemplateUsed(response, '403.html')
         self.assertTemplateUsed(response, 'core/base.html')
@@ -0,0 +1,92 @@
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.cecad.models import Familia, ImportBatch, Pessoa
+from apps.cecad.services.importer import CecadImporter
+from apps.cecad.tests.test_bulk_import import HEADER, ROWS
+from apps.core.models import EstatisticaLote, Validacao
+from apps.core.services.estatisticas_lote import EstatisticasComposicao, contribuicoes
+from apps.core.services.familia_stats import FamiliaStatsService
+
+
+def _tabela():
+    """Linhas de EstatisticaLote somadas por chave, sem as zeradas."""
+    somas = {}
+    for linha in EstatisticaLote.objects.all():
+        chave = (linha.import_batch_id, linha.bairro, linha.num_membros, linha.num_filhos,
+                 linha.mae_solo, linha.faixa_renda, linha.status)
+        atual = somas.get(chave, (0, 0, Decimal(0)))
+        somas[chave] = (atual[0] + linha.total, atual[1] + linha.com_renda, atual[2] + linha.renda_total)
+    return {chave: valores for chave, valores in somas.items() if any(valores)}
+
+
+class EstatisticasLoteTest(TestCase):
+    def setUp(self):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as f:
+            f.write("\n".join([HEADER] + ROWS) + "\n")
+        self.addCleanup(os.remove, path)
+        self.batch = ImportBatch.objects.create(batch_type='full')
+        CecadImporter(path, self.batch, bulk=True).run()
+
+    def assertTabelaConsistente(self):
+        self.assertEqual(_tabela(), contribuicoes(Familia.objects.all()))
+
+    def test_importacao_reconstroi_o_lote(self):
+        self.assertTrue(self.batch.estatisticas.exists())
+        self.assertTabelaConsistente()
+
+        stats = FamiliaStatsService(import_batch=self.batch)
+        resumo = EstatisticasComposicao(import_batch=self.batch)
+        self.assertEqual(resumo.get_maes_solo(), stats.get_maes_solo())
+        self.assertEqual(resumo.get_unipessoa(), stats.get_unipessoa())
+        self.assertEqual(resumo.get_filhos_quantitativos(), stats.get_filhos_quantitativos())
+        self.assertEqual(resumo.get_por_bairro(), stats.get_por_bairro())
+
+    def test_alteracoes_atualizam_incrementalmente(self):
+        validacao = Validacao.objects.filter(familia__import_batch=self.batch).first()
+        validacao.status = 'aprovado'
+        validacao.save()
+        self.assertTabelaConsistente()
+
+        outra = Validacao.objects.exclude(pk=validacao.pk).first()
+        outra.reservar_avaliacao(User.objects.create_user('operador', password='x'))
+        outra.status = 'reprovado'
+        outra.save()
+        self.assertTabelaConsistente()
+
+        familia = validacao.familia
+        Pessoa.objects.create(familia=familia, num_nis_pessoa_atual='99999999999', nom_pessoa='Nova',
+                              cod_parentesco_rf_pessoa=3)
+        familia.refresh_from_db()
+        familia.nom_localidade_fam = 'OUTRO BAIRRO'
+        familia.save()
+        self.assertTabelaConsistente()
+
+        manual = Familia.objects.create(cod_familiar_fam='1', dat_atual_fam=date(2024, 1, 1),
+                                        vlr_renda_media_fam=Decimal('80.00'))
+        Validacao.objects.create(familia=manual)
+        self.assertTabelaConsistente()
+
+        familia.delete()
+        manual.validacoes.all().delete()
+        self.assertTabelaConsistente()
+
+    def test_comparacao_e_relatorio_leem_a_tabela(self):
+        self.client.force_login(User.objects.create_user('operador', password='x'))
+        response = self.client.post(reverse('cecad_comparison'), {'batch1': self.batch.pk, 'batch2': self.batch.pk})
+        stats = response.context['stats1']
+        self.assertEqual(stats['total_familias'], self.batch.familias.count())
+        self.assertEqual(stats['total_pessoas'], Pessoa.objects.filter(familia__import_batch=self.batch).count())
+
+        response = self.client.get(reverse('relatorios-familias'))
+        self.assertEqual(
+            response.context['por_bairro'],
+            FamiliaStatsService(import_batch=self.batch).get_por_bairro(),
+        )
@@ -0,0 +1,66 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.cecad.models import Familia
+from apps.core.models import Validacao
+from apps.core.services.fila_validacao import reservar_proxima
+
+
+class ReservarProximaTest(TestCase):
+    def setUp(self):
+        self.ana = User.objects.create_user('ana')
+        self.bia = User.objects.create_user('bia')
+        self.validacoes = [
+            Validacao.objects.create(
+                familia=Familia.objects.create(cod_familiar_fam=str(n), dat_atual_fam=date(2024, 1, 1))
+            )
+            for n in range(3)
+        ]
+
+    def test_operadores_recebem_validacoes_diferentes(self):
+        primeira = reservar_proxima(self.ana)
+        segunda = reservar_proxima(self.bia)
+
+        self.assertNotEqual(primeira.pk, segunda.pk)
+        self.assertEqual((primeira.em_avaliacao_por, primeira.status), (self.ana, 'em_analise'))
+        # Quem já tem uma validação em andamento recebe a mesma
+        self.assertEqual(reservar_proxima(self.ana).pk, primeira.pk)
+
+    def test_lock_expirado_volta_para_a_fila(self):
+        expirado = timezone.now() - timedelta(minutes=31)
+        Validacao.objects.update(em_avaliacao_por=self.bia, iniciado_em=expirado, status='em_analise')
+        Validacao.objects.filter(pk=self.validacoes[0].pk).update(iniciado_em=timezone.now())
+
+        self.assertEqual(reservar_proxima(self.ana).pk, self.validacoes[1].pk)
+        self.assertFalse(self.validacoes[0].reservar_avaliacao(self.ana))
+
+        Validacao.objects.update(em_avaliacao_por=self.bia, iniciado_em=timezone.now())
+        self.assertIsNone(reservar_proxima(self.ana))
+
+    def test_endpoint_abre_a_proxima_validacao(self):
+        self.client.force_login(self.ana)
+        response = self.client.post(reverse('validacao_proxima'))
+        self.assertRedirects(
+            response, reverse('validacao_detail', args=[self.validacoes[0].pk]), fetch_redirect_response=False
+        )
+
+    def test_varredura_libera_locks_expirados(self):
+        expirado = timezone.now() - timedelta(minutes=45)
+        Validacao.objects.filter(pk=self.validacoes[0].pk).update(
+            em_avaliacao_por=self.ana, iniciado_em=expirado, status='em_analise'
+        )
+        Validacao.objects.filter(pk=self.validacoes[1].pk).update(em_avaliacao_por=self.bia, iniciado_em=timezone.now())
+
+        out = StringIO()
+        call_command('liberar_avaliacoes_expiradas', stdout=out)
+
+        self.assertIn('1 validação(ões) liberada(s)', out.getvalue())
+        liberada = Validacao.objects.get(pk=self.validacoes[0].pk)
+        self.assertEqual((liberada.em_avaliacao_por, liberada.iniciado_em, liberada.status), (None, None, 'em_analise'))
+        self.assertEqual(Validacao.objects.get(pk=self.validacoes[1].pk).em_avaliacao_por, self.bia)
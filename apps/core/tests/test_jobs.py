@@ -0,0 +1,175 @@
+import os
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.bsdi.models import BSDIExportacao
+from apps.cecad.models import ImportBatch
+from apps.cecad.tests.test_bulk_import import HEADER, ROWS
+from apps.core.models import Job
+from apps.core.services import jobs
+
+chamadas = []
+
+
+@jobs.task('tests.ok')
+def tarefa_ok(ctx, valor):
+    chamadas.append(valor)
+
+
+@jobs.task('tests.erro')
+def tarefa_erro(ctx):
+    raise ValueError("falhou")
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        chamadas.clear()
+        self.worker = jobs.Worker(worker_id='teste', heartbeat_interval=0)
+
+    def test_executa_tarefa_pendente(self):
+        job = jobs.enqueue('tests.ok', {'valor': 42})
+        self.assertEqual(self.worker.run_once().pk, job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(chamadas, [42])
+        self.assertIsNone(self.worker.run_once())
+
+    def test_erro_reagenda_com_backoff_e_falha_apos_tentativas(self):
+        job = jobs.enqueue('tests.erro', max_attempts=2)
+        self.worker.run_once()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'pending')
+        self.assertGreater(job.run_after, timezone.now())
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.worker.run_once()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error_message), ('failed', 2, 'falhou'))
+
+    def test_rotina_periodica_respeita_intervalo(self):
+        jobs.periodic('tests.manutencao', interval=3600)(lambda: chamadas.append('manutencao'))
+        self.addCleanup(jobs._periodic.pop, 'tests.manutencao')
+        self.worker.run_once()
+        self.worker.run_once()
+        self.assertEqual(chamadas.count('manutencao'), 1)
+
+    def test_cancelar_tarefa_pendente(self):
+        job = jobs.enqueue('tests.ok', {'valor': 1})
+        job.request_cancel()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'cancelled')
+        self.assertIsNone(self.worker.run_once())
+        self.assertEqual(chamadas, [])
+
+    def test_tarefa_sem_heartbeat_volta_para_fila(self):
+        job = jobs.enqueue('tests.ok', {'valor': 7})
+        jobs.claim_next('worker-morto')
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+
+        self.worker.run_once()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('completed', 2))
+        self.assertEqual(chamadas, [7])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImportJobTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        self.worker = jobs.Worker(worker_id='teste', heartbeat_interval=0)
+
+    def test_importacao_enfileirada_pelo_view(self):
+        arquivo = SimpleUploadedFile('cecad.csv', ("\n".join([HEADER] + ROWS) + "\n").encode('utf-8'))
+        response = self.client.post(reverse('cecad_import'), {'csv_file': arquivo})
+        batch = ImportBatch.objects.get()
+        self.assertRedirects(response, reverse('cecad_import_progress', args=[batch.pk]), fetch_redirect_response=False)
+        self.assertEqual(batch.status, 'processing')
+
+        job = self.worker.run_once()
+        self.assertEqual(job.status, 'completed')
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, 'completed')
+        self.assertEqual(batch.familias.count(), 3)
+        os.remove(batch.original_file.path)
+
+    def test_worker_interrompido_marca_lote_com_erro(self):
+        batch = ImportBatch.objects.create(description="Lote")
+        job = jobs.enqueue('cecad.import', {'batch_id': batch.pk}, max_attempts=1)
+        jobs.claim_next('worker-morto')
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+
+        jobs.recover_stale_jobs()
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, 'error')
+        self.assertIn('worker-morto', batch.error_message)
+
+    def test_retomada_nao_duplica_importacao_em_andamento(self):
+        batch = ImportBatch.objects.create(
+            description="Lote", status='error',
+            original_file=SimpleUploadedFile('cecad.csv', ("\n".join([HEADER] + ROWS) + "\n").encode('utf-8')),
+        )
+        self.addCleanup(os.remove, batch.original_file.path)
+        url = reverse('cecad_batch_resume', args=[batch.pk])
+
+        # Falha com retry agendado: a retomada antecipa o mesmo Job
+        job = jobs.enqueue('cecad.import', {'batch_id': batch.pk}, delay=120)
+        response = self.client.post(url)
+        self.assertRedirects(response, reverse('cecad_import_progress', args=[batch.pk]), fetch_redirect_response=False)
+        self.assertEqual(Job.objects.count(), 1)
+        job.refresh_from_db()
+        self.assertLessEqual(job.run_after, timezone.now())
+
+        # Job ainda rodando: nada é enfileirado
+        Job.objects.filter(pk=job.pk).update(status='running')
+        ImportBatch.objects.filter(pk=batch.pk).update(status='error')
+        self.client.post(url)
+        self.assertEqual(Job.objects.count(), 1)
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, 'error')
+
+        # Sem Job ativo: uma nova tarefa retoma do checkpoint
+        Job.objects.filter(pk=job.pk).update(status='failed')
+        self.client.post(url)
+        self.assertEqual(Job.objects.count(), 2)
+        self.assertTrue(Job.objects.latest('pk').payload['resume'])
+
+
+class ExportJobTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        self.worker = jobs.Worker(worker_id='teste', heartbeat_interval=0)
+
+    def test_exportacao_bsdi_enfileirada_pelo_view(self):
+        batch = ImportBatch.objects.create(description="Lote", status='completed')
+        response = self.client.post(reverse('bsdi:exportacao_gerar'))
+        self.assertRedirects(response, reverse('bsdi:exportacao_list'), fetch_redirect_response=False)
+        exportacao = BSDIExportacao.objects.get()
+        self.assertEqual((exportacao.status, exportacao.import_batch), ('processando', batch))
+
+        job = self.worker.run_once()
+        self.assertEqual((job.task, job.status), ('bsdi.exportar', 'completed'))
+        exportacao.refresh_from_db()
+        self.assertEqual(exportacao.status, 'concluido')
+        self.assertTrue(exportacao.arquivo)
+        os.remove(exportacao.arquivo.path)
+
+    def test_falha_definitiva_marca_exportacao_com_erro(self):
+        batch = ImportBatch.objects.create(description="Lote", status='completed')
+        exportacao = BSDIExportacao.objects.create(import_batch=batch, status='processando')
+        job = jobs.enqueue('bsdi.exportar', {'exportacao_id': exportacao.pk}, max_attempts=1)
+        jobs.claim_next('worker-morto')
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+
+        jobs.recover_stale_jobs()
+        exportacao.refresh_from_db()
+        self.assertEqual(exportacao.status, 'erro')
+        self.assertIn('worker-morto', exportacao.mensagem_erro)
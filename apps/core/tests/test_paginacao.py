@@ -0,0 +1,66 @@
+from datetime import date
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.http import QueryDict
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.cecad.models import Familia
+from apps.core.models import Validacao
+from apps.core.services.paginacao import _ordenacao_total, paginar_por_cursor
+from apps.core.views import ListaAprovadosView
+
+ORDEM = ('-pontuacao_total', 'familia__cod_familiar_fam')
+
+
+class PaginacaoCursorTest(TestCase):
+    def setUp(self):
+        # Pontuações repetidas para exercitar os desempates
+        for n in range(7):
+            familia = Familia.objects.create(cod_familiar_fam=f'{n:02d}', dat_atual_fam=date(2024, 1, 1))
+            Validacao.objects.create(familia=familia, pontuacao_total=(n % 3) * 10, status='aprovado')
+        self.esperado = list(Validacao.objects.order_by(*ORDEM, 'pk'))
+
+    def _pagina(self, querystring=''):
+        return paginar_por_cursor(Validacao.objects.select_related('familia'), ORDEM, 3, QueryDict(querystring))
+
+    def test_percorre_para_frente_e_para_tras(self):
+        paginas = [self._pagina()]
+        while paginas[-1].has_next():
+            paginas.append(self._pagina(paginas[-1].next_querystring))
+
+        self.assertEqual([v for p in paginas for v in p], self.esperado)
+        self.assertEqual([p.start_index() for p in paginas], [1, 4, 7])
+        self.assertFalse(paginas[0].has_previous())
+
+        anterior = self._pagina(paginas[2].previous_querystring)
+        self.assertEqual(list(anterior), self.esperado[3:6])
+        self.assertEqual(anterior.start_index(), 4)
+        self.assertEqual(paginas[1].previous_querystring, '')
+
+    def test_cursor_invalido_volta_para_primeira_pagina(self):
+        self.assertEqual(list(self._pagina('cursor=xyz')), self.esperado[:3])
+
+    def test_ranking_de_aprovados_segue_o_cursor(self):
+        self.client.force_login(User.objects.create_user('operador', password='x'))
+        url = reverse('lista_aprovados')
+        with patch.object(ListaAprovadosView, 'paginate_by', 3):
+            primeira = self.client.get(url)
+            segunda = self.client.get(f"{url}?{primeira.context['page_obj'].next_querystring}")
+
+        self.assertEqual(list(segunda.context['aprovados']), self.esperado[3:6])
+        self.assertEqual(segunda.context['start_rank'], 4)
+        self.assertEqual(segunda.context['total_aprovados'], 7)
+
+    def test_desempate_segue_o_sentido_do_ultimo_campo(self):
+        self.assertEqual(_ordenacao_total(('-dat_atual_fam',)), ['-dat_atual_fam', '-pk'])
+        self.assertEqual(_ordenacao_total(ORDEM), [*ORDEM, 'pk'])
+        self.assertEqual(_ordenacao_total(('-pk',)), ['-pk'])
+
+        # Todas as famílias têm a mesma data: a ordem é a do índice (-dat_atual_fam, -id)
+        ordem = ('-dat_atual_fam',)
+        paginas = [paginar_por_cursor(Familia.objects.all(), ordem, 3, QueryDict())]
+        while paginas[-1].has_next():
+            paginas.append(paginar_por_cursor(Familia.objects.all(), ordem, 3, QueryDict(paginas[-1].next_querystring)))
+        self.assertEqual([f for p in paginas for f in p], list(Familia.objects.order_by('-dat_atual_fam', '-pk')))
@@ -0,0 +1,62 @@
+from datetime import date
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.cecad.models import Familia, ImportBatch, Pessoa
+from apps.core.models import Validacao
+from apps.core.services.familia_stats import FamiliaStatsService
+from apps.core.models import Contador
+from apps.core.services.contadores import incrementar
+from apps.core.services.relatorios_cache import CHAVE_ACERTOS, CHAVE_FALHAS, RelatoriosEmCache, contadores_cache
+
+
+class RelatoriosCacheTest(TestCase):
+    def setUp(self):
+        self.batch = ImportBatch.objects.create(status='completed')
+        self.familia = Familia.objects.create(
+            cod_familiar_fam='1', dat_atual_fam=date(2024, 1, 1), import_batch=self.batch,
+            nom_localidade_fam='Centro',
+        )
+        Pessoa.objects.create(familia=self.familia, num_nis_pessoa_atual='1', nom_pessoa='Maria',
+                              cod_parentesco_rf_pessoa=1, cod_sexo_pessoa='2')
+        self.validacao = Validacao.objects.create(familia=self.familia)
+
+    def _stats(self, **filtros):
+        return RelatoriosEmCache(FamiliaStatsService(import_batch=self.batch, filtros=filtros, um_passo=True))
+
+    def test_reaproveita_por_lote_filtros_e_versao(self):
+        self.assertEqual(self._stats().get_maes_solo()['total'], 1)
+        self.assertEqual(self._stats().get_maes_solo()['total'], 1)
+        # Acerto: leitura da versão e incremento do contador, nenhum relatório recalculado
+        with self.assertNumQueries(2):
+            self.assertEqual(self._stats().get_maes_solo()['total'], 1)
+        self.assertEqual(self._stats(bairro='Vila Nova').get_maes_solo()['total'], 0)
+        self.assertEqual(contadores_cache(), {'acertos': 2, 'falhas': 2, 'taxa_acerto': 50.0})
+
+        self.validacao.status = 'aprovado'
+        self.validacao.save()
+        self.assertEqual(self._stats().get_maes_solo()['aprovados'], 1)
+
+        Pessoa.objects.create(familia=self.familia, num_nis_pessoa_atual='2', nom_pessoa='José',
+                              cod_parentesco_rf_pessoa=2, cod_sexo_pessoa='1')
+        self.assertEqual(self._stats().get_maes_solo()['total'], 0)
+        self.assertEqual(contadores_cache()['falhas'], 4)
+
+    def test_comando_le_os_contadores_compartilhados(self):
+        # Contadores gravados por outros processos (web, workers) chegam pelo banco
+        incrementar(CHAVE_ACERTOS, 3)
+        incrementar(CHAVE_FALHAS)
+
+        saida = StringIO()
+        call_command('cache_relatorios', '--zerar', stdout=saida)
+        self.assertIn('Acertos: 3 | Falhas: 1 | Taxa de acerto: 75.0%', saida.getvalue())
+        self.assertEqual(
+            dict(Contador.objects.filter(chave__in=[CHAVE_ACERTOS, CHAVE_FALHAS]).values_list('chave', 'valor')),
+            {CHAVE_ACERTOS: 0, CHAVE_FALHAS: 0},
+        )
+
+        saida = StringIO()
+        call_command('cache_relatorios', stdout=saida)
+        self.assertIn('Acertos: 0 | Falhas: 0', saida.getvalue())
@@ -0,0 +1,36 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.cecad.models import Familia, ImportBatch, Pessoa
+from apps.core.models import Validacao
+
+
+class RelatoriosExportTest(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('operador', password='x'))
+        lote = ImportBatch.objects.create(status='completed', batch_type='full')
+        for n in range(5):
+            familia = Familia.objects.create(
+                cod_familiar_fam=f'F{n}', dat_atual_fam=date(2024, 1, 1), import_batch=lote,
+                vlr_renda_media_fam=Decimal('100.50'),
+            )
+            Pessoa.objects.create(familia=familia, num_nis_pessoa_atual=f'2{n}', nom_pessoa=f'Filho {n}',
+                                  cod_parentesco_rf_pessoa=3)
+            Pessoa.objects.create(familia=familia, num_nis_pessoa_atual=f'1{n}', nom_pessoa=f'Responsável {n}',
+                                  cod_parentesco_rf_pessoa=1)
+            Validacao.objects.create(familia=familia, status='aprovado' if n else 'reprovado', pontuacao_total=n)
+
+    def test_csv_em_streaming_com_rf_sem_consulta_por_linha(self):
+        response = self.client.get(reverse('relatorios'), {'export': 'aprovados'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="relatorio_aprovados.csv"')
+
+        with self.assertNumQueries(1):
+            linhas = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(linhas[0], '﻿Código Familiar;Responsável;NIS;Renda Per Capita;Status;Pontuação')
+        self.assertEqual(len(linhas), 5)
+        self.assertEqual(linhas[1], 'F4;Responsável 4;14;100.50;Aprovado;4')
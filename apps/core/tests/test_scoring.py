@@ -0,0 +1,77 @@
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+
+from apps.cecad.models import Familia
+from apps.core.models import Categoria, Criterio, Validacao, ValidacaoCriterio
+from apps.core.services.scoring import (
+    pontuacao_categorias_expressions,
+    pontuacao_expression,
+    recalcular_pontuacoes,
+)
+
+
+class ScoringTest(TestCase):
+    def setUp(self):
+        saude = Categoria.objects.create(codigo='saude', nome='Saúde', ordem=1)
+        educacao = Categoria.objects.create(codigo='educacao', nome='Educação', ordem=2)
+        # (categoria, pontos, peso): inclui pesos fracionários e categoria acima de 25
+        definicoes = [
+            (saude, 10, '1.00'), (saude, 7, '1.50'), (saude, 9, '1.33'),
+            (educacao, 100, '0.29'), (educacao, 3, '0.50'),
+            (None, 11, '2.00'), (None, 5, '0.99'),
+        ]
+        # Critérios inativos evitam a propagação automática pela fila
+        self.criterios = [
+            Criterio.objects.create(
+                codigo=f'c{i}', descricao=f'C{i}', categoria=categoria, pontos=pontos,
+                peso=Decimal(peso), ativo=False,
+            )
+            for i, (categoria, pontos, peso) in enumerate(definicoes)
+        ]
+        # Cada validação atende a um subconjunto diferente dos critérios
+        self.validacoes = []
+        for n in range(2 ** 4):
+            familia = Familia.objects.create(cod_familiar_fam=str(n), dat_atual_fam=date(2024, 1, 1))
+            validacao = Validacao.objects.create(familia=familia)
+            for i, criterio in enumerate(self.criterios):
+                ValidacaoCriterio.objects.create(
+                    validacao=validacao, criterio=criterio, atendido=bool((n * 5 + i) % 3)
+                )
+            self.validacoes.append(validacao)
+
+    def test_pontuacao_no_banco_igual_ao_calculo_python(self):
+        anotadas = Validacao.objects.annotate(pontuacao=pontuacao_expression()).order_by('pk')
+        self.assertEqual(
+            [v.pontuacao for v in anotadas],
+            [v.calcular_pontuacao() for v in self.validacoes],
+        )
+
+        categorias = pontuacao_categorias_expressions()
+        for validacao in Validacao.objects.annotate(**{f'cat_{k}': e for k, e in categorias.items()}):
+            detalhes = validacao.get_pontuacao_detalhada()
+            for categoria_id in categorias:
+                esperado = detalhes.get(categoria_id, {'total': 0})['total']
+                self.assertEqual(getattr(validacao, f'cat_{categoria_id}'), esperado)
+
+    def test_peso_trunca_como_float(self):
+        # 100 * float(0.29) = 28.999999999999996: a regra original dá 28, não 29
+        criterio = self.criterios[3]
+        validacao = self.validacoes[0]
+        validacao.criterios_avaliados.update(atendido=False)
+        validacao.criterios_avaliados.filter(criterio=criterio).update(atendido=True)
+
+        self.assertEqual(validacao.calcular_pontuacao(), 25)
+        self.assertEqual(validacao.get_pontuacao_detalhada()[criterio.categoria_id]['total'], 28)
+        categorias = pontuacao_categorias_expressions()
+        anotada = Validacao.objects.annotate(total=categorias[criterio.categoria_id]).get(pk=validacao.pk)
+        self.assertEqual(anotada.total, 28)
+
+    def test_recalcular_atualiza_somente_pontuacoes_alteradas(self):
+        Validacao.objects.filter(pk=self.validacoes[0].pk).update(pontuacao_total=self.validacoes[0].calcular_pontuacao())
+        self.assertEqual(recalcular_pontuacoes(Validacao.objects.all()), len(self.validacoes) - 1)
+        for validacao in Validacao.objects.all():
+            self.assertEqual(validacao.pontuacao_total, validacao.calcular_pontuacao())
+
+        self.assertEqual(recalcular_pontuacoes([v.pk for v in self.validacoes]), 0)
@@ -1,7 +1,7 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
 from apps.core.views import (
-    home, DashboardView, FilaValidacaoView, ValidacaoDetailView, ValidacaoViewOnlyView, RelatoriosView,
+    home, DashboardView, FilaValidacaoView, ProximaValidacaoView, ValidacaoDetailView, ValidacaoViewOnlyView, RelatoriosView,
     CriterioListView, CriterioCreateView, CriterioUpdateView, CriterioDeleteView, ConfiguracaoView,
     ListaAprovadosView, ValidacaoTransferView, ValidacaoEditView, RelatoriosFamiliasView
 )
@@ -10,6 +10,7 @@ urlpatterns = [
     path('', home, name='home'),
     path('dashboard/', DashboardView.as_view(), name='dashboard'),
     path('fila/', FilaValidacaoView.as_view(), name='fila_validacao'),
+    path('fila/proxima/', ProximaValidacaoView.as_view(), name='validacao_proxima'),
     path('relatorios/', RelatoriosView.as_view(), name='relatorios'),
     path('relatorios/familias/', RelatoriosFamiliasView.as_view(), name='relatorios-familias'),
     path('aprovados/', ListaAprovadosView.as_view(), name='lista_aprovados'),
@@ -1,10 +1,19 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.views.generic import TemplateView, ListView, DetailView
+from django.views.generic import TemplateView, ListView, DetailView, View
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
-from django.db.models import Count, Q
+from django.db.models import Q
 from apps.cecad.models import Familia, ImportBatch
-from apps.core.models import Validacao, Criterio, ValidacaoCriterio, DocumentoValidacao
+from apps.cecad.services.busca import familia_com_membro_nome
+from apps.cecad.services.domicilios import qtde_familias_domicilio
+from apps.cecad.services.lote_atual import lote_atual
+from apps.core.models import Validacao, Criterio, ValidacaoCriterio, DocumentoValidacao, EstatisticaLote
+from apps.core.services.dashboard import snapshot_dashboard
+from apps.core.services.estatisticas_lote import EstatisticasComposicao, reconstruir_todas_estatisticas
+from apps.core.services.fila_validacao import reservar_proxima, validacoes_da_fila
+from apps.core.services.versao_dados import incrementar_versao_validacoes
+from apps.core.services.paginacao import PaginacaoCursorMixin
+from apps.core.services.relatorios_cache import RelatoriosEmCache
 
 class DashboardView(LoginRequiredMixin, TemplateView):
     template_name = 'core/dashboard.html'
@@ -12,111 +21,23 @@ class DashboardView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Get latest completed batch
-        latest_batch = ImportBatch.objects.filter(status='completed').order_by('-imported_at').first()
+        # Lote atual (última importação completa)
+        latest_batch = lote_atual()
         context['latest_batch'] = latest_batch
-
-        # Filtro que inclui famílias do último lote OU famílias manuais (sem lote)
-        if latest_batch:
-            familia_filter = Q(import_batch=latest_batch) | Q(import_batch__isnull=True)
-            validacao_filter = Q(familia__import_batch=latest_batch) | Q(familia__import_batch__isnull=True)
-        else:
-            familia_filter = Q(import_batch__isnull=True)
-            validacao_filter = Q(familia__import_batch__isnull=True)
-        
-        context['total_familias'] = Familia.objects.filter(familia_filter).count()
-        validacoes = Validacao.objects.filter(validacao_filter)
-        context['validacoes_pendentes'] = validacoes.filter(status='pendente').count()
-        context['validacoes_aprovadas'] = validacoes.filter(status='aprovado').count()
-        context['validacoes_reprovadas'] = validacoes.filter(status='reprovado').count()
-
-        # 1. Distribuição de status (para gráfico de pizza/barras)
-        context['grafico_status'] = {
-            'pendente': context['validacoes_pendentes'],
-            'aprovado': context['validacoes_aprovadas'],
-            'reprovado': context['validacoes_reprovadas'],
-        }
-
-        if latest_batch:
-            # 2. Evolução temporal dos lotes (últimos 6 lotes)
-            ultimos_lotes = ImportBatch.objects.filter(status='completed').order_by('-imported_at')[:6]
-            lotes_labels = [lote.imported_at.strftime('%d/%m') for lote in ultimos_lotes][::-1]
-            lotes_validados = [Validacao.objects.filter(familia__import_batch=lote, status='aprovado').count() for lote in ultimos_lotes][::-1]
-            lotes_reprovados = [Validacao.objects.filter(familia__import_batch=lote, status='reprovado').count() for lote in ultimos_lotes][::-1]
-            context['grafico_lotes'] = {
-                'labels': lotes_labels,
-                'aprovados': lotes_validados,
-                'reprovados': lotes_reprovados,
-            }
-
-            # 3. Perfil das famílias aprovadas (faixa de renda) - inclui famílias manuais
-            from django.db.models import F
-            faixas = [0, 100, 200, 300, 400, 600, 1000, 999999]
-            faixas_labels = [
-                'Até R$100', 'R$100-200', 'R$200-300', 'R$300-400', 'R$400-600', 'R$600-1000', 'Acima de R$1000'
-            ]
-            aprovadas = Familia.objects.filter(familia_filter, validacoes__status='aprovado')
-            renda_faixa = [
-                aprovadas.filter(vlr_renda_media_fam__gte=faixas[i], vlr_renda_media_fam__lt=faixas[i+1]).count()
-                for i in range(len(faixas)-1)
-            ]
-            context['grafico_renda'] = {
-                'labels': faixas_labels,
-                'valores': renda_faixa,
-            }
-
-            # 4. Composição familiar (número de membros das famílias aprovadas)
-            membros_familias = aprovadas.annotate(num_membros=Count('membros')).values_list('num_membros', flat=True)
-            from collections import Counter
-            membros_count = Counter(membros_familias)
-            membros_labels = sorted(membros_count.keys())
-            membros_valores = [membros_count[n] for n in membros_labels]
-            context['grafico_membros'] = {
-                'labels': [str(n) + ' membros' for n in membros_labels],
-                'valores': membros_valores,
-            }
-
-            # 5. Critérios mais determinantes (top 5 critérios mais reprovados) - inclui famílias manuais
-            # Filtro para ValidacaoCriterio precisa passar por validacao__familia
-            validacao_criterio_filter = Q(validacao__familia__import_batch=latest_batch) | Q(validacao__familia__import_batch__isnull=True)
-            criterios_reprovados = ValidacaoCriterio.objects.filter(
-                validacao_criterio_filter,
-                atendido=False,
-                aplicavel=True
-            ).values('criterio__descricao').annotate(qtd=Count('id')).order_by('-qtd')[:5]
-            context['grafico_criterios'] = {
-                'labels': [c['criterio__descricao'] for c in criterios_reprovados],
-                'valores': [c['qtd'] for c in criterios_reprovados],
-            }
-        else:
-            context['grafico_lotes'] = {'labels': [], 'aprovados': [], 'reprovados': []}
-            context['grafico_renda'] = {'labels': [], 'valores': []}
-            context['grafico_membros'] = {'labels': [], 'valores': []}
-            context['grafico_criterios'] = {'labels': [], 'valores': []}
-        
+        # Contagens e gráficos: snapshot agregado em cache (services/dashboard.py)
+        context.update(snapshot_dashboard(latest_batch))
         return context
 
-class FilaValidacaoView(LoginRequiredMixin, ListView):
+class FilaValidacaoView(LoginRequiredMixin, PaginacaoCursorMixin, ListView):
     model = Validacao
     template_name = 'core/fila_validacao.html'
     context_object_name = 'validacoes'
     paginate_by = 20
+    keyset_ordering = ('pk',)
 
     def get_queryset(self):
-        # Filter by latest batch OR families without batch (manual entries)
-        latest_batch = ImportBatch.objects.filter(status='completed', batch_type='full').first()
-        
-        # Include families from latest batch OR families without import_batch (manual entries)
-        queryset = Validacao.objects.select_related('familia')
-        
-        if latest_batch:
-            # Famílias do último lote completo OU famílias cadastradas manualmente (sem lote)
-            queryset = queryset.filter(
-                Q(familia__import_batch=latest_batch) | Q(familia__import_batch__isnull=True)
-            )
-        else:
-            # Se não há lote, mostrar apenas famílias manuais
-            queryset = queryset.filter(familia__import_batch__isnull=True)
+        # Famílias do último lote completo OU famílias cadastradas manualmente (sem lote)
+        queryset = validacoes_da_fila().select_related('familia', 'familia__rf_pessoa')
         
         status = self.request.GET.get('status')
         if status and status != 'todos':
@@ -139,8 +60,8 @@ class FilaValidacaoView(LoginRequiredMixin, ListView):
         if search_query:
             queryset = queryset.filter(
                 Q(familia__cod_familiar_fam__icontains=search_query) |
-                Q(familia__membros__nom_pessoa__icontains=search_query)
-            ).distinct()
+                familia_com_membro_nome(search_query, 'familia_id')
+            )
         
         return queryset
 
@@ -149,6 +70,17 @@ class FilaValidacaoView(LoginRequiredMixin, ListView):
             return ['core/partials/lista_validacao.html']
         return ['core/fila_validacao.html']
 
+class ProximaValidacaoView(LoginRequiredMixin, View):
+    """Reserva a próxima validação livre da fila para o operador e abre a avaliação."""
+
+    def post(self, request, *args, **kwargs):
+        validacao = reservar_proxima(request.user)
+        if validacao is None:
+            messages.info(request, 'Nenhuma validação disponível na fila no momento.')
+            return redirect('fila_validacao')
+        return redirect('validacao_detail', pk=validacao.pk)
+
+
 class ValidacaoDetailView(LoginRequiredMixin, DetailView):
     model = Validacao
     template_name = 'core/validacao_detail.html'
@@ -158,9 +90,10 @@ class ValidacaoDetailView(LoginRequiredMixin, DetailView):
         """Verifica se a validação está disponível antes de exibir."""
         self.object = self.get_object()
         
-        # Verificar se está disponível para o usuário atual
-        if not self.object.is_disponivel_para_usuario(request.user, timeout_minutos=30):
-            # Validação bloqueada por outro usuário
+        # Reservar para o usuário atual (livre, já dele ou com lock expirado) de forma atômica
+        if not self.object.reservar_avaliacao(request.user):
+            # Validação bloqueada por outro usuário (recarregada: pode ter sido reservada agora)
+            self.object.refresh_from_db(fields=['em_avaliacao_por'])
             messages.warning(
                 request,
                 f'Esta validação está sendo avaliada por {self.object.em_avaliacao_por.username}. '
@@ -173,9 +106,6 @@ class ValidacaoDetailView(LoginRequiredMixin, DetailView):
         if CriteriaAssociator.associate_criteria(self.object) > 0:
             self.object.atualizar_pontuacao()
         
-        # Se está disponível, iniciar/renovar a avaliação
-        self.object.iniciar_avaliacao(request.user)
-        
         # Continuar normalmente
         context = self.get_context_data(object=self.object)
         return self.render_to_response(context)
@@ -202,8 +132,10 @@ class ValidacaoDetailView(LoginRequiredMixin, DetailView):
         context['criterios_por_categoria'] = dict(criterios_por_categoria)
         context['criterios'] = criterios_avaliados  # Manter para compatibilidade
         
-        # Pontuação detalhada
+        # Pontuação detalhada (os subtotais ficam na sessão para o autosave incremental)
+        from apps.core.services.scoring import subtotais_de_detalhes
         context['pontuacao_detalhada'] = self.object.get_pontuacao_detalhada()
+        self._guardar_subtotais(subtotais_de_detalhes(context['pontuacao_detalhada']))
         
         # Adicionar Responsável Familiar ao contexto
         context['responsavel_familiar'] = self.object.familia.get_responsavel_familiar()
@@ -212,30 +144,8 @@ class ValidacaoDetailView(LoginRequiredMixin, DetailView):
         # Membros ordenados (RF primeiro)
         context['membros_ordenados'] = self.object.familia.membros.all().order_by('cod_parentesco_rf_pessoa', 'nom_pessoa')
         
-        # Calcular quantidade de famílias no domicílio
-        # Domicílio é identificado pelos primeiros 8 dígitos do código familiar
-        cod_domicilio = self.object.familia.cod_familiar_fam[:8]
-        
-        # Para famílias manuais (sem lote), buscar entre todas famílias manuais
-        # Para famílias importadas, buscar no mesmo lote OU entre famílias manuais
-        if self.object.familia.import_batch:
-            context['qtde_familias_domicilio'] = Familia.objects.filter(
-                Q(import_batch=self.object.familia.import_batch) | Q(import_batch__isnull=True),
-                cod_familiar_fam__startswith=cod_domicilio
-            ).count()
-        else:
-            # Família manual: buscar apenas entre famílias manuais ou do último lote
-            latest_batch = ImportBatch.objects.filter(status='completed', batch_type='full').first()
-            if latest_batch:
-                context['qtde_familias_domicilio'] = Familia.objects.filter(
-                    Q(import_batch=latest_batch) | Q(import_batch__isnull=True),
-                    cod_familiar_fam__startswith=cod_domicilio
-                ).count()
-            else:
-                context['qtde_familias_domicilio'] = Familia.objects.filter(
-                    import_batch__isnull=True,
-                    cod_familiar_fam__startswith=cod_domicilio
-                ).count()
+        # Famílias no mesmo domicílio (8 primeiros dígitos do código familiar)
+        context['qtde_familias_domicilio'] = qtde_familias_domicilio(self.object.familia)
         
         return context
 
@@ -255,9 +165,15 @@ class ValidacaoDetailView(LoginRequiredMixin, DetailView):
             )
             return redirect('fila_validacao')
         
+        # Autosave HTMX: apenas os critérios alterados, com pontuação incremental
+        if action == 'save_criteria' and request.headers.get('HX-Request') and request.POST.get('alterados'):
+            return self._autosave_incremental(request)
+        
         if action in ['save_criteria', 'finalize']:
             # DEBUG: Print POST data
             print(f"DEBUG: Action={action}, POST keys={list(request.POST.keys())}")
+            # Subtotais guardados na sessão deixam de valer após o recálculo completo
+            request.session.pop(self._chave_subtotais(), None)
             
             # Primeiro, resetar todos os critérios para atendido=False
             # (checkboxes desmarcados não enviam dados no POST)
@@ -344,6 +260,67 @@ class ValidacaoDetailView(LoginRequiredMixin, DetailView):
         
         return redirect('validacao_detail', pk=self.object.pk)
 
+    def _chave_subtotais(self):
+        return f'pontuacao_subtotais_{self.object.pk}'
+
+    def _guardar_subtotais(self, subtotais):
+        # Os subtotais valem para esta versão da validação (updated_at)
+        self.request.session[self._chave_subtotais()] = {
+            'updated_at': self.object.updated_at.isoformat(),
+            'subtotais': subtotais,
+        }
+
+    def _subtotais_guardados(self):
+        """
+        Subtotais da sessão, ou None se a validação mudou desde que foram
+        guardados (outro operador, recálculo de pontuações, peso de critério).
+        """
+        guardado = self.request.session.get(self._chave_subtotais()) or {}
+        if guardado.get('updated_at') != self.object.updated_at.isoformat():
+            return None
+        return guardado['subtotais']
+
+    def _autosave_incremental(self, request):
+        """
+        Grava só os critérios listados em `alterados` e ajusta a pontuação a
+        partir dos subtotais por categoria guardados na sessão, sem recalcular
+        todos os critérios da validação.
+        """
+        from django.http import HttpResponse
+        import json
+        from apps.core.services.scoring import (
+            aplicar_alteracoes_criterios, detalhes_de_subtotais,
+            pontuacao_de_subtotais, subtotais_de_detalhes,
+        )
+        
+        try:
+            alterados = {int(c) for c in request.POST['alterados'].split(',') if c.strip()}
+        except ValueError:
+            return HttpResponse(status=400)
+        marcados = {c for c in alterados if f'criterio_{c}' in request.POST}
+        
+        subtotais = self._subtotais_guardados()
+        if subtotais is None:
+            subtotais = subtotais_de_detalhes(self.object.get_pontuacao_detalhada())
+        subtotais = aplicar_alteracoes_criterios(self.object, marcados, alterados - marcados, subtotais)
+        
+        self.object.pontuacao_total = pontuacao_de_subtotais(subtotais)
+        self.object.status = 'em_analise'
+        observacoes = request.POST.get('observacoes', '')
+        if observacoes:
+            self.object.observacoes = observacoes
+        self.object.save(update_fields=['pontuacao_total', 'status', 'observacoes', 'updated_at'])
+        self._guardar_subtotais(subtotais)
+        
+        response = HttpResponse(status=204)
+        response['HX-Trigger'] = json.dumps({
+            'autoSaved': {
+                'pontuacao': self.object.pontuacao_total,
+                'detalhes': detalhes_de_subtotais(subtotais)
+            }
+        })
+        return response
+
 
 class ConfiguracaoView(LoginRequiredMixin, TemplateView):
     template_name = 'core/configuracao.html'
@@ -384,6 +361,8 @@ class ConfiguracaoView(LoginRequiredMixin, TemplateView):
             
             msg = 'Configurações atualizadas com sucesso!'
             if downgraded > 0 or upgraded > 0:
+                incrementar_versao_validacoes()
+                reconstruir_todas_estatisticas()
                 msg += f' Reavaliação: {downgraded} reprovados e {upgraded} aprovados pelo novo critério.'
             
             messages.success(request, msg)
@@ -394,18 +373,21 @@ class ConfiguracaoView(LoginRequiredMixin, TemplateView):
         return render(request, self.template_name, context)
 
 
-class ListaAprovadosView(LoginRequiredMixin, ListView):
+class ListaAprovadosView(LoginRequiredMixin, PaginacaoCursorMixin, ListView):
     model = Validacao
     template_name = 'core/lista_aprovados.html'
     context_object_name = 'aprovados'
     paginate_by = 50
+    keyset_ordering = ('-pontuacao_total', 'familia__cod_familiar_fam')
+    # O total de aprovados é exibido no cabeçalho e precisa ser exato
+    keyset_count_aproximado = False
 
     def get_queryset(self):
         # Filter by latest batch OR families without batch (manual entries)
-        latest_batch = ImportBatch.objects.filter(status='completed', batch_type='full').first()
+        latest_batch = lote_atual()
         
         # Include families from latest batch OR families without import_batch (manual entries)
-        queryset = Validacao.objects.select_related('familia')
+        queryset = Validacao.objects.select_related('familia', 'familia__rf_pessoa')
         
         if latest_batch:
             queryset = queryset.filter(
@@ -421,9 +403,7 @@ class ListaAprovadosView(LoginRequiredMixin, ListView):
         # Search by person name
         search_query = self.request.GET.get('q', '').strip()
         if search_query:
-            queryset = queryset.filter(
-                Q(familia__membros__nom_pessoa__icontains=search_query)
-            ).distinct()
+            queryset = queryset.filter(familia_com_membro_nome(search_query, 'familia_id'))
 
         return queryset.order_by('-pontuacao_total', 'familia__cod_familiar_fam')
 
@@ -433,13 +413,13 @@ class ListaAprovadosView(LoginRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
         config = Configuracao.get_solo()
         
-        # Calculate rank offset for pagination
+        # Posição da primeira linha da página (o cursor carrega a posição)
         page = context.get('page_obj')
-        start_rank = (page.number - 1) * self.paginate_by + 1 if page else 1
+        start_rank = page.start_index() if page else 1
         
         context['start_rank'] = start_rank
         context['vagas_disponiveis'] = config.quantidade_vagas
-        context['total_aprovados'] = self.get_queryset().count()
+        context['total_aprovados'] = page.count if page else self.get_queryset().count()
         context['search_query'] = self.request.GET.get('q', '')
         
         return context
@@ -465,29 +445,8 @@ class ValidacaoViewOnlyView(LoginRequiredMixin, DetailView):
         # Membros ordenados (RF primeiro)
         context['membros_ordenados'] = self.object.familia.membros.all().order_by('cod_parentesco_rf_pessoa', 'nom_pessoa')
         
-        # Calcular quantidade de famílias no domicílio
-        cod_domicilio = self.object.familia.cod_familiar_fam[:8]
-        
-        # Para famílias manuais (sem lote), buscar entre todas famílias manuais
-        # Para famílias importadas, buscar no mesmo lote OU entre famílias manuais
-        if self.object.familia.import_batch:
-            context['qtde_familias_domicilio'] = Familia.objects.filter(
-                Q(import_batch=self.object.familia.import_batch) | Q(import_batch__isnull=True),
-                cod_familiar_fam__startswith=cod_domicilio
-            ).count()
-        else:
-            # Família manual: buscar apenas entre famílias manuais ou do último lote
-            latest_batch = ImportBatch.objects.filter(status='completed', batch_type='full').first()
-            if latest_batch:
-                context['qtde_familias_domicilio'] = Familia.objects.filter(
-                    Q(import_batch=latest_batch) | Q(import_batch__isnull=True),
-                    cod_familiar_fam__startswith=cod_domicilio
-                ).count()
-            else:
-                context['qtde_familias_domicilio'] = Familia.objects.filter(
-                    import_batch__isnull=True,
-                    cod_familiar_fam__startswith=cod_domicilio
-                ).count()
+        # Famílias no mesmo domicílio (8 primeiros dígitos do código familiar)
+        context['qtde_familias_domicilio'] = qtde_familias_domicilio(self.object.familia)
         
         # Adicionar histórico de edições
         context['historico'] = self.object.historico_edicoes.select_related(
@@ -497,19 +456,20 @@ class ValidacaoViewOnlyView(LoginRequiredMixin, DetailView):
         return context
 
 
-class RelatoriosView(LoginRequiredMixin, ListView):
+class RelatoriosView(LoginRequiredMixin, PaginacaoCursorMixin, ListView):
     model = Validacao
     template_name = 'core/relatorios.html'
     context_object_name = 'validacoes'
     paginate_by = 50
+    keyset_ordering = ('-pontuacao_total', 'familia__cod_familiar_fam')
 
     def get_base_queryset(self):
         """Retorna queryset base sem paginação para uso em exportações."""
         # Filter by latest batch OR families without batch (manual entries)
-        latest_batch = ImportBatch.objects.filter(status='completed', batch_type='full').first()
+        latest_batch = lote_atual()
         
         # Include families from latest batch OR families without import_batch (manual entries)
-        queryset = Validacao.objects.select_related('familia').prefetch_related('familia__membros')
+        queryset = Validacao.objects.select_related('familia', 'familia__rf_pessoa').prefetch_related('familia__membros')
         
         if latest_batch:
             queryset = queryset.filter(
@@ -535,9 +495,7 @@ class RelatoriosView(LoginRequiredMixin, ListView):
         # Search by person name
         search_query = self.request.GET.get('q', '').strip()
         if search_query:
-            queryset = queryset.filter(
-                Q(familia__membros__nom_pessoa__icontains=search_query)
-            ).distinct()
+            queryset = queryset.filter(familia_com_membro_nome(search_query, 'familia_id'))
         
         return queryset.order_by('-pontuacao_total', 'familia__cod_familiar_fam')
     
@@ -549,7 +507,7 @@ class RelatoriosView(LoginRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
         
         # Statistics (filtered by latest batch OR manual families)
-        latest_batch = ImportBatch.objects.filter(status='completed', batch_type='full').first()
+        latest_batch = lote_atual()
         if latest_batch:
             all_validacoes = Validacao.objects.filter(
                 Q(familia__import_batch=latest_batch) | Q(familia__import_batch__isnull=True)
@@ -580,8 +538,13 @@ class RelatoriosView(LoginRequiredMixin, ListView):
         return super().get(request, *args, **kwargs)
 
     def export_csv(self, validacoes, export_type='todos'):
+        """
+        CSV em streaming: o cabeçalho sai antes da consulta e as linhas são
+        lidas em blocos (iterator), sem montar o arquivo nem instâncias na
+        memória. O responsável vem do RF denormalizado da família (JOIN).
+        """
         import csv
-        from django.http import HttpResponse
+        from django.http import StreamingHttpResponse
         
         # Filtrar validações por tipo de exportação
         if export_type == 'aprovados':
@@ -593,37 +556,55 @@ class RelatoriosView(LoginRequiredMixin, ListView):
         else:
             filename = 'relatorio_todos.csv'
         
-        response = HttpResponse(content_type='text/csv; charset=utf-8-sig')
+        linhas = validacoes.prefetch_related(None).values_list(
+            'familia__cod_familiar_fam',
+            'familia__rf_pessoa__nom_pessoa',
+            'familia__rf_pessoa__num_nis_pessoa_atual',
+            'familia__vlr_renda_media_fam',
+            'status',
+            'pontuacao_total',
+        )
+        status_display = dict(Validacao.STATUS_CHOICES)
+        
+        def gerar():
+            # Usar ponto e vírgula como delimitador
+            writer = csv.writer(_LinhaCSV(), delimiter=';')
+            # BOM UTF-8 (uma vez) para Excel reconhecer acentuação
+            yield ('\ufeff' + writer.writerow([
+                'Código Familiar',
+                'Responsável',
+                'NIS',
+                'Renda Per Capita',
+                'Status',
+                'Pontuação'
+            ])).encode('utf-8')
+            for cod_familiar, nome, nis, renda, status, pontuacao in linhas.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                yield writer.writerow([
+                    cod_familiar,
+                    nome or '-',
+                    nis or '-',
+                    renda,
+                    status_display.get(status, status),
+                    pontuacao
+                ]).encode('utf-8')
+        
+        # Bytes já codificados: com charset utf-8-sig o Django repetiria o BOM em cada bloco
+        response = StreamingHttpResponse(gerar(), content_type='text/csv; charset=utf-8')
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        # Adicionar BOM UTF-8 para Excel reconhecer acentuação
-        response.write('\ufeff')
-        
-        # Usar ponto e vírgula como delimitador
-        writer = csv.writer(response, delimiter=';')
-        writer.writerow([
-            'Código Familiar',
-            'Responsável',
-            'NIS',
-            'Renda Per Capita',
-            'Status',
-            'Pontuação'
-        ])
-        
-        for validacao in validacoes:
-            responsavel = validacao.familia.membros.first()
-            writer.writerow([
-                validacao.familia.cod_familiar_fam,
-                responsavel.nom_pessoa if responsavel else '-',
-                responsavel.num_nis_pessoa_atual if responsavel else '-',
-                validacao.familia.vlr_renda_media_fam,
-                validacao.get_status_display(),
-                validacao.pontuacao_total
-            ])
-        
         return response
 
 
+# Linhas lidas do banco por vez nas exportações em streaming
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _LinhaCSV:
+    """Pseudo-arquivo para csv.writer: writerow devolve a linha formatada."""
+
+    def write(self, valor):
+        return valor
+
+
 def home(request):
     if request.user.is_authenticated:
         return redirect('dashboard')
@@ -723,7 +704,10 @@ class CriterioCreateView(LoginRequiredMixin, TemplateView):
                 idade_maxima=idade_maxima,
                 sexo_necessario=sexo_necessario
             )
-            messages.success(request, f'Critério "{descricao}" criado com sucesso!')
+            mensagem = f'Critério "{descricao}" criado com sucesso!'
+            if ativo:
+                mensagem += ' As validações existentes serão atualizadas em segundo plano.'
+            messages.success(request, mensagem)
             return redirect('criterio_list')
         except Categoria.DoesNotExist:
             messages.error(request, 'Categoria inválida!')
@@ -953,29 +937,8 @@ class ValidacaoEditView(LoginRequiredMixin, DetailView):
         # Membros ordenados (RF primeiro)
         context['membros_ordenados'] = self.object.familia.membros.all().order_by('cod_parentesco_rf_pessoa', 'nom_pessoa')
         
-        # Calcular quantidade de famílias no domicílio
-        cod_domicilio = self.object.familia.cod_familiar_fam[:8]
-        
-        # Para famílias manuais (sem lote), buscar entre todas famílias manuais
-        # Para famílias importadas, buscar no mesmo lote OU entre famílias manuais
-        if self.object.familia.import_batch:
-            context['qtde_familias_domicilio'] = Familia.objects.filter(
-                Q(import_batch=self.object.familia.import_batch) | Q(import_batch__isnull=True),
-                cod_familiar_fam__startswith=cod_domicilio
-            ).count()
-        else:
-            # Família manual: buscar apenas entre famílias manuais ou do último lote
-            latest_batch = ImportBatch.objects.filter(status='completed', batch_type='full').first()
-            if latest_batch:
-                context['qtde_familias_domicilio'] = Familia.objects.filter(
-                    Q(import_batch=latest_batch) | Q(import_batch__isnull=True),
-                    cod_familiar_fam__startswith=cod_domicilio
-                ).count()
-            else:
-                context['qtde_familias_domicilio'] = Familia.objects.filter(
-                    import_batch__isnull=True,
-                    cod_familiar_fam__startswith=cod_domicilio
-                ).count()
+        # Famílias no mesmo domicílio (8 primeiros dígitos do código familiar)
+        context['qtde_familias_domicilio'] = qtde_familias_domicilio(self.object.familia)
         
         return context
     
@@ -1120,10 +1083,8 @@ class RelatoriosFamiliasView(LoginRequiredMixin, TemplateView):
             return self.export_excel(export)
         return super().get(request, *args, **kwargs)
     
-    def _get_stats_service(self):
-        """Retorna instância de FamiliaStatsService com filtros aplicados."""
-        from apps.core.services.familia_stats import FamiliaStatsService
-        
+    def _get_filtros(self):
+        """Retorna (import_batch, filtros) a partir dos parâmetros da requisição."""
         bairro = self.request.GET.get('bairro', '')
         import_batch_id = self.request.GET.get('import_batch', '')
         
@@ -1131,14 +1092,19 @@ class RelatoriosFamiliasView(LoginRequiredMixin, TemplateView):
             if import_batch_id:
                 import_batch = ImportBatch.objects.get(id=import_batch_id)
             else:
-                import_batch = ImportBatch.objects.filter(
-                    status='completed'
-                ).order_by('-imported_at').first()
+                import_batch = lote_atual()
         except ImportBatch.DoesNotExist:
             import_batch = None
         
         filtros = {'bairro': bairro} if bairro else {}
-        return FamiliaStatsService(import_batch=import_batch, filtros=filtros)
+        return import_batch, filtros
+
+    def _get_stats_service(self):
+        """Retorna FamiliaStatsService (em cache) com filtros aplicados (exportação)."""
+        from apps.core.services.familia_stats import FamiliaStatsService
+        
+        import_batch, filtros = self._get_filtros()
+        return RelatoriosEmCache(FamiliaStatsService(import_batch=import_batch, filtros=filtros, um_passo=True))
     
     def export_excel(self, categoria: str):
         """Exporta relatório em Excel."""
@@ -1161,7 +1127,9 @@ class RelatoriosFamiliasView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        stats = self._get_stats_service()
+        # Contagens a partir das estatísticas pré-agregadas por lote
+        import_batch, filtros = self._get_filtros()
+        stats = RelatoriosEmCache(EstatisticasComposicao(import_batch=import_batch, filtros=filtros))
         
         # Adicionar relatórios ao contexto
         context.update({
@@ -1175,11 +1143,9 @@ class RelatoriosFamiliasView(LoginRequiredMixin, TemplateView):
                 status='completed'
             ).order_by('-imported_at'),
             'import_batch_selecionado': stats.import_batch,
-            'bairros': Familia.objects.exclude(
-                nom_localidade_fam__isnull=True
-            ).exclude(
-                nom_localidade_fam=''
-            ).values_list('nom_localidade_fam', flat=True).distinct().order_by('nom_localidade_fam'),
+            'bairros': EstatisticaLote.objects.exclude(
+                bairro=''
+            ).values_list('bairro', flat=True).distinct().order_by('bairro'),
             'bairro_filtro': stats.filtros.get('bairro', ''),
         })
         
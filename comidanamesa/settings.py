@@ -90,6 +90,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'apps.cecad.context_processors.lote_atual',
             ],
         },
     },
@@ -196,6 +197,25 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_REDIRECT_URL = '/'
 LOGIN_URL = '/login/'
 
+# Importação CECAD
+# Número de processos usados na importação completa (1 = sem paralelismo).
+# O paralelismo só é aplicado em bancos com escrita concorrente (PostgreSQL).
+CECAD_IMPORT_WORKERS = int(os.getenv('CECAD_IMPORT_WORKERS', '1'))
+
+# Fila de tarefas em segundo plano (manage.py run_workers)
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '2'))
+JOB_HEARTBEAT_INTERVAL = float(os.getenv('JOB_HEARTBEAT_INTERVAL', '10'))
+# Tarefas em execução sem sinal do worker por esse tempo são consideradas interrompidas
+JOB_STALE_AFTER = int(os.getenv('JOB_STALE_AFTER', '120'))
+# Intervalo (segundos) entre as varreduras de locks de avaliação expirados feitas pelos workers
+VALIDACAO_LOCK_SWEEP_INTERVAL = int(os.getenv('VALIDACAO_LOCK_SWEEP_INTERVAL', '300'))
+# Validade (segundos) do lote atual em cache; limita o atraso entre processos com cache local
+CECAD_LOTE_ATUAL_CACHE_TIMEOUT = int(os.getenv('CECAD_LOTE_ATUAL_CACHE_TIMEOUT', '60'))
+# Validade (segundos) do snapshot do dashboard; mudanças de status geram um snapshot novo antes disso
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', '300'))
+# Validade (segundos) dos relatórios de composição familiar em cache (services/relatorios_cache.py)
+FAMILIA_STATS_CACHE_TIMEOUT = int(os.getenv('FAMILIA_STATS_CACHE_TIMEOUT', '600'))
+
 # Configuração de Upload
 # Permitir uploads de até 100MB (em bytes) para corresponder ao Nginx
 DATA_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100 MB
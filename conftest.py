@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def limpar_caches():
+    """Lote atual e snapshots ficam em cache entre requisições; cada teste começa sem eles."""
+    from django.core.cache import cache
+
+    from apps.cecad.services.lote_atual import invalidar_lote_atual
+
+    cache.clear()
+    invalidar_lote_atual()
@@ -410,3 +410,51 @@ class FamiliaStatsServiceTestCase(TestCase):
         self.assertEqual(result_casal['total'], 0)
         self.assertEqual(result_filhos['2']['total'], 0)
         self.assertEqual(len(result_bairro), 0)
+
+    def test_um_passo_equivale_e_usa_uma_consulta(self):
+        """Teste: Modo um_passo retorna os mesmos dicionários com uma única consulta."""
+        self._criar_familia_com_pessoas(
+            'FAM020',
+            [{'nome': 'Maria', 'parentesco': 1, 'sexo': '2'}],
+            bairro='Bairro A',
+            status_validacao='aprovado'
+        )
+        self._criar_familia_com_pessoas(
+            'FAM021',
+            [
+                {'nome': 'João', 'parentesco': 1, 'sexo': '1'},
+                {'nome': 'Ana', 'parentesco': 2, 'sexo': '2'},
+            ],
+            bairro='Bairro B',
+            status_validacao='reprovado'
+        )
+        self._criar_familia_com_pessoas(
+            'FAM022',
+            [{'nome': 'Rita', 'parentesco': 1, 'sexo': '2'}]
+            + [{'nome': f'Filho {i}', 'parentesco': 3, 'sexo': '1'} for i in range(5)],
+            bairro='Bairro A',
+            status_validacao='pendente'
+        )
+        Familia.objects.filter(cod_familiar_fam='FAM021').update(nom_localidade_fam='')
+
+        consultas = FamiliaStatsService(import_batch=self.batch)
+        um_passo = FamiliaStatsService(import_batch=self.batch, um_passo=True)
+
+        with self.assertNumQueries(1):
+            resultados = [
+                um_passo.get_maes_solo(),
+                um_passo.get_unipessoa(),
+                um_passo.get_casal_sem_filho(),
+                um_passo.get_filhos_quantitativos(),
+                um_passo.get_por_bairro(),
+                um_passo.get_por_bairro(min_familias=2),
+            ]
+        self.assertEqual(resultados, [
+            consultas.get_maes_solo(),
+            consultas.get_unipessoa(),
+            consultas.get_casal_sem_filho(),
+            consultas.get_filhos_quantitativos(),
+            consultas.get_por_bairro(),
+            consultas.get_por_bairro(min_familias=2),
+        ])
+        self.assertIn('Sem Bairro', resultados[4])